@@ -8,7 +8,9 @@ Created on Mon Dec  6 17:27:50 2021
 
 # compchemtools.py
 
-"""Interactive wrapper for computational chemistry scripts."""
+"""Interactive wrapper for computational chemistry scripts.
+Run with a pipeline file (python compchemtools.py pipeline.toml) to run
+the tasks described in it without prompts, see pipeline."""
 
 
 #%% function to get task
@@ -267,4 +269,10 @@ def main():
 #%%
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    import sys
+    
+    if len(sys.argv) > 1:
+        import pipeline
+        pipeline.main(sys.argv[1])
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:21:36 2026
+
+@author: nat
+"""
+
+#ensemble.py
+
+"""Boltzmann analysis of conformer ensembles from proc_g09out results.
+Conformers are grouped by molecule from their filename (<mol>_c<i>_<suffix>,
+as written by hcs_to_g09). Relative energies, populations at one or more
+temperatures and Boltzmann weighted properties are computed for all molecules
+at once with grouped reductions over arrays sorted by molecule.
+"""
+
+#%% modules
+
+import os
+import csv
+
+import numpy as np
+
+from g09db import split_name
+
+
+#%% constants
+
+KB_HARTREE = 3.166811563e-6 # Boltzmann constant, hartree/K
+HARTREE_KCAL = 627.5094740631 # kcal/mol per hartree
+
+
+#%% load results
+
+def load_results(results_file):
+    """Load results table written by proc_g09out (.csv, .npy or .parquet)
+    or the jobs of a g09db database (.db).
+    Out: dictionary header: np.array (filename as str, other columns as float)."""
+
+    extension = os.path.splitext(results_file)[1].lower()
+
+    if extension == '.npy':
+        table = np.load(results_file)
+        return {h: (table[h].astype(str) if table[h].dtype.kind in 'SU'
+                    else table[h].astype(float)) for h in table.dtype.names}
+
+    if extension == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('pyarrow is needed to read parquet files.')
+        table = pq.read_table(results_file)
+        return {h: np.array(table.column(h).to_pylist(),
+                            dtype = str if table.schema.field(h).type == 'string' else float)
+                for h in table.column_names}
+
+    if extension == '.db':
+        import g09db
+        rows = g09db.query(results_file, """SELECT j.filename, e.scf, t.free, t.enthalpy
+                           FROM jobs j JOIN energies e ON e.job_id = j.id
+                           LEFT JOIN thermo t ON t.job_id = j.id ORDER BY j.id""")
+        columns = list(zip(*rows)) if rows else [[]]*4
+        return {'filename': np.array(columns[0], dtype = str),
+                'SCFenergy': np.array(columns[1], dtype = float),
+                'electronic+free': np.array(columns[2], dtype = float),
+                'electronic+entropy': np.array(columns[3], dtype = float)}
+
+    with open(results_file, newline = '') as f:
+        reader = csv.reader(f, skipinitialspace = True)
+        headers = next(reader)
+        rows = [row + ['']*(len(headers) - len(row)) for row in reader if row]
+
+    table = {}
+    for i, h in enumerate(headers):
+        column = [row[i].strip() for row in rows]
+        if h in ('filename', 'route', 'jobs'):
+            table[h] = np.array(column, dtype = str)
+        else:
+            table[h] = np.array([to_float(x) for x in column])
+
+    return table
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+#%% grouping
+
+def group_molecules(filenames):
+    """Group conformers by molecule name.
+    Out: molecules (np.array of unique names), groups (np.array with index of
+    molecule for each conformer)."""
+
+    names = [split_name(os.path.basename(f))[0] for f in filenames]
+    molecules, groups = np.unique(names, return_inverse = True)
+
+    return molecules, groups
+
+
+def group_bounds(groups):
+    """Order that sorts conformers by group, and start index of each group
+    in the sorted order (for np.ufunc.reduceat)."""
+
+    order = np.argsort(groups, kind = 'stable')
+    if not len(groups):
+        # no conformers: no groups (reduceat gives empty results)
+        return order, np.zeros(0, dtype = int)
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+
+    return order, starts
+
+
+#%% Boltzmann analysis
+
+def relative_energies(energies, groups):
+    """Energies (hartree) relative to the lowest conformer of each group.
+    Out: relative energies in kcal/mol (same order as energies),
+    minimum energy of each group (hartree)."""
+
+    order, starts = group_bounds(groups)
+    group_min = np.minimum.reduceat(energies[order], starts)
+
+    return (energies - group_min[groups]) * HARTREE_KCAL, group_min
+
+
+def populations(energies, groups, temperatures = (298.15,)):
+    """Boltzmann populations of conformers within each group.
+    energies in hartree, temperatures in K.
+    Out: np.array (n temperatures, n conformers), populations of each group
+    add up to 1 at each temperature."""
+
+    temperatures = np.atleast_1d(np.asarray(temperatures, dtype = float))
+    rel, _ = relative_energies(energies, groups)
+    rel = rel / HARTREE_KCAL
+
+    # relative energies >= 0, so exponentials never overflow
+    weights = np.exp(-rel[None, :] / (KB_HARTREE * temperatures[:, None]))
+
+    order, starts = group_bounds(groups)
+    sums = np.add.reduceat(weights[:, order], starts, axis = 1)
+
+    return weights / sums[:, groups]
+
+
+def weighted_property(prop, pops, groups):
+    """Boltzmann weighted average of property for each group.
+    prop: np.array (n conformers), pops: output of populations.
+    Out: np.array (n temperatures, n groups)."""
+
+    order, starts = group_bounds(groups)
+
+    return np.add.reduceat((pops * prop[None, :])[:, order], starts, axis = 1)
+
+
+#%% full analysis
+
+def analyse(table, energy = 'electronic+free', temperatures = (298.15,),
+            properties = ()):
+    """Boltzmann analysis of results table (from load_results).
+    Conformers without energy are left out.
+    Out: conformers dictionary (molecule, filename, rel_energy and population
+    at each temperature) and molecules dictionary (molecule, n_conformers,
+    lowest energy, and weighted properties at each temperature)."""
+
+    energies = table[energy]
+    keep = np.isfinite(energies)
+    filenames = table['filename'][keep]
+    energies = energies[keep]
+
+    molecules, groups = group_molecules(filenames)
+    rel, group_min = relative_energies(energies, groups)
+    pops = populations(energies, groups, temperatures)
+
+    conformers = {'molecule': molecules[groups], 'filename': filenames,
+                  'rel_energy': rel}
+    summary = {'molecule': molecules,
+               'n_conformers': np.bincount(groups, minlength = len(molecules)),
+               energy: group_min}
+
+    for i, T in enumerate(np.atleast_1d(temperatures)):
+        conformers[f'pop_{T:g}K'] = pops[i]
+        summary[f'{energy}_{T:g}K'] = weighted_property(energies, pops[i:i+1], groups)[0]
+        for prop in properties:
+            summary[f'{prop}_{T:g}K'] = weighted_property(table[prop][keep],
+                                                          pops[i:i+1], groups)[0]
+
+    return conformers, summary
+
+
+def write_table(filename, table):
+    """Write dictionary of columns into csv file."""
+
+    headers = list(table)
+    with open(filename, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(zip(*[table[h] for h in headers]))
+
+
+def main(results_file, energy = 'electronic+free', temperatures = (298.15,),
+         properties = (), out_name = 'ensemble'):
+    """Boltzmann analysis of results file. Writes <out_name>_conformers.csv
+    (relative energies in kcal/mol and populations) and
+    <out_name>_molecules.csv (weighted energies and properties per molecule)
+    in directory of results file."""
+
+    table = load_results(results_file)
+
+    if energy not in table:
+        raise ValueError(f'{energy} not found in results. Columns: {", ".join(table)}')
+
+    conformers, summary = analyse(table, energy, temperatures, properties)
+    if not len(conformers['filename']):
+        print(f'No conformers with {energy} in {results_file}.')
+
+    path = os.path.dirname(os.path.abspath(results_file))
+    write_table(os.path.join(path, out_name + '_conformers.csv'), conformers)
+    write_table(os.path.join(path, out_name + '_molecules.csv'), summary)
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'ensemble',
+                               description = 'Boltzmann analysis of conformers in proc_g09out results.')
+
+    parser.add_argument('results', type = str,
+                        help = 'results file (g09_results .csv/.npy/.parquet or g09db .db)')
+    parser.add_argument('-E', '--energy', type = str, default = 'electronic+free',
+                        help = 'column with energies (hartree) for populations. use SCFenergy for opt jobs')
+    parser.add_argument('-T', '--temperatures', type = float, nargs = '+', default = [298.15],
+                        help = 'temperatures (K), separated by blankspaces')
+    parser.add_argument('-P', '--properties', type = str, nargs = '*', default = [],
+                        help = 'additional columns to Boltzmann average')
+    parser.add_argument('-o', '--out_name', type = str, default = 'ensemble',
+                        help = 'prefix for output csv files')
+
+    args = parser.parse_args()
+
+    main(args.results, energy = args.energy, temperatures = args.temperatures,
+         properties = args.properties, out_name = args.out_name)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 27 09:52:18 2026
+
+@author: nat
+"""
+
+#g09chain.py
+
+"""Submit the levels of a screening funnel (g09funnel, e.g. opt -> freq ->
+single point) as a chain of dependent SGE jobs, so the whole pipeline flows
+through the queue without waiting for someone to submit the next stage.
+For each level a submission driver (submit.sh in the level directory) is
+written: it submits the .sh files of the level (write_sh) and a
+post-processing job that waits for all of them (qsub -hold_jid). The
+post-processing job runs proc_g09out on the finished level, writes the
+inputs of the next level (selection rules of the funnel) with their .sh
+files and driver, and runs that driver. Compute nodes must be allowed to
+submit jobs (submit hosts), as usual in SGE clusters.
+"""
+
+#%% modules
+
+import os
+import sys
+import subprocess
+
+import proc_g09out, write_sh
+from g09funnel import read_funnel, prepare_level, level_dir, select
+from g09local import has_log
+
+
+#%% scripts
+
+def qsub_lines(sh_files):
+    """Bash lines that submit sh_files and collect their job ids in JOBS
+    (comma separated)."""
+
+    lines = ['JOBS=""']
+    lines += [f'JOBS=$JOBS,`qsub -terse {sh}`' for sh in sh_files]
+    lines += ['JOBS=${JOBS#,}']
+
+    return lines
+
+
+def write_post_sh(filename, time, jobname, command):
+    """Writes .sh file of post-processing job (one processor) that runs
+    command."""
+
+    sge_chunk = ['#!/bin/bash', '#$ -S /bin/bash', '#',
+                 '### Job Name', f'#$ -N {jobname}', '#',
+                 '# Setea HH:MM:SS tiempo de wall clock time, maximo 3 dias',
+                 f'#$ -l h_rt={time}', '#',
+                 '### write out files in current directory', '#$ -cwd', '#',
+                 "### Merge '-j y' (do not merge '-j n') stderr into stdout stream:",
+                 '#$ -j y']
+
+    exec_chunk = ['# -------- SECTION executing program --------------------------------- \n',
+                  'echo "START_TIME           = `date +\'%y-%m-%d %H:%M:%S %s\'`"',
+                  'echo "JOB_ID               = $JOB_ID"',
+                  command,
+                  'echo "END_TIME             = `date +\'%y-%m-%d %H:%M:%S %s\'`"']
+
+    with open(filename, 'w') as f:
+        f.write('\n'.join(sge_chunk))
+        f.write('\n\n\n')
+        f.write('\n'.join(exec_chunk))
+        f.write('\n')
+
+
+def write_driver(path, sh_files, post_file, level_name):
+    """Writes submission driver submit.sh in path: submits sh_files, then
+    post_file held until all of them finish. Returns driver filename."""
+
+    driver = os.path.join(path, 'submit.sh')
+    lines = ['#!/bin/bash',
+             f'# Submission driver of level {level_name}: g09 jobs, then',
+             '# post-processing job that waits for them (-hold_jid).', '',
+             f'cd {os.path.abspath(path)}']
+    lines += qsub_lines(sh_files)
+    lines += [f'qsub ${{JOBS:+-hold_jid $JOBS}} {post_file}',
+              f'echo "Level {level_name} submitted: ${{JOBS:-no g09 jobs}}"']
+
+    with open(driver, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    return driver
+
+
+#%% stages
+
+SH_LIST = 'stage_sh.txt' # .sh files written for the level, in its directory
+
+
+def read_sh_list(path):
+    """.sh files written by write_stage in path (empty list if none)."""
+
+    if not os.path.exists(os.path.join(path, SH_LIST)):
+        return []
+    with open(os.path.join(path, SH_LIST)) as f:
+        return f.read().split()
+
+
+def write_sh_list(path, sh_files):
+    with open(os.path.join(path, SH_LIST), 'w') as f:
+        f.write('\n'.join(sh_files) + '\n')
+
+
+def write_stage(funnel_file, funnel_dir, i, python = sys.executable):
+    """Prepare level i of funnel (inputs, see g09funnel.prepare_level),
+    write .sh files of inputs without log, post-processing job and
+    submission driver. Returns driver filename."""
+
+    funnel, pathin, funnel_dir = read_funnel(funnel_file, funnel_dir)
+    level = funnel['levels'][i]
+    path = prepare_level(funnel, pathin, funnel_dir, i)
+    sh_name = funnel.get('sh_name', 'f')
+
+    # only .sh files written by a previous write_stage are removed
+    for sh in read_sh_list(path):
+        if os.path.exists(os.path.join(path, sh)):
+            os.remove(os.path.join(path, sh))
+    pending = sorted(x for x in os.listdir(path) if x.endswith('.com') and not has_log(path, x))
+    sh_files = []
+    if pending:
+        sh_files = write_sh.main(path, funnel.get('time', '11:59:59'), pending, 
+                                 sh_name = sh_name, stage = funnel.get('stage', False))
+    write_sh_list(path, sh_files)
+
+    command = (f'{python} {os.path.abspath(__file__)} {os.path.abspath(funnel_file)} '
+               f'-d {os.path.abspath(funnel_dir)} -post {i}')
+    write_post_sh(os.path.join(path, 'post.sh'), funnel.get('post_time', '01:00:00'),
+                  f'post_{level["name"]}', command)
+
+    return write_driver(path, sh_files, 'post.sh', level['name'])
+
+
+def submit(driver):
+    """Run submission driver. Returns exit code."""
+
+    return subprocess.run(['bash', driver]).returncode
+
+
+def post(funnel_file, funnel_dir, i, python = sys.executable, run_driver = True):
+    """Post-processing of level i: process outputs with proc_g09out, then
+    write stage of next level and submit it (if run_driver = True).
+    Returns driver of next level, or list of selected filenames after the
+    last level (None if the level has no results)."""
+
+    funnel, pathin, funnel_dir = read_funnel(funnel_file, funnel_dir)
+    levels = funnel['levels']
+    path = level_dir(funnel_dir, i, levels[i])
+
+    if not os.path.exists(os.path.join(path, 'g09_results.csv')):
+        proc_g09out.main(path, get_sp = True)
+    if not os.path.exists(os.path.join(path, 'g09_results.csv')):
+        print(f'No results for level {levels[i]["name"]}, chain stopped.')
+        return None
+
+    if i + 1 == len(levels):
+        final = select(path, funnel.get('select', {}))
+        print(f'{len(final)} structures at the end of the funnel.')
+        return final
+
+    driver = write_stage(funnel_file, funnel_dir, i + 1, python)
+    if run_driver:
+        submit(driver)
+
+    return driver
+
+
+#%% main function
+
+def main(funnel_file, funnel_dir = None, run_driver = False, python = sys.executable):
+    """Write stage of first level of funnel without results (levels already
+    finished are skipped) and, if run_driver = True, submit it. The rest of
+    the levels are submitted by the post-processing jobs.
+    Returns driver filename, or None if all levels are finished."""
+
+    funnel, pathin, funnel_dir = read_funnel(funnel_file, funnel_dir)
+
+    for i, level in enumerate(funnel['levels']):
+        if not os.path.exists(os.path.join(level_dir(funnel_dir, i, level), 'g09_results.csv')):
+            break
+    else:
+        print('All levels of the funnel are finished.')
+        return None
+
+    driver = write_stage(funnel_file, funnel_dir, i, python)
+    if run_driver:
+        submit(driver)
+    else:
+        print(f'Submit level {level["name"]} and the rest of the chain with: bash {driver}')
+
+    return driver
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09chain',
+                               description = 'Submit funnel levels as a chain of dependent SGE jobs.')
+
+    parser.add_argument('funnel', type = str,
+                        help = 'JSON file describing the funnel levels (see g09funnel)')
+    parser.add_argument('-d', '--dir', type = str, default = None,
+                        help = 'directory for the levels. defaults to directory of funnel file')
+    parser.add_argument('-s', '--submit', action = 'store_true',
+                        help = 'run submission driver of first level')
+    parser.add_argument('-post', '--post', type = int, default = None,
+                        help = 'post-processing of level (run by the chained jobs)')
+
+    args = parser.parse_args()
+
+    if args.post is not None:
+        post(args.funnel, args.dir, args.post)
+    else:
+        main(args.funnel, args.dir, run_driver = args.submit)
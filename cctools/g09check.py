@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 14:41:09 2026
+
+@author: nat
+"""
+
+#g09check.py
+
+"""Pre-flight sanity checks of geometries before g09 jobs are submitted:
+    overlap: two atoms closer than min_dist.
+    fragments: groups of atoms further than max_gap from the rest.
+    parity: charge and multiplicity do not match the number of electrons.
+Distances are computed for whole batches of conformers with the same atoms
+at once, in chunks of conformers that keep the distance arrays below
+max_mem bytes. Checks can run on Molecule objects (hcs_to_g09) or on a
+directory of g09 inputs, where bad inputs are reported or moved away
+before .sh files are written.
+"""
+
+#%% modules
+
+import os
+import csv
+
+import numpy as np
+
+from molecule import Molecule, atomic_number
+
+
+#%% atoms and electrons
+
+def check_parity(numbers, charge, mult):
+    """True if charge and multiplicity are possible for atomic numbers:
+    number of unpaired electrons (mult - 1) must have the parity of the
+    number of electrons and not exceed it."""
+
+    electrons = int(np.sum(numbers)) - charge
+    unpaired = mult - 1
+
+    return electrons >= 0 and unpaired >= 0 and unpaired <= electrons and \
+        (electrons - unpaired) % 2 == 0
+
+
+#%% batch distance checks
+
+# bytes per atom pair of each conformer in check_batch: difference vectors
+# (3 float64), distances (float64), component labels of neighbours (int64)
+# and adjacency (bool)
+PAIR_BYTES = 3*8 + 8 + 8 + 1
+
+
+def chunk_size(natoms, max_mem):
+    """Number of conformers whose arrays in check_batch (PAIR_BYTES per
+    atom pair) fit in max_mem bytes."""
+
+    return max(1, int(max_mem // (natoms * natoms * PAIR_BYTES)))
+
+
+def components(adjacency):
+    """Connected components for batch of adjacency matrices
+    (nconf, natoms, natoms) by label propagation: each atom takes the
+    smallest label of its neighbours until labels do not change.
+    Out: labels (nconf, natoms), number of components per conformer."""
+
+    nconf, natoms = adjacency.shape[:2]
+    labels = np.broadcast_to(np.arange(natoms), (nconf, natoms)).copy()
+
+    while True:
+        neighbours = np.where(adjacency, labels[:, None, :], natoms)
+        new = np.minimum(labels, neighbours.min(axis = 2))
+        if np.array_equal(new, labels):
+            break
+        labels = new
+
+    ncomp = np.array([len(np.unique(row)) for row in labels])
+
+    return labels, ncomp
+
+
+def check_batch(coords, min_dist = 0.5, max_gap = 4.0, max_mem = 2**28):
+    """Distance checks for batch of conformers with the same atoms.
+    coords: np array (nconf, natoms, 3), in angstrom.
+    Out: minimum interatomic distance (nconf), number of fragments (nconf),
+    where atoms closer than max_gap belong to the same fragment."""
+
+    nconf, natoms = coords.shape[:2]
+    min_d = np.full(nconf, np.inf)
+    nfrag = np.ones(nconf, dtype = int)
+    if natoms < 2:
+        return min_d, nfrag
+
+    step = chunk_size(natoms, max_mem)
+    diagonal = np.eye(natoms, dtype = bool)
+
+    for start in range(0, nconf, step):
+        chunk = coords[start:start + step]
+        diff = chunk[:, :, None, :] - chunk[:, None, :, :]
+        # einsum avoids the temporary squared array of np.linalg.norm
+        dist = np.einsum('ijkl,ijkl->ijk', diff, diff)
+        np.sqrt(dist, out = dist)
+        del diff
+        dist[:, diagonal] = np.inf
+        min_d[start:start + step] = dist.min(axis = (1, 2))
+        nfrag[start:start + step] = components(dist < max_gap)[1]
+
+    return min_d, nfrag
+
+
+#%% check molecules
+
+def group_by_atoms(molecules):
+    """Group molecules with the same atom types (in the same order).
+    Out: dictionary atomic numbers tuple: list of indices in molecules."""
+
+    groups = {}
+    for i, molecule in enumerate(molecules):
+        key = tuple(atomic_number(molecule.atom_types[n]) for n in molecule.atom_types)
+        groups.setdefault(key, []).append(i)
+
+    return groups
+
+
+def check_molecules(molecules, min_dist = 0.5, max_gap = 4.0, max_mem = 2**28):
+    """Check list of Molecule objects (charge and mult attributes are used).
+    Out: list of problems (list of strings, empty if geometry is fine) for
+    each molecule."""
+
+    problems = [[] for _ in molecules]
+
+    for numbers, indices in group_by_atoms(molecules).items():
+        coords = np.array([molecules[i].arrXYZ() for i in indices], dtype = float)
+        min_d, nfrag = check_batch(coords, min_dist, max_gap, max_mem)
+
+        for i, d, n in zip(indices, min_d, nfrag):
+            if d < min_dist:
+                problems[i].append(f'overlap ({d:.3f} A)')
+            if n > 1:
+                problems[i].append(f'{n} fragments')
+            if not check_parity(numbers, molecules[i].charge, molecules[i].mult):
+                problems[i].append(f'parity (charge {molecules[i].charge}, mult {molecules[i].mult})')
+
+    return problems
+
+
+def report(names, problems):
+    """Print problems found, return number of bad geometries."""
+
+    bad = 0
+    for name, problem in zip(names, problems):
+        if problem:
+            bad += 1
+            print(f'{name}: {", ".join(problem)}')
+
+    return bad
+
+
+#%% read g09 inputs
+
+def read_g09in(g09in_file):
+    """Read molecule specification of g09 input with cartesian coordinates.
+    Out: Molecule object with charge and mult."""
+
+    with open(g09in_file) as f:
+        lines = [line.strip() for line in f]
+
+    # sections: Link0 + route, comment, molecule specification
+    blanks = [i for i, line in enumerate(lines) if not line]
+    route = next(i for i, line in enumerate(lines) if line.startswith('#'))
+    spec = next(i for i in blanks if i > route)
+    spec = next(i for i in blanks if i > spec + 1) + 1
+
+    charge, mult = [int(x) for x in lines[spec].replace(',', ' ').split()[:2]]
+    coordinates = {}
+    atom_types = {}
+    for n, line in enumerate(lines[spec + 1:], 1):
+        if not line:
+            break
+        words = line.split()
+        atom_types[n] = atomic_number(words[0].split('(')[0].split('-')[0])
+        coordinates[n] = np.array([float(x) for x in words[-3:]])
+
+    molecule = Molecule(coordinates, atom_types)
+    molecule.charge = charge
+    molecule.mult = mult
+
+    return molecule
+
+
+#%% main function
+
+def main(path, g09_files = None, extension = '.com', move = False, min_dist = 0.5,
+         max_gap = 4.0, max_mem = 2**28):
+    """Check geometries of g09 inputs in path (by default, all files with
+    extension). Problems are printed and written in geometry_check.csv.
+    If move = True, bad inputs are moved to bad_geometries subfolder.
+    Returns list of good input files."""
+
+    if not g09_files:
+        g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
+
+    molecules = []
+    problems = []
+    for file in g09_files:
+        try:
+            molecules.append(read_g09in(os.path.join(path, file)))
+        except Exception as e:
+            molecules.append(None)
+            problems.append((file, f'could not read input ({e})'))
+
+    names = [f for f, m in zip(g09_files, molecules) if m]
+    checked = check_molecules([m for m in molecules if m], min_dist, max_gap, max_mem)
+    problems += [(name, ', '.join(p)) for name, p in zip(names, checked) if p]
+
+    with open(os.path.join(path, 'geometry_check.csv'), 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['filename', 'problems'])
+        writer.writerows(problems)
+
+    for file, problem in problems:
+        print(f'{file}: {problem}')
+    print(f'{len(problems)} of {len(g09_files)} inputs with problems.')
+
+    bad = {file for file, problem in problems}
+    if move and bad:
+        destination = os.path.join(path, 'bad_geometries')
+        os.makedirs(destination, exist_ok = True)
+        for file in bad:
+            os.rename(os.path.join(path, file), os.path.join(destination, file))
+
+    return [file for file in g09_files if file not in bad]
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09check',
+                               description = 'Check geometries of g09 input files before submitting jobs.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory with g09 input files')
+    parser.add_argument('-e', '--ext', type = str, default = '.com',
+                        help = 'extension of g09 input files')
+    parser.add_argument('-mv', '--move', action = 'store_true',
+                        help = 'move inputs with problems to bad_geometries subfolder')
+    parser.add_argument('-d', '--min_dist', type = float, default = 0.5,
+                        help = 'minimum interatomic distance (angstrom)')
+    parser.add_argument('-g', '--max_gap', type = float, default = 4.0,
+                        help = 'maximum distance between fragments (angstrom)')
+
+    args = parser.parse_args()
+
+    main(args.path, extension = args.ext, move = args.move, min_dist = args.min_dist,
+         max_gap = args.max_gap)
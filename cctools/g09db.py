@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:05:47 2026
+
+@author: nat
+"""
+
+#g09db.py
+
+"""Indexed SQLite store for results of a whole campaign (many directories).
+proc_g09out and hcs_to_g09 can ingest results into one database file,
+results are upserted (files processed again replace their previous values).
+Tables:
+    jobs: one row per g09 output (path, filename, molecule, conformer, route,
+    jobs, charge, mult).
+    energies: SCF energy and negative frequencies of each job.
+    thermo: sums of electronic and ZPE / thermal energies / enthalpies /
+    free energies of each job.
+    geometries: compressed final geometry of each job.
+    hcs_conformers: energy, found and compressed geometry for each conformer
+    of HyperChem conformational searches.
+"""
+
+#%% modules
+
+import os
+import re
+import csv
+import sqlite3
+import zlib
+
+import numpy as np
+
+from molecule import Molecule
+from g09results import typed_row
+
+
+#%% schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    molecule TEXT,
+    conformer INTEGER,
+    route TEXT,
+    jobs TEXT,
+    charge INTEGER,
+    mult INTEGER,
+    UNIQUE (path, filename));
+CREATE INDEX IF NOT EXISTS jobs_molecule ON jobs (molecule, conformer);
+
+CREATE TABLE IF NOT EXISTS energies (
+    job_id INTEGER PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+    scf REAL,
+    n_negfreq INTEGER,
+    neg_freq REAL);
+CREATE INDEX IF NOT EXISTS energies_scf ON energies (scf);
+
+CREATE TABLE IF NOT EXISTS thermo (
+    job_id INTEGER PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+    zpe REAL,
+    thermal REAL,
+    enthalpy REAL,
+    free REAL);
+CREATE INDEX IF NOT EXISTS thermo_free ON thermo (free);
+
+CREATE TABLE IF NOT EXISTS geometries (
+    job_id INTEGER PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+    natoms INTEGER,
+    atom_types BLOB,
+    coords BLOB);
+
+CREATE TABLE IF NOT EXISTS hcs_conformers (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    molecule TEXT NOT NULL,
+    conformer INTEGER NOT NULL,
+    energy REAL,
+    found REAL,
+    natoms INTEGER,
+    atom_types BLOB,
+    coords BLOB,
+    UNIQUE (path, molecule, conformer));
+CREATE INDEX IF NOT EXISTS hcs_molecule ON hcs_conformers (molecule, energy);
+"""
+
+# results headers (proc_g09out.get_headers) and the column they are stored in.
+# Sums of electronic energies follow the order of g09freq.get_energies.
+THERMO_COLUMNS = {'electronic+ZPE': 'zpe',
+                  'electronic+enthalpy': 'thermal',
+                  'electronic+entropy': 'enthalpy',
+                  'electronic+free': 'free'}
+
+
+#%% names and geometries
+
+def split_name(g09out_name):
+    """Get molecule name and conformer number from filename
+    <mol>_c<i>_<suffix>.<ext> (as written by hcs_to_g09.write_g09ins).
+    If name does not follow that pattern, molecule is the filename without
+    extension and conformer is None."""
+
+    stem = g09out_name.rsplit('.', 1)[0]
+    match = re.match(r'(.+)_c(\d+)(_|$)', stem)
+
+    if match:
+        return match.group(1), int(match.group(2))
+    else:
+        return stem, None
+
+
+# first bytes of atom types blobs: encoding of the types that follow
+TYPES_NUMBERS = b'\x00Z' # atomic numbers, one byte each
+TYPES_SYMBOLS = b'\x00S' # element symbols, ascii separated by spaces
+
+
+def pack_geometry(molecule):
+    """Returns natoms, atom types and coordinates of Molecule object,
+    types and coordinates as compressed bytes. Atom types start with
+    their encoding (TYPES_NUMBERS or TYPES_SYMBOLS)."""
+
+    types = [molecule.atom_types[n] for n in molecule.atom_types]
+    try:
+        types = TYPES_NUMBERS + np.array(types, dtype = 'u1').tobytes()
+    except ValueError:
+        # atom types as element symbols (e.g. molecules from hcs files)
+        types = TYPES_SYMBOLS + ' '.join(types).encode('ascii')
+
+    coords = np.array(molecule.arrXYZ(), dtype = 'f8').tobytes()
+
+    return molecule.natoms, zlib.compress(types), zlib.compress(coords)
+
+
+def unpack_geometry(natoms, atom_types, coords):
+    """Builds Molecule object from row of geometries table."""
+
+    types = zlib.decompress(atom_types)
+    if types[:2] == TYPES_NUMBERS:
+        types = np.frombuffer(types[2:], dtype = 'u1').tolist()
+    elif types[:2] == TYPES_SYMBOLS:
+        types = types[2:].decode('ascii').split()
+    elif len(types) == natoms:
+        # rows written without encoding, guessed from length
+        types = np.frombuffer(types, dtype = 'u1').tolist()
+    else:
+        types = types.decode('ascii').split()
+    coords = np.frombuffer(zlib.decompress(coords), dtype = 'f8').reshape(natoms, 3)
+
+    return Molecule({i+1: xyz for i, xyz in enumerate(coords)},
+                    {i+1: t for i, t in enumerate(types)})
+
+
+#%% results store
+
+class ResultsStore():
+    """Connection to a results database. Results added are buffered and
+    written in one transaction every batch records (and on close).
+    Use as context manager or call close()."""
+
+    def __init__(self, db_file, batch = 500):
+        self.db_file = db_file
+        self.batch = batch
+        self.pending = []
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(SCHEMA)
+
+    def add_g09(self, path, headers, results, molecule = None):
+        """Add results row of g09 output (proc_g09out.out_proc) with
+        corresponding headers, and optionally its final Molecule."""
+
+        self.pending.append(('g09', os.path.abspath(path), headers, results, molecule))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def add_hcs(self, path, molname, mol_list):
+        """Add conformers of conformational search (list of Molecule objects
+        from proc_hcs.main)."""
+
+        self.pending.append(('hcs', os.path.abspath(path), molname, mol_list, None))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Write pending records in one transaction."""
+
+        with self.conn:
+            for kind, path, *record in self.pending:
+                if kind == 'g09':
+                    self.upsert_g09(path, *record)
+                else:
+                    self.upsert_hcs(path, *record[:2])
+        self.pending = []
+
+    def upsert_g09(self, path, headers, results, molecule):
+        row = dict(zip(headers, typed_row(headers, results)))
+        molname, conformer = split_name(row['filename'])
+        charge = molecule.charge if molecule else None
+        mult = molecule.mult if molecule else None
+
+        job_id = self.conn.execute(
+            """INSERT INTO jobs (path, filename, molecule, conformer, route, jobs, charge, mult)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path, filename) DO UPDATE SET
+            molecule = excluded.molecule, conformer = excluded.conformer,
+            route = excluded.route, jobs = excluded.jobs,
+            charge = excluded.charge, mult = excluded.mult
+            RETURNING id""",
+            (path, row['filename'], molname, conformer, row['route'], row['jobs'],
+             charge, mult)).fetchone()[0]
+
+        n_neg = row.get('n_negFreq')
+        self.conn.execute('INSERT OR REPLACE INTO energies VALUES (?, ?, ?, ?)',
+                          (job_id, nan_to_none(row.get('SCFenergy')),
+                           None if n_neg is None or n_neg < 0 else n_neg,
+                           nan_to_none(row.get('neg_freq'))))
+
+        if 'electronic+free' in row:
+            self.conn.execute('INSERT OR REPLACE INTO thermo VALUES (?, ?, ?, ?, ?)',
+                              [job_id] + [nan_to_none(row[h]) for h in THERMO_COLUMNS])
+
+        if molecule:
+            self.conn.execute('INSERT OR REPLACE INTO geometries VALUES (?, ?, ?, ?)',
+                              (job_id,) + pack_geometry(molecule))
+
+    def upsert_hcs(self, path, molname, mol_list):
+        self.conn.executemany(
+            """INSERT OR REPLACE INTO hcs_conformers
+            (path, molecule, conformer, energy, found, natoms, atom_types, coords)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(path, molname, i+1, mol.energy, mol.found) + pack_geometry(mol)
+             for i, mol in enumerate(mol_list)])
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def nan_to_none(value):
+    """nan values are stored as NULL."""
+
+    if value is None or value != value:
+        return None
+    return value
+
+
+#%% ingest existing csv files
+
+def ingest_csv(db_file, csv_file):
+    """Add rows of an existing g09_results.csv (written by proc_g09out) to
+    the database. Path of jobs is the directory of the csv file."""
+
+    path = os.path.dirname(os.path.abspath(csv_file))
+
+    with open(csv_file, newline = '') as f, ResultsStore(db_file) as store:
+        reader = csv.reader(f, skipinitialspace = True)
+        headers = next(reader)
+        for row in reader:
+            if not row:
+                continue
+            if len(row) == len(headers):
+                row_headers = headers
+            else:
+                # opt or sp row in table with freq headers
+                row_headers = headers[:3] + ['SCFenergy']
+            store.add_g09(path, row_headers, [x.strip('"') for x in row])
+
+
+#%% queries
+
+def query(db_file, sql, params = ()):
+    """Run sql query in database. Returns list of rows (tuples)."""
+
+    with sqlite3.connect(db_file) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def lowest_conformers(db_file, by = 'free'):
+    """Lowest energy job for each molecule in the campaign.
+    by: 'free' (sum of electronic and thermal free energies) or 'scf'.
+    Out: list of (molecule, path, filename, conformer, energy), ordered by
+    molecule."""
+
+    if by == 'free':
+        table, column = 'thermo', 'free'
+    elif by == 'scf':
+        table, column = 'energies', 'scf'
+    else:
+        raise ValueError("by must be 'free' or 'scf'.")
+
+    sql = f"""SELECT j.molecule, j.path, j.filename, j.conformer, MIN(e.{column})
+    FROM jobs j JOIN {table} e ON e.job_id = j.id
+    WHERE e.{column} IS NOT NULL
+    GROUP BY j.molecule ORDER BY j.molecule"""
+
+    return query(db_file, sql)
+
+
+def get_geometry(db_file, path, filename):
+    """Returns final geometry of job as Molecule object (None if not stored)."""
+
+    row = query(db_file, """SELECT g.natoms, g.atom_types, g.coords
+                FROM geometries g JOIN jobs j ON g.job_id = j.id
+                WHERE j.path = ? AND j.filename = ?""",
+                (os.path.abspath(path), filename))
+
+    if row:
+        return unpack_geometry(*row[0])
+
+
+#%% command line
+
+def main(db_file, command, args = (), by = 'free'):
+    """Command line interface:
+    ingest: add existing g09_results.csv files (args) to database.
+    lowest: print lowest energy conformer of each molecule.
+    sql: run query (args[0]) and print rows."""
+
+    if command == 'ingest':
+        for csv_file in args:
+            ingest_csv(db_file, csv_file)
+
+    elif command == 'lowest':
+        for row in lowest_conformers(db_file, by):
+            print(','.join(str(x) for x in row))
+
+    elif command == 'sql':
+        for row in query(db_file, args[0]):
+            print(','.join(str(x) for x in row))
+
+    else:
+        raise ValueError(f'Unknown command {command}. Use ingest, lowest or sql.')
+
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09db',
+                               description = 'Query or add results to SQLite results database.')
+
+    parser.add_argument('db', type = str,
+                        help = 'database file')
+    parser.add_argument('command', type = str, choices = ['ingest', 'lowest', 'sql'],
+                        help = 'ingest: add g09_results.csv files. lowest: lowest energy conformer per molecule. sql: run query')
+    parser.add_argument('args', nargs = '*', default = [],
+                        help = 'csv files for ingest, or query for sql')
+    parser.add_argument('-b', '--by', type = str, default = 'free',
+                        help = 'energy used by lowest (free/scf)')
+
+    args = parser.parse_args()
+
+    main(args.db, args.command, args.args, by = args.by)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 09:48:15 2026
+
+@author: nat
+"""
+
+#g09errors.py
+
+"""Classify failed g09 jobs from the tail of their output files and write
+a manifest with the category of each file. Only the last bytes of each file
+are read, and files are classified concurrently.
+Categories:
+    normal: normal termination.
+    scf_convergence: SCF did not converge (l502).
+    opt_steps: maximum number of optimization steps exceeded.
+    memory: not enough memory.
+    disk_full: scratch or working disk full (write errors).
+    link9999: other error termination in l9999.
+    error: other error termination.
+    walltime: no termination line, job was killed (usually wall clock time).
+Failed jobs can be resubmitted with a fix for their category: restart input
+from last geometry (g09restart), with route and Link0 changed (rw_g09in) and
+.sh files (write_sh).
+"""
+
+#%% modules
+
+import os
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+from g09extract import map_file
+from rw_g09in import add_options, mem_bytes, read_header, strip_route
+
+
+#%% categories
+
+# checked in order, first match gives the category
+PATTERNS = [('disk_full', [b'No space left on device', b'Erroneous write',
+                           b'write error']),
+            ('memory', [b'could not allocate memory', b'Out-of-memory',
+                        b'not enough memory', b'insufficient memory']),
+            ('scf_convergence', [b'Convergence failure -- run terminated']),
+            ('opt_steps', [b'Number of steps exceeded', b'Optimization stopped']),
+            ('link9999', [b'l9999.exe']),
+            ('error', [b'Error termination'])]
+
+# fixes for resubmission of each category:
+# options added to route keywords, factor for %mem, restart from last geometry
+FIXES = {'scf_convergence': {'options': {'scf': ['xqc']}},
+         'opt_steps': {'options': {'opt': ['maxcycles=200']}},
+         'link9999': {'options': {}},
+         'memory': {'options': {}, 'mem_factor': 2},
+         'walltime': {'options': {}},
+         'disk_full': {'options': {}}}
+
+
+#%% classify
+
+def read_tail(g09out, nbytes = 8192):
+    """Read last nbytes of file (bytes)."""
+
+    with map_file(g09out) as buf:
+        return buf[max(0, len(buf) - nbytes):]
+
+
+def classify_tail(tail):
+    """Category of g09 job from tail of output (bytes).
+    Out: category, line where pattern was found (or '')."""
+
+    lines = tail.rstrip(b'\n').split(b'\n')
+    if any(b'Normal termination' in line for line in lines[-3:]):
+        return 'normal', ''
+
+    for category, patterns in PATTERNS:
+        for pattern in patterns:
+            pos = tail.rfind(pattern)
+            if pos != -1:
+                start = tail.rfind(b'\n', 0, pos) + 1
+                end = tail.find(b'\n', pos)
+                line = tail[start:end if end != -1 else len(tail)]
+                return category, line.decode('utf-8', errors = 'replace').strip()
+
+    return 'walltime', ''
+
+
+def classify(g09out, nbytes = 8192):
+    """Category and detail line of g09 output file, from its tail."""
+
+    try:
+        return classify_tail(read_tail(g09out, nbytes))
+    except OSError as e:
+        return 'error', str(e)
+
+
+def classify_files(path, g09_files, workers = 32, nbytes = 8192):
+    """Classify g09 output files concurrently.
+    Out: list of (filename, category, detail), in order of g09_files."""
+
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        results = pool.map(classify, [os.path.join(path, x) for x in g09_files],
+                           [nbytes]*len(g09_files))
+        return [(file, *result) for file, result in zip(g09_files, results)]
+
+
+#%% manifest
+
+def write_manifest(filename, classified):
+    """Write csv manifest with filename, category and detail line."""
+
+    with open(filename, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['filename', 'category', 'detail'])
+        writer.writerows(classified)
+
+
+def read_manifest(filename):
+    """Read manifest. Out: dictionary category: list of filenames."""
+
+    categories = {}
+    with open(filename, newline = '') as f:
+        for row in csv.DictReader(f):
+            categories.setdefault(row['category'], []).append(row['filename'])
+
+    return categories
+
+
+#%% resubmission
+
+def resubmit(path, manifest = 'g09_errors.csv', time = '11:59:59', sh_name = 'r',
+             workers = None):
+    """Write inputs and .sh files to resubmit failed jobs in manifest, in
+    subfolder resubmit/<category> of path, with the fix for each category
+    (see FIXES): restart from last geometry with changed route or %mem."""
+
+    import g09restart, rw_g09in, write_sh
+
+    categories = read_manifest(os.path.join(path, manifest))
+
+    for category, files in categories.items():
+        if category not in FIXES:
+            continue
+        fix = FIXES[category]
+        pathout = os.path.join(path, 'resubmit', category)
+        written = g09restart.main(path, files, pathout = pathout, workers = workers)
+
+        for input_name in written:
+            input_file = os.path.join(pathout, input_name)
+            with open(input_file) as f:
+                lines = f.read().splitlines()
+            link0, route, _ = read_header(lines)
+            current = mem_bytes(link0['mem'][1]) if 'mem' in link0 else None
+            mem = None
+            if 'mem_factor' in fix and current:
+                mem = f'{int(current * fix["mem_factor"]) // 1024**2}MB'
+            rw_g09in.rewrite_g09in(input_file, route = add_options(strip_route(route),
+                                                                   fix['options']), mem = mem)
+
+        if written:
+            write_sh.main(pathout, time, g09_files = written,
+                          sh_name = sh_name + category + '_')
+
+
+#%% main function
+
+def main(path, g09_files = None, extension = '.log', manifest = 'g09_errors.csv',
+         workers = 32, resubmit_time = None):
+    """Classify g09 output files in path (by default, all files in path and
+    in path/not_normal_term) and write manifest in path.
+    If resubmit_time is provided, inputs and .sh files to resubmit failed
+    jobs are written (see resubmit).
+    Returns dictionary category: number of files."""
+
+    if not g09_files:
+        g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
+        error_path = os.path.join(path, 'not_normal_term')
+        if os.path.isdir(error_path):
+            g09_files += [os.path.join('not_normal_term', x) for x in os.listdir(error_path)
+                          if x.endswith(extension)]
+
+    classified = classify_files(path, g09_files, workers)
+    write_manifest(os.path.join(path, manifest), classified)
+
+    counts = {}
+    for filename, category, detail in classified:
+        counts[category] = counts.get(category, 0) + 1
+    for category, n in sorted(counts.items()):
+        print(f'{category}: {n}')
+
+    if resubmit_time:
+        resubmit(path, manifest, resubmit_time, workers = workers)
+
+    return counts
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09errors',
+                               description = 'Classify g09 jobs from the tail of their output files.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory to work in')
+    parser.add_argument('-e', '--ext', type = str, default = '.log',
+                        help = 'extension of g09 output files')
+    parser.add_argument('-m', '--manifest', type = str, default = 'g09_errors.csv',
+                        help = 'name of manifest csv file')
+    parser.add_argument('-w', '--workers', type = int, default = 32,
+                        help = 'number of threads reading files')
+    parser.add_argument('-t', '--time', type = str, default = None,
+                        help = 'write inputs and .sh files to resubmit failed jobs, with this wall clock time (HH:MM:SS)')
+
+    args = parser.parse_args()
+
+    main(args.path, extension = args.ext, manifest = args.manifest,
+         workers = args.workers, resubmit_time = args.time)
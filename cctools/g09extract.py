@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov  2 10:14:26 2026
+
+@author: nat
+"""
+
+#g09extract.py
+
+"""Registry of extractors of single properties of g09 outputs, and the
+scanning layer of g09 output files: files are memory mapped and searched as
+bytes, and only the regions that are extracted are decoded.
+Each extractor has marker strings and a parse function that reads its block
+from the marker line onwards. Properties of interest are the final ones, so
+the last occurrence of the markers is searched from the end of the file
+(rfind on the mapped file), and earlier occurrences are tried only if the
+last block can not be parsed (truncated): an energy-only run reads the tail
+of the file, not the whole output. Extractors flagged head (charge and
+multiplicity) are searched from the start.
+Extractors (field: results columns):
+    scf: SCFenergy (last SCF Done).
+    geometry: last orientation (Standard, or Input with nosymm), as
+    Molecule with charge and multiplicity.
+    freqs: n_negFreq, neg_freq (last frequency section).
+    thermo: electronic+ZPE, electronic+enthalpy, electronic+entropy,
+    electronic+free (same columns as proc_g09out, see g09db).
+    timing: cpu_time, elapsed_time (s, last job).
+    charges: Mulliken charges (last), as np array.
+    dipole: dipole_x, dipole_y, dipole_z, dipole (Debye).
+New extractors are added with the register decorator.
+Mapped files (map_file) are also used by the readers of the tail
+(proc_g09out.check_term, g09errors), of the header and last geometry
+(g09restart) and to locate all markers of a file in one pass (scan).
+"""
+
+#%% modules
+
+import os
+import re
+import mmap
+from contextlib import contextmanager
+from itertools import islice
+
+import numpy as np
+
+from molecule import Molecule
+
+
+#%% registry
+
+class Extractor():
+    """Named extractor: marker strings, parse function (iterator of lines
+    from marker line -> dictionary), results columns, if it is found at the
+    head of the file and names of extractors it needs."""
+
+    def __init__(self, name, markers, parse, headers = (), head = False, requires = ()):
+        self.name = name
+        self.markers = tuple(markers)
+        self.parse = parse
+        self.headers = list(headers)
+        self.head = head
+        self.requires = tuple(requires)
+
+
+EXTRACTORS = {}
+
+
+def register(name, markers, headers = (), head = False, requires = ()):
+    """Decorator to register parse function as extractor name."""
+
+    def wrap(parse):
+        EXTRACTORS[name] = Extractor(name, markers, parse, headers, head, requires)
+        return parse
+
+    return wrap
+
+
+def resolve(fields):
+    """Extractors for fields and those they require, in registry order."""
+
+    names = set()
+    pending = list(fields)
+    while pending:
+        name = pending.pop()
+        if name not in EXTRACTORS:
+            raise ValueError(f'Unknown field {name}. Use {", ".join(public_fields())}.')
+        if name not in names:
+            names.add(name)
+            pending += EXTRACTORS[name].requires
+
+    return [e for name, e in EXTRACTORS.items() if name in names]
+
+
+def public_fields():
+    """Names of extractors that can be requested (not internal ones)."""
+
+    return [name for name in EXTRACTORS if not name.startswith('_')]
+
+
+def field_headers(fields):
+    """Results columns for fields, in registry order."""
+
+    return [h for e in resolve(fields) for h in e.headers]
+
+
+#%% extractors
+
+@register('_specs', [' Multiplicity ='], head = True)
+def parse_specs(lines):
+    words = next(lines).split()
+    return {'charge': int(words[2]), 'mult': int(words[5])}
+
+
+@register('scf', ['SCF Done:'], ['SCFenergy'])
+def parse_scf(lines):
+    return {'SCFenergy': float(next(lines).split()[4])}
+
+
+@register('geometry', ['Standard orientation:', 'Input orientation:'], requires = ['_specs'])
+def parse_geometry(lines):
+    next(lines)
+    for i in range(4): # header lines
+        next(lines)
+    rows = []
+    for line in lines:
+        if '---' in line:
+            break
+        rows.append(line.split())
+    values = np.array(rows, dtype = float)
+    return {'atom_types': values[:, 1].astype(int), 'coords': values[:, 3:6]}
+
+
+@register('freqs', ['Harmonic frequencies'], ['n_negFreq', 'neg_freq'])
+def parse_freqs(lines):
+    next(lines)
+    freqs = []
+    for line in lines:
+        if 'Thermochemistry' in line or 'Normal termination' in line:
+            break
+        label, _, raw = line.partition('--')
+        if label.strip() == 'Frequencies' and not raw.startswith('-'):
+            freqs += raw.split()
+    freqs = np.array(freqs, dtype = float)
+    n_neg = int(np.sum(freqs < 0))
+    return {'n_negFreq': n_neg, 'neg_freq': freqs[0] if n_neg == 1 else 'NA', 'freqs': freqs}
+
+
+@register('thermo', ['Sum of electronic and zero-point Energies'],
+          ['electronic+ZPE', 'electronic+enthalpy', 'electronic+entropy', 'electronic+free'])
+def parse_thermo(lines):
+    values = [float(line.split('=')[1]) for line in islice(lines, 4)]
+    return dict(zip(EXTRACTORS['thermo'].headers, values))
+
+
+def to_seconds(line):
+    """Seconds of g09 time line (days, hours, minutes, seconds)."""
+
+    d, h, m, s = [float(x) for x in re.findall(r'[\d.]+', line.split(':', 1)[1])[:4]]
+    return ((d * 24 + h) * 60 + m) * 60 + s
+
+
+@register('timing', ['Job cpu time:'], ['cpu_time', 'elapsed_time'])
+def parse_timing(lines):
+    cpu = to_seconds(next(lines))
+    line = next(lines, '')
+    return {'cpu_time': cpu,
+            'elapsed_time': to_seconds(line) if 'Elapsed time' in line else 'NA'}
+
+
+@register('charges', ['Mulliken charges:', 'Mulliken charges and spin densities:'])
+def parse_charges(lines):
+    next(lines)
+    next(lines) # column numbers
+    charges = []
+    for line in lines:
+        if 'Sum of Mulliken' in line:
+            break
+        charges.append(float(line.split()[2]))
+    return {'charges': np.array(charges)}
+
+
+@register('dipole', ['Dipole moment (field-independent basis, Debye)'],
+          ['dipole_x', 'dipole_y', 'dipole_z', 'dipole'])
+def parse_dipole(lines):
+    next(lines)
+    values = [float(x) for x in next(lines).split()[1::2]]
+    return dict(zip(EXTRACTORS['dipole'].headers, values))
+
+
+#%% mapped files
+
+@contextmanager
+def map_file(g09out):
+    """Context manager: g09 output file memory mapped for reading (bytes
+    for empty files, which can not be mapped)."""
+
+    with open(g09out, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b''
+            return
+        buf = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        try:
+            yield buf
+        finally:
+            buf.close()
+
+
+def line_start(buf, pos):
+    """Offset of start of line containing pos."""
+
+    return buf.rfind(b'\n', 0, pos) + 1
+
+
+def tail_lines(buf, n):
+    """Last n lines of mapped file (decoded), trailing blank lines left out."""
+
+    end = len(buf)
+    while end and buf[end-1:end].isspace():
+        end -= 1
+    start = end
+    for i in range(n):
+        start = buf.rfind(b'\n', 0, start)
+        if start == -1:
+            break
+
+    return buf[start + 1:end].decode('utf-8', errors = 'replace').splitlines()
+
+
+def scan(buf, markers):
+    """Locate all markers (dictionary name: bytes) in mapped file in one
+    pass. Out: dictionary name: list of offsets of matches."""
+
+    names = {pattern: name for name, pattern in markers.items()}
+    regex = re.compile(b'|'.join(re.escape(p) for p in markers.values()))
+
+    offsets = {name: [] for name in markers}
+    for match in regex.finditer(buf):
+        offsets[names[match.group()]].append(match.start())
+
+    return offsets
+
+
+#%% line sources
+
+class FileSource():
+    """g09 output file, memory mapped. Positions are byte offsets of line
+    starts. Markers are searched in windows growing from the start or the
+    end, so markers that are not in the file (alternatives, like Input and
+    Standard orientation) do not make a marker near the end cost a scan of
+    the whole file."""
+
+    def __init__(self, buf, block = 65536):
+        self.buf = buf
+        self.block = block
+
+    def first(self, markers):
+        """Position of first line with one of markers (None if not found)."""
+
+        markers = [m.encode() for m in markers]
+        lo, size = 0, self.block
+        while lo < len(self.buf):
+            hi = min(len(self.buf), lo + size)
+            found = [pos for pos in (self.buf.find(m, lo, hi + len(m) - 1) for m in markers)
+                     if pos != -1]
+            if found:
+                return line_start(self.buf, min(found))
+            lo, size = hi, size * 2
+
+        return None
+
+    def last(self, markers, end = None):
+        """Position of last line with one of markers, starting before end
+        (None if not found)."""
+
+        markers = [m.encode() for m in markers]
+        end = len(self.buf) if end is None else end
+        hi, size = end, self.block
+        while hi > 0:
+            lo = max(0, hi - size)
+            pos = max(self.buf.rfind(m, lo, min(end, hi + len(m) - 1)) for m in markers)
+            if pos != -1:
+                return line_start(self.buf, pos)
+            hi, size = lo, size * 2
+
+        return None
+
+    def forward(self, pos):
+        """Decoded lines from position to the end of the file, read lazily."""
+
+        while pos < len(self.buf):
+            end = self.buf.find(b'\n', pos)
+            end = len(self.buf) if end == -1 else end + 1
+            yield self.buf[pos:end].decode('utf-8', errors = 'replace')
+            pos = end
+
+
+class LineSource():
+    """g09 output already read into a list of lines (tar members, prefetched
+    files). Positions are line indices."""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def first(self, markers):
+        for i, line in enumerate(self.lines):
+            if any(m in line for m in markers):
+                return i
+        return None
+
+    def last(self, markers, end = None):
+        end = len(self.lines) if end is None else end
+        for i in range(end - 1, -1, -1):
+            if any(m in self.lines[i] for m in markers):
+                return i
+        return None
+
+    def forward(self, pos):
+        return islice(self.lines, pos, None)
+
+
+#%% scan
+
+def find(source, extractor):
+    """Parse block of last line with a marker of extractor (first line for
+    head extractors) in source. Parse errors (e.g. truncated blocks) go on
+    to the previous occurrence. Out: dictionary of values, None if not found."""
+
+    end = None
+    while True:
+        if extractor.head:
+            pos = source.first(extractor.markers) if end is None else None
+        else:
+            pos = source.last(extractor.markers, end)
+        if pos is None:
+            return None
+        try:
+            return extractor.parse(source.forward(pos))
+        except (StopIteration, ValueError, IndexError):
+            end = pos
+
+
+def extract(source, fields):
+    """Values of fields found in source (FileSource or LineSource).
+    Out: dictionary extractor name: dictionary of values."""
+
+    found = {}
+    for e in resolve(fields):
+        values = find(source, e)
+        if values is not None:
+            found[e.name] = values
+
+    return found
+
+
+def extract_file(g09out, fields):
+    """extract from g09 output file."""
+
+    with map_file(g09out) as buf:
+        return extract(FileSource(buf), fields)
+
+
+def extract_lines(lines, fields):
+    """extract from list of lines of g09 output."""
+
+    return extract(LineSource(lines), fields)
+
+
+#%% results
+
+def values(found, fields):
+    """Values of results columns of fields ('NA' if not found)."""
+
+    return [found.get(e.name, {}).get(h, 'NA') for e in resolve(fields) for h in e.headers]
+
+
+def get_molecule(found):
+    """Molecule object from found geometry (None if not found), with charge
+    and multiplicity if found."""
+
+    if 'geometry' not in found:
+        return None
+
+    geometry = found['geometry']
+    molecule = Molecule({i+1: xyz for i, xyz in enumerate(geometry['coords'])},
+                        {i+1: int(z) for i, z in enumerate(geometry['atom_types'])})
+    if '_specs' in found:
+        molecule.charge = found['_specs']['charge']
+        molecule.mult = found['_specs']['mult']
+
+    return molecule
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 30 10:05:51 2026
+
+@author: nat
+"""
+
+#g09fchk.py
+
+"""Read formatted checkpoint files (.fchk, from formchk) without parsing
+the whole file. Field headers are read from the memory-mapped file,
+jumping over array data (fixed width lines), giving an index of name: type,
+size and byte range of the data. Only the fields requested are decoded,
+each one with a single numpy call on its bytes.
+Fields (name: fchk field):
+    geometry: Current cartesian coordinates (converted to angstrom).
+    numbers: Atomic numbers.
+    charge, mult: Charge, Multiplicity.
+    energy: Total Energy.  scf: SCF Energy.
+    gradient: Cartesian Gradient (natoms, 3), hartree/bohr.
+    hessian: Cartesian Force Constants, as full (3natoms, 3natoms)
+    matrix, hartree/bohr^2.
+"""
+
+#%% modules
+
+import os
+import re
+import csv
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from molecule import Molecule
+
+
+#%% constants
+
+BOHR_ANGSTROM = 0.529177210903 # angstrom per bohr
+
+FIELDS = {'geometry': 'Current cartesian coordinates',
+          'numbers': 'Atomic numbers',
+          'charge': 'Charge',
+          'mult': 'Multiplicity',
+          'energy': 'Total Energy',
+          'scf': 'SCF Energy',
+          'gradient': 'Cartesian Gradient',
+          'hessian': 'Cartesian Force Constants'}
+
+SCALARS = ('charge', 'mult', 'energy', 'scf')
+
+# width of values and values per line of arrays of each type
+WIDTHS = {'I': (12, 6), 'R': (16, 5), 'C': (12, 5), 'L': (1, 72)}
+
+# field header: name (40 columns), type, N= for arrays, value or size
+HEADER = re.compile(rb'^([A-Za-z][^\n]{39})   ([IRCLH])   (N=)?\s*(\S+)[ \t]*\r?$', re.M)
+
+
+#%% index
+
+def index_fchk(data):
+    """Index of fields of fchk file contents (bytes or mmap).
+    Array data is skipped using its fixed width (WIDTHS); if the next field
+    is not where expected, it is searched for.
+    Out: dictionary field name: (type, is array, value or size, start, end),
+    where start:end is the byte range of the array data."""
+
+    newline = 2 if data[:data.find(b'\n') + 1].endswith(b'\r\n') else 1
+    index = {}
+    previous = None
+    match = HEADER.search(data)
+    while match:
+        if previous:
+            index[previous] = index[previous][:4] + (match.start(),)
+        name = match.group(1).decode().strip()
+        kind, array, value = match.group(2).decode(), bool(match.group(3)), match.group(4).decode()
+        index[name] = (kind, array, value, match.end(), len(data))
+        previous = name
+
+        pos = match.end() + newline
+        if array and kind in WIDTHS:
+            width, per_line = WIDTHS[kind]
+            full, rest = divmod(int(value), per_line)
+            pos += full * (width * per_line + newline) + (rest * width + newline if rest else 0)
+        if pos >= len(data):
+            break
+        match = HEADER.match(data, pos) or HEADER.search(data, match.end())
+
+    return index
+
+
+def decode(data, entry):
+    """Decode field of index entry from fchk contents."""
+
+    kind, array, value, start, end = entry
+
+    if not array:
+        return int(value) if kind == 'I' else float(value) if kind == 'R' else value
+
+    size = int(value)
+    if kind in ('I', 'R'):
+        values = np.fromstring(bytes(data[start:end]), dtype = np.int64 if kind == 'I' else float,
+                               sep = ' ')
+        if len(values) != size:
+            raise ValueError(f'Expected {size} values, found {len(values)}.')
+        return values
+    if kind == 'L':
+        return np.array(bytes(data[start:end]).split()) == b'T'
+
+    # character arrays, 12 columns per value
+    return ''.join(line[:60].decode() for line in bytes(data[start:end]).splitlines()).strip()
+
+
+def full_hessian(lower):
+    """Full symmetric matrix from lower triangle (row by row)."""
+
+    n = int((np.sqrt(8 * len(lower) + 1) - 1) / 2)
+    hessian = np.zeros((n, n))
+    hessian[np.tril_indices(n)] = lower
+
+    return hessian + np.tril(hessian, -1).T
+
+
+#%% read fchk
+
+class FChk():
+    """Formatted checkpoint file, memory-mapped and indexed on opening.
+    Use get(field) for fields of FIELDS or fchk field names, as context
+    manager or call close()."""
+
+    def __init__(self, fchk_file):
+        self.file = open(fchk_file, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.title = self.data[:self.data.find(b'\n')].decode().strip()
+        self.index = index_fchk(self.data)
+
+    def get(self, field):
+        name = FIELDS.get(field, field)
+        if name not in self.index:
+            raise KeyError(f'{name} not found in fchk file.')
+
+        value = decode(self.data, self.index[name])
+        if field == 'geometry':
+            return value.reshape(-1, 3) * BOHR_ANGSTROM
+        if field == 'gradient':
+            return value.reshape(-1, 3)
+        if field == 'hessian':
+            return full_hessian(value)
+
+        return value
+
+    def molecule(self):
+        """Molecule object with geometry, charge and mult."""
+
+        coords = self.get('geometry')
+        numbers = self.get('numbers')
+        molecule = Molecule({n: xyz for n, xyz in enumerate(coords, 1)},
+                            {n: int(z) for n, z in enumerate(numbers, 1)})
+        molecule.charge = self.get('charge')
+        molecule.mult = self.get('mult')
+
+        return molecule
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_fchk(fchk_file, fields = ('geometry', 'numbers', 'charge', 'mult', 'energy')):
+    """Read fields (see FIELDS) of fchk file. Fields not in the file are None.
+    Out: dictionary field: value."""
+
+    with FChk(fchk_file) as fchk:
+        return {field: fchk.get(field) if FIELDS.get(field, field) in fchk.index else None
+                for field in fields}
+
+
+def fchk_task(fchk_file, fields):
+    """read_fchk with errors returned. Out: dictionary or None, error."""
+
+    try:
+        return read_fchk(fchk_file, fields), None
+    except Exception as e:
+        return None, str(e)
+
+
+#%% main function
+
+def main(path, fchk_files = None, extension = '.fchk',
+         fields = ('geometry', 'numbers', 'charge', 'mult', 'energy'), workers = None):
+    """Read fields of fchk files in path (by default, all files with
+    extension), concurrently. Scalar fields are written in fchk_results.csv
+    in path, arrays in fchk/<name>.npz. Returns dictionary filename: fields."""
+
+    if not fchk_files:
+        fchk_files = sorted(x for x in os.listdir(path) if x.endswith(extension))
+
+    if len(fchk_files) == 0:
+        raise ValueError(f'No files of extension {extension} found.')
+
+    arrays = [x for x in fields if x not in SCALARS]
+    scalars = [x for x in fields if x in SCALARS]
+    if arrays:
+        os.makedirs(os.path.join(path, 'fchk'), exist_ok = True)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        for file, (out, error) in zip(fchk_files,
+                                      pool.map(fchk_task, [os.path.join(path, x) for x in fchk_files],
+                                               [fields]*len(fchk_files))):
+            if error:
+                print(f'Could not read {file}. Error: {error}')
+                continue
+            results[file] = out
+            found = {x: out[x] for x in arrays if out[x] is not None}
+            if found:
+                np.savez(os.path.join(path, 'fchk', file.rsplit('.', 1)[0] + '.npz'), **found)
+
+    if scalars:
+        with open(os.path.join(path, 'fchk_results.csv'), 'w', newline = '') as f:
+            writer = csv.writer(f)
+            writer.writerow(['filename'] + scalars)
+            for file, out in results.items():
+                writer.writerow([file] + ['NA' if out[x] is None else out[x] for x in scalars])
+
+    print(f'{len(results)} of {len(fchk_files)} fchk files read.')
+
+    return results
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09fchk',
+                               description = 'Read fields of formatted checkpoint files (.fchk).')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory with fchk files')
+    parser.add_argument('-e', '--ext', type = str, default = '.fchk',
+                        help = 'extension of fchk files')
+    parser.add_argument('-f', '--fields', type = str, nargs = '+',
+                        default = ['geometry', 'numbers', 'charge', 'mult', 'energy'],
+                        help = f'fields to read: {", ".join(FIELDS)}')
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of files read at a time')
+
+    args = parser.parse_args()
+
+    main(args.path, extension = args.ext, fields = args.fields, workers = args.workers)
@@ -12,6 +12,8 @@ Created on Thu Jul 22 12:21:48 2021
 
 #%% modules
 
+import numpy as np
+
 from g09opt import get_SCF
 
 #%% get frequencies 
@@ -28,6 +30,58 @@ def get_freq(freq_job):
     
     return freqs
 
+# labels of lines with one value per mode, and key in get_modes output
+MODE_LABELS = {'Frequencies': 'freqs',
+               'Red. masses': 'red_masses',
+               'Frc consts': 'frc_consts',
+               'IR Inten': 'ir_intens'}
+
+def get_modes(freq_job):
+    """From parsed g09 frequency job, get all frequencies and normal modes
+    in one pass over the lines (standard format, hpmodes section is skipped).
+    Out: dictionary with np.arrays:
+        freqs: frequencies (cm-1), shape (nmodes,)
+        red_masses: reduced masses (AMU), shape (nmodes,)
+        frc_consts: force constants (mDyne/A), shape (nmodes,)
+        ir_intens: IR intensities (KM/Mole), shape (nmodes,)
+        displacements: normal mode displacements, shape (nmodes, natoms, 3)
+    """
+    
+    values = {key: [] for key in MODE_LABELS.values()}
+    blocks = []
+    block = None # atom rows of current displacement block
+    
+    for line in freq_job:
+        if block is not None:
+            row = line.split()
+            if len(row) > 2 and row[0].isdigit():
+                block.append(row[2:])
+                continue
+            # end of block: (natoms, modes, 3) to (modes, natoms, 3)
+            block = np.array(block, dtype = float)
+            blocks.append(block.reshape(len(block), -1, 3).swapaxes(0, 1))
+            block = None
+        
+        if '--' in line:
+            label, _, raw = line.partition('--')
+            label = label.strip()
+            if label in MODE_LABELS and not raw.startswith('-'):
+                values[MODE_LABELS[label]] += raw.split()
+        elif line.strip().startswith('Atom  AN'):
+            block = []
+    
+    if block:
+        block = np.array(block, dtype = float)
+        blocks.append(block.reshape(len(block), -1, 3).swapaxes(0, 1))
+    
+    modes = {key: np.array(vals, dtype = float) for key, vals in values.items()}
+    if blocks:
+        modes['displacements'] = np.concatenate(blocks)
+    else:
+        modes['displacements'] = np.zeros((0, 0, 3))
+    
+    return modes
+
 def get_Nneg(freqs):
     """returns number of negative frequencies from freq list."""
     
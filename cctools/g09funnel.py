@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 11:40:27 2026
+
+@author: nat
+"""
+
+#g09funnel.py
+
+"""Multi-level screening funnel: HCS conformers (or g09 inputs) go through a
+list of levels (method and job), and only the structures selected from the
+results of one level are run at the next one.
+The funnel is described in a JSON file, e.g.:
+    {"hcs": ["mol.hcs"], "charge": 0, "mult": 1,
+     "executor": "local", "command": "g09", "njobs": 4,
+     "levels": [
+        {"name": "pm6", "func": "PM6", "basis": "", "job": "opt"},
+        {"name": "dft", "func": "B3LYP", "basis": "6-31G*", "job": "opt freq",
+         "select": {"unique": true, "window": 3.0}},
+        {"name": "sp", "func": "M062X", "basis": "def2TZVP", "job": "",
+         "select": {"top": 3, "energy": "electronic+free"}}]}
+Instead of "hcs", "inputs" can be a directory of g09 inputs.
+Selection rules (applied to the results of the previous level, per
+molecule, in this order): unique (g09unique), window (kcal/mol above the
+lowest), top (K lowest). energy is the results column used (SCFenergy).
+Each level runs in subfolder <i>_<name> of the funnel directory, with
+the local executor (g09local) or by writing .sh files for SGE (write_sh,
+"executor": "sge", "time", "stage"). With SGE the funnel stops at the level
+that is waiting for jobs and continues from there when it is run again, or
+the whole funnel can be submitted as a chain of dependent jobs (g09chain).
+"""
+
+#%% modules
+
+import os
+import json
+
+import numpy as np
+
+import g09local, hcs_to_g09, proc_g09out, write_sh
+from ensemble import load_results, group_molecules, relative_energies, group_bounds
+from g09check import read_g09in
+from g09db import split_name
+from write_g09in import g09_job
+
+
+#%% levels
+
+def level_dir(funnel_dir, i, level):
+    """Directory of level i."""
+
+    return os.path.join(funnel_dir, f'{i}_{level["name"]}')
+
+
+def make_job(molecule, level):
+    """g09_job for molecule with method, job and resources of level."""
+
+    job = g09_job(molecule, level.get('nproc', 4), level.get('mem', 2), level['func'],
+                  level.get('basis', ''), level.get('job', ''))
+    job.comment = f'{molecule.title} {level["name"]}'
+
+    return job
+
+
+def next_name(filename, level):
+    """Input name for level from filename of previous level
+    (<mol>_c<i>_<level>.com)."""
+
+    mol, conf = split_name(os.path.basename(filename))
+    name = f'{mol}_c{conf}' if conf is not None else mol
+
+    return f'{name}_{level["name"]}.com'
+
+
+def optimized_geometry(path, filename):
+    """Molecule from results of g09 output filename in path: optimized
+    geometry written by proc_g09out in geometries subfolder, or the input
+    geometry for jobs without opt."""
+
+    name = filename.rsplit('.', 1)[0]
+    for g09in in (os.path.join(path, 'geometries', name + '_opt.com'),
+                  os.path.join(path, 'geometries', name + '_geom.com'),
+                  os.path.join(path, name + '.com')):
+        if os.path.exists(g09in):
+            return read_g09in(g09in)
+
+    raise FileNotFoundError(f'No geometry found for {filename}.')
+
+
+#%% selection
+
+def select(path, rules):
+    """Select structures from results of level in path (g09_results.csv)
+    with selection rules, per molecule.
+    Returns list of selected filenames, lowest energy first."""
+
+    table = load_results(os.path.join(path, 'g09_results.csv'))
+    energy = rules.get('energy', 'SCFenergy')
+    keep = ~np.isnan(table[energy])
+
+    if rules.get('unique'):
+        import g09unique
+        unique = set(g09unique.main(path, energy = energy,
+                                    energy_tol = rules.get('energy_tol', 0.1),
+                                    rmsd_tol = rules.get('rmsd_tol', 0.125)))
+        keep &= np.isin(table['filename'], list(unique))
+
+    filenames = table['filename'][keep]
+    energies = table[energy][keep]
+    if not len(filenames):
+        return []
+    molecules, groups = group_molecules(filenames)
+
+    if 'window' in rules:
+        relative, _ = relative_energies(energies, groups)
+        inside = relative <= rules['window']
+        filenames, energies, groups = filenames[inside], energies[inside], groups[inside]
+
+    order = np.lexsort((energies, groups))
+    if 'top' in rules:
+        # rank of each conformer within its molecule
+        _, starts = group_bounds(groups[order])
+        ranks = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        order = order[ranks < rules['top']]
+
+    return list(filenames[order])
+
+
+#%% build inputs
+
+def first_inputs(funnel, pathin, path, level):
+    """Write inputs of first level from HCS files or directory of inputs."""
+
+    if funnel.get('hcs'):
+        hcs_to_g09.main(funnel['hcs'], funnel.get('charge', 0), funnel.get('mult', 1),
+                        level.get('nproc', 4), level.get('mem', 2), level['func'],
+                        level.get('basis', ''), level.get('job', ''), pathin = pathin,
+                        pathout = path, suffix = level['name'], check = 'filter')
+        return
+
+    inputs = os.path.join(pathin, funnel['inputs'])
+    for g09in in sorted(x for x in os.listdir(inputs) if x.endswith('.com')):
+        molecule = read_g09in(os.path.join(inputs, g09in))
+        molecule.title = g09in.rsplit('.', 1)[0]
+        make_job(molecule, level).write_input(os.path.join(path, next_name(g09in, level)))
+
+
+def next_inputs(previous_path, selected, path, level):
+    """Write inputs of level from geometries of selected results of the
+    previous level."""
+
+    for filename in selected:
+        molecule = optimized_geometry(previous_path, filename)
+        molecule.title = filename.rsplit('.', 1)[0]
+        make_job(molecule, level).write_input(os.path.join(path, next_name(filename, level)))
+
+
+def prepare_level(funnel, pathin, funnel_dir, i):
+    """Create directory of level i with its inputs (from HCS files or inputs
+    for the first level, from selection of previous level otherwise), if it
+    does not exist yet. Returns directory of level."""
+
+    levels = funnel['levels']
+    level = levels[i]
+    path = level_dir(funnel_dir, i, level)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+        if i == 0:
+            first_inputs(funnel, pathin, path, level)
+        else:
+            previous = level_dir(funnel_dir, i-1, levels[i-1])
+            selected = select(previous, level.get('select', {}))
+            print(f'Level {level["name"]}: {len(selected)} structures selected.')
+            next_inputs(previous, selected, path, level)
+
+    return path
+
+
+def read_funnel(funnel_file, funnel_dir = None):
+    """Read JSON funnel_file. Out: funnel dictionary, directory of funnel
+    file (for relative paths in it), directory for the levels."""
+
+    with open(funnel_file) as f:
+        funnel = json.load(f)
+
+    pathin = os.path.dirname(os.path.abspath(funnel_file))
+
+    return funnel, pathin, funnel_dir or pathin
+
+
+#%% run levels
+
+def run_level(funnel, path):
+    """Run inputs of level in path with the funnel executor and process
+    outputs with proc_g09out. Returns True if the level is finished
+    (results written), False if jobs are still pending (SGE)."""
+
+    if os.path.exists(os.path.join(path, 'g09_results.csv')):
+        return True
+
+    g09_files = sorted(x for x in os.listdir(path) if x.endswith('.com'))
+
+    if funnel.get('executor', 'local') == 'local':
+        g09local.main(path, g09_files, command = funnel.get('command', 'g09'),
+                      njobs = funnel.get('njobs', 1))
+    else:
+        # jobs with a log are finished; failed ones are moved by proc_g09out
+        pending = [x for x in g09_files if not g09local.has_log(path, x)]
+        if pending:
+            if not any(x.endswith('.sh') for x in os.listdir(path)):
+                write_sh.main(path, funnel.get('time', '11:59:59'), pending,
+                              sh_name = funnel.get('sh_name', 'f'),
+                              stage = funnel.get('stage', False))
+            print(f'{len(pending)} jobs pending in {path}. Submit the .sh files and '
+                  f'run the funnel again when they are finished.')
+            return False
+
+    proc_g09out.main(path, get_sp = True)
+
+    return True
+
+
+#%% main function
+
+def main(funnel_file, funnel_dir = None):
+    """Run screening funnel described in JSON funnel_file (see module
+    docstring) in funnel_dir (default, directory of funnel_file).
+    Levels already finished are not run again.
+    Returns list of selected filenames of the last level, or None if the
+    funnel is waiting for SGE jobs."""
+
+    funnel, pathin, funnel_dir = read_funnel(funnel_file, funnel_dir)
+
+    levels = funnel['levels']
+    for i, level in enumerate(levels):
+        path = prepare_level(funnel, pathin, funnel_dir, i)
+
+        if not run_level(funnel, path):
+            return None
+        if not os.path.exists(os.path.join(path, 'g09_results.csv')):
+            print(f'No results for level {level["name"]}, funnel stopped.')
+            return None
+
+    final = select(level_dir(funnel_dir, len(levels) - 1, levels[-1]),
+                   funnel.get('select', {}))
+    print(f'{len(final)} structures at the end of the funnel.')
+
+    return final
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09funnel',
+                               description = 'Multi-level screening funnel of g09 jobs.')
+
+    parser.add_argument('funnel', type = str,
+                        help = 'JSON file describing the funnel levels')
+    parser.add_argument('-d', '--dir', type = str, default = None,
+                        help = 'directory for the levels. defaults to directory of funnel file')
+
+    args = parser.parse_args()
+
+    main(args.funnel, args.dir)
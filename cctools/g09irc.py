@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 15:22:40 2026
+
+@author: nat
+"""
+
+#g09irc.py
+
+"""Extract the reaction path of g09 IRC jobs: reaction coordinate, SCF energy
+and geometry of each converged point. Lines are read one at a time (only the
+last orientation block and SCF energy are kept), so large IRC outputs are
+processed in one pass without loading the file.
+Forward and reverse branches are merged into one path ordered by reaction
+coordinate (reverse branch negative, TS at 0), exported as .npz and as a
+multi-frame .xyz.
+"""
+
+#%% modules
+
+import os
+
+import numpy as np
+
+from molecule import periodic_table
+
+
+#%% read path
+
+def read_orientation(out):
+    """Read coordinate lines of orientation block from line iterator, after
+    the orientation title line. Out: list of raw coordinate lines."""
+
+    for i in range(4): # header lines
+        next(out)
+
+    raw_coords = []
+    for line in out:
+        if '---' in line:
+            break
+        raw_coords.append(line)
+
+    return raw_coords
+
+
+def raw_to_arrays(raw_coords):
+    """Convert raw g09 coordinate lines into np arrays of atom types (natoms)
+    and cartesian coordinates (natoms, 3)."""
+
+    values = np.array([line.split() for line in raw_coords], dtype = float)
+
+    return values[:, 1].astype(int), values[:, 3:6]
+
+
+def read_irc(g09out_lines, nosymm = False, reverse = False):
+    """Read IRC points from lines of g09 output (open file or any iterable
+    of lines), in one pass.
+    The geometry and SCF energy of a point are the last ones before its
+    'NET REACTION COORDINATE' line. The first geometry and energy of the
+    file are the TS (path 0, point 0, coordinate 0).
+    Path 1 is forward (positive coordinate) and path 2 reverse (negative),
+    if reverse = True (IRC=reverse) path 1 is reverse.
+    Out: list of (path, point, reaction coordinate, energy, types, coords)."""
+
+    marker = 'Input orientation' if nosymm else 'Standard orientation'
+    out = iter(g09out_lines)
+    points = {}
+    raw_coords = None
+    input_coords = None
+    energy = None
+    path = point = None
+
+    for line in out:
+        if marker in line:
+            raw_coords = read_orientation(out)
+        elif 'Input orientation' in line:
+            input_coords = read_orientation(out)
+        elif 'SCF Done' in line:
+            energy = float(line.split()[4])
+            if not points:
+                # TS, first geometry and energy of the file
+                points[(0, 0)] = (0.0, energy, raw_coords or input_coords)
+        elif 'Point Number' in line and 'Path Number' in line:
+            words = line.split()
+            point, path = int(words[2]), int(words[5])
+        elif 'NET REACTION COORDINATE' in line and point:
+            sign = -1 if (path == 2) != reverse else 1
+            # points can be printed again, last one is kept
+            points[(path, point)] = (sign * float(line.split('=')[1]), energy,
+                                     raw_coords or input_coords)
+
+    path_points = []
+    for (path, point), (rx_coord, energy, raw) in points.items():
+        if raw:
+            types, coords = raw_to_arrays(raw)
+            path_points.append((path, point, rx_coord, energy, types, coords))
+
+    return path_points
+
+
+def merge_path(path_points):
+    """Merge points of forward and reverse branches into one path ordered by
+    reaction coordinate.
+    Out: dictionary of np arrays: rx_coord, energy, path, point (npoints),
+    atom_types (natoms) and coords (npoints, natoms, 3)."""
+
+    if not path_points:
+        raise ValueError('No IRC points found.')
+
+    ordered = sorted(path_points, key = lambda p: p[2])
+
+    return {'rx_coord': np.array([p[2] for p in ordered]),
+            'energy': np.array([p[3] for p in ordered]),
+            'path': np.array([p[0] for p in ordered]),
+            'point': np.array([p[1] for p in ordered]),
+            'atom_types': ordered[0][4],
+            'coords': np.stack([p[5] for p in ordered])}
+
+
+def irc_path(g09out_lines, route):
+    """Ordered IRC path (see merge_path) from lines of g09 output, with
+    options taken from route line."""
+
+    route = route.lower()
+    reverse = 'reverse' in route and 'forward' not in route
+
+    return merge_path(read_irc(g09out_lines, 'nosymm' in route, reverse))
+
+
+#%% write path
+
+def write_npz(filename, irc):
+    """Write IRC path arrays to compressed .npz file."""
+
+    np.savez_compressed(filename, **irc)
+
+
+def write_xyz(filename, irc, title = ''):
+    """Write IRC path as multi-frame .xyz file, with reaction coordinate
+    and energy (hartree) in the comment line of each frame."""
+
+    symbols = [periodic_table[z] for z in irc['atom_types']]
+
+    with open(filename, 'w') as f:
+        for rx_coord, energy, coords in zip(irc['rx_coord'], irc['energy'], irc['coords']):
+            f.write(f'{len(symbols)}\n')
+            f.write(f'{title} rx_coord={rx_coord:.5f} energy={energy:.8f}\n')
+            for symbol, xyz in zip(symbols, coords):
+                f.write(f'{symbol} {xyz[0]:.8f} {xyz[1]:.8f} {xyz[2]:.8f}\n')
+
+
+def write_path(g09out_name, irc, pathout):
+    """Write <name>_irc.npz and <name>_irc.xyz in pathout."""
+
+    name = os.path.basename(g09out_name).rsplit('.', 1)[0]
+    write_npz(os.path.join(pathout, name + '_irc.npz'), irc)
+    write_xyz(os.path.join(pathout, name + '_irc.xyz'), irc, name)
+
+
+#%% main function
+
+def main(g09out, pathout = None):
+    """Extract IRC path from g09 output file and write .npz and .xyz files
+    in pathout (default, irc subfolder of the directory of the file).
+    The file is read once, line by line.
+    Returns IRC path dictionary (see merge_path)."""
+
+    from proc_g09out import read_jobs
+
+    if not pathout:
+        pathout = os.path.join(os.path.dirname(os.path.abspath(g09out)), 'irc')
+    os.makedirs(pathout, exist_ok = True)
+
+    with open(g09out) as out:
+        # read_jobs stops after route, reading continues from there
+        jobs, route = read_jobs(out)
+        if 'irc' not in jobs:
+            raise ValueError(f'{g09out} is not an IRC job.')
+        irc = irc_path(out, route)
+
+    write_path(g09out, irc, pathout)
+
+    return irc
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09irc',
+                               description = 'Extract reaction path of g09 IRC jobs into .npz and .xyz files.')
+
+    parser.add_argument('files', nargs = '+',
+                        help = 'g09 output files of IRC jobs')
+    parser.add_argument('-po', '--pathout', type = str, default = None,
+                        help = 'path for output files. defaults to irc subfolder of each file directory')
+
+    args = parser.parse_args()
+
+    for g09out in args.files:
+        irc = main(g09out, args.pathout)
+        print(f'{g09out}: {len(irc["energy"])} points, '
+              f'rx_coord {irc["rx_coord"][0]:.3f} to {irc["rx_coord"][-1]:.3f}')
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 10:12:03 2026
+
+@author: nat
+"""
+
+#g09local.py
+
+"""Run g09 input files on the local machine (workstation or interactive
+node), as an alternative to writing .sh files for SGE with write_sh.
+Inputs are run in their directory with `command < name.com > name.log`,
+with up to njobs jobs at a time. Inputs that already have a log ending in
+normal termination are skipped.
+"""
+
+#%% modules
+
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from proc_g09out import check_term
+
+
+#%% run jobs
+
+def log_name(g09in_file):
+    """Name of log file for g09 input file."""
+
+    return g09in_file.rsplit('.', 1)[0] + '.log'
+
+
+def run_job(path, g09in_file, command = 'g09'):
+    """Run g09 input file in path, output written in <name>.log.
+    Returns exit code."""
+
+    with open(os.path.join(path, g09in_file)) as g09in, \
+         open(os.path.join(path, log_name(g09in_file)), 'w') as log:
+        return subprocess.run([command], stdin = g09in, stdout = log,
+                              stderr = subprocess.STDOUT, cwd = path).returncode
+
+
+def done(path, g09in_file):
+    """True if log of g09 input file exists and ended in normal termination."""
+
+    log = log_name(g09in_file)
+
+    return os.path.exists(os.path.join(path, log)) and check_term(log, path)
+
+
+def has_log(path, g09in_file):
+    """True if g09 input file has a log, finished or not, in path or moved
+    to not_normal_term by proc_g09out."""
+
+    log = log_name(g09in_file)
+
+    return any(os.path.exists(os.path.join(path, folder, log)) for folder in ('', 'not_normal_term'))
+
+
+#%% main function
+
+def main(path, g09_files = None, extension = '.com', command = 'g09', njobs = 1):
+    """Run g09 input files in path (by default, all files with extension)
+    that do not have a finished log, njobs at a time.
+    Returns list of inputs whose jobs did not end in normal termination."""
+
+    if not g09_files:
+        g09_files = sorted(x for x in os.listdir(path) if x.endswith(extension))
+
+    pending = [x for x in g09_files if not done(path, x)]
+    print(f'Running {len(pending)} of {len(g09_files)} jobs ({njobs} at a time).')
+
+    with ThreadPoolExecutor(max_workers = njobs) as pool:
+        codes = list(pool.map(run_job, [path]*len(pending), pending,
+                              [command]*len(pending)))
+
+    failed = [x for x, code in zip(pending, codes) if code or not done(path, x)]
+    for g09in_file in failed:
+        print(f'{g09in_file} did not end in normal termination.')
+
+    return failed
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09local',
+                               description = 'Run g09 input files on the local machine.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory with g09 input files')
+    parser.add_argument('-e', '--ext', type = str, default = '.com',
+                        help = 'extension of g09 input files')
+    parser.add_argument('-c', '--command', type = str, default = 'g09',
+                        help = 'g09 executable (g09, g16)')
+    parser.add_argument('-j', '--njobs', type = int, default = 1,
+                        help = 'number of jobs run at a time')
+
+    args = parser.parse_args()
+
+    main(args.path, extension = args.ext, command = args.command, njobs = args.njobs)
@@ -67,7 +67,7 @@ def check_opt(opt_steps):
 def get_SCF(opt_step):
     """Get SCF Energy from the lines of an optimization step.
     In: list with chunk of lines for opt step.
-    Out: energy (float) in hartrees.
+    Out: energy in hartrees, as printed by g09 (string).
     If energy is not found, returns 0.0"""
     
     SCFenergy = 0.0
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 10:05:31 2026
+
+@author: nat
+"""
+
+#g09pes.py
+
+"""Extract relaxed potential energy surface scans (opt=modredundant with S
+coordinates) from g09 outputs. Each 'Optimization completed' point is
+collected with its SCF energy and geometry in one pass over the lines (only
+the last orientation block and energy are kept), and placed on a 1-D or 2-D
+grid from the value of the scanned coordinates in its geometry.
+Bonds (B), angles (A) and dihedrals (D) can be scanned.
+"""
+
+#%% modules
+
+import os
+import re
+
+import numpy as np
+
+from g09irc import read_orientation, raw_to_arrays
+
+
+#%% scan coordinates
+
+ATOMS_PER_COORD = {'B': 2, 'A': 3, 'D': 4}
+
+# any ModRedundant coordinate line (scanned, frozen, added...): type and atom
+MODREDUNDANT = re.compile(r'\s*[BADLOX*]\s+(\d+|\*)(\s|$)', re.I)
+
+
+def parse_modredundant(line):
+    """Scan coordinate from ModRedundant input line, e.g. 'D 1 2 3 4 S 36 10.0'.
+    Out: dictionary with type, atoms (0-based indices), nsteps and step size,
+    or None if line is not a supported scan coordinate."""
+
+    words = line.replace('=', ' ').split()
+    if not words or words[0].upper() not in ATOMS_PER_COORD or 'S' not in words[1:]:
+        return None
+
+    kind = words[0].upper()
+    natoms = ATOMS_PER_COORD[kind]
+    s = words.index('S', 1)
+
+    return {'type': kind,
+            'atoms': [int(x) - 1 for x in words[1:natoms + 1]],
+            'nsteps': int(words[s + 1]),
+            'step': float(words[s + 2])}
+
+
+def measure(coords, scan_coord):
+    """Value of scan coordinate for array of geometries (npoints, natoms, 3):
+    bond length (angstrom), angle or dihedral (degrees). Dihedrals follow
+    the IUPAC sign convention (as g09, clockwise looking along 2->3 is +):
+    >>> coords = np.array([[[1, 0, 0], [0, 0, 0], [0, 0, 1], [0, 1, 1]]], dtype = float)
+    >>> measure(coords, {'type': 'D', 'atoms': [0, 1, 2, 3]})
+    array([90.])
+    """
+
+    p = [coords[:, i] for i in scan_coord['atoms']]
+
+    if scan_coord['type'] == 'B':
+        return np.linalg.norm(p[1] - p[0], axis = -1)
+
+    if scan_coord['type'] == 'A':
+        u, v = p[0] - p[1], p[2] - p[1]
+        cos = np.sum(u*v, axis = -1) / (np.linalg.norm(u, axis = -1) * np.linalg.norm(v, axis = -1))
+        return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+    b0, b1, b2 = p[1] - p[0], p[2] - p[1], p[3] - p[2]
+    n0, n1 = np.cross(b0, b1), np.cross(b1, b2)
+    y = np.linalg.norm(b1, axis = -1) * np.sum(b0*n1, axis = -1)
+
+    return np.degrees(np.arctan2(y, np.sum(n0*n1, axis = -1)))
+
+
+def grid_index(values, start, step, npoints, periodic):
+    """Index of values on grid start + k*step (k < npoints). Out of grid
+    values get -1. Differences of periodic coordinates (degrees) are
+    wrapped to (-180, 180]."""
+
+    delta = values - start
+    if periodic:
+        delta = (delta + 180) % 360 - 180
+        # wrapped delta has the sign of the steps
+        delta = np.where(delta * step < 0, delta + np.sign(step) * 360, delta)
+    k = np.rint(delta / step).astype(int)
+
+    return np.where((k >= 0) & (k < npoints), k, -1)
+
+
+#%% read scan
+
+def read_scan(g09out_lines, nosymm = False):
+    """Read scan coordinates and optimized points from lines of g09 output
+    (open file or any iterable of lines), in one pass.
+    Out: list of scan coordinates (see parse_modredundant), first geometry
+    (types, coords) and list of (energy, types, coords) of optimized points."""
+
+    marker = 'Input orientation' if nosymm else 'Standard orientation'
+    out = iter(g09out_lines)
+    scan_coords = []
+    first = None
+    points = []
+    raw_coords = input_coords = None
+    energy = None
+
+    for line in out:
+        if marker in line:
+            raw_coords = read_orientation(out)
+            first = first or raw_coords
+        elif 'Input orientation' in line:
+            input_coords = read_orientation(out)
+            first = first or input_coords
+        elif 'SCF Done' in line:
+            energy = float(line.split()[4])
+        elif 'Optimization completed' in line:
+            points.append((energy, raw_coords or input_coords))
+        elif 'ModRedundant input section has been read' in line:
+            # section ends at the first line that is not a coordinate
+            for line in out:
+                if not MODREDUNDANT.match(line):
+                    break
+                scan_coord = parse_modredundant(line)
+                if scan_coord:
+                    scan_coords.append(scan_coord)
+
+    if not scan_coords:
+        raise ValueError('No scan coordinates found in ModRedundant input.')
+    if not points:
+        raise ValueError('No optimized points found.')
+
+    return (scan_coords, raw_to_arrays(first),
+            [(energy, *raw_to_arrays(raw)) for energy, raw in points])
+
+
+def grid_scan(scan_coords, first, points):
+    """Place optimized points on the grid of scan coordinates (1-D or 2-D).
+    Grid values start at the value of each coordinate in the first geometry.
+    Out: dictionary of np arrays: axis0 (and axis1) with coordinate values,
+    energy (grid shape) and coords (grid shape, natoms, 3), NaN where no
+    point was found, values of the coordinates for each point (values,
+    npoints x ncoords), atom_types."""
+
+    if len(scan_coords) > 2:
+        raise ValueError('Only 1-D and 2-D scans can be gridded.')
+
+    types = points[0][1]
+    coords = np.stack([p[2] for p in points])
+    energies = np.array([p[0] for p in points])
+    shape = tuple(c['nsteps'] + 1 for c in scan_coords)
+
+    grid = {'atom_types': types,
+            'energy': np.full(shape, np.nan),
+            'coords': np.full(shape + coords.shape[1:], np.nan),
+            'values': np.empty((len(points), len(scan_coords)))}
+
+    indices = []
+    for i, scan_coord in enumerate(scan_coords):
+        start = measure(first[1][None], scan_coord)[0]
+        values = measure(coords, scan_coord)
+        periodic = scan_coord['type'] != 'B'
+        if periodic and len(scan_coords) == 1:
+            # points of 1-D scans are consecutive, angles are unwrapped 
+            # along the scan (full rotations stay on the grid)
+            values = np.degrees(np.unwrap(np.radians(np.r_[start, values])))[1:]
+            periodic = False
+        grid['values'][:, i] = values
+        grid[f'axis{i}'] = start + scan_coord['step'] * np.arange(shape[i])
+        indices.append(grid_index(values, start, scan_coord['step'], shape[i], periodic))
+
+    valid = np.all(np.array(indices) >= 0, axis = 0)
+    index = tuple(k[valid] for k in indices)
+    # later points overwrite earlier ones at the same grid position
+    grid['energy'][index] = energies[valid]
+    grid['coords'][index] = coords[valid]
+
+    return grid
+
+
+def scan_grid(g09out_lines, route):
+    """Gridded scan (see grid_scan) from lines of g09 output, with options
+    taken from route line."""
+
+    return grid_scan(*read_scan(g09out_lines, 'nosymm' in route.lower()))
+
+
+def write_npz(g09out_name, grid, pathout):
+    """Write <name>_scan.npz in pathout."""
+
+    name = os.path.basename(g09out_name).rsplit('.', 1)[0]
+    np.savez_compressed(os.path.join(pathout, name + '_scan.npz'), **grid)
+
+
+#%% main function
+
+def main(g09out, pathout = None):
+    """Extract relaxed scan from g09 output file and write .npz file in
+    pathout (default, scan subfolder of the directory of the file).
+    The file is read once, line by line.
+    Returns scan grid dictionary (see grid_scan)."""
+
+    from proc_g09out import read_jobs
+
+    if not pathout:
+        pathout = os.path.join(os.path.dirname(os.path.abspath(g09out)), 'scan')
+    os.makedirs(pathout, exist_ok = True)
+
+    with open(g09out) as out:
+        jobs, route = read_jobs(out)
+        if 'modredundant' not in route.lower():
+            raise ValueError(f'{g09out} is not a modredundant optimization.')
+        # ModRedundant section is echoed after route, reading continues from there
+        grid = scan_grid(out, route)
+
+    write_npz(g09out, grid, pathout)
+
+    return grid
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09pes',
+                               description = 'Extract relaxed PES scans of g09 outputs into gridded .npz files.')
+
+    parser.add_argument('files', nargs = '+',
+                        help = 'g09 output files of opt=modredundant scan jobs')
+    parser.add_argument('-po', '--pathout', type = str, default = None,
+                        help = 'path for output files. defaults to scan subfolder of each file directory')
+
+    args = parser.parse_args()
+
+    for g09out in args.files:
+        grid = main(g09out, args.pathout)
+        found = np.count_nonzero(~np.isnan(grid['energy']))
+        print(f'{g09out}: {found} of {grid["energy"].size} grid points, '
+              f'lowest energy {np.nanmin(grid["energy"])}')
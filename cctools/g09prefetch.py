@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:14:52 2026
+
+@author: nat
+"""
+
+#g09prefetch.py
+
+"""Concurrent reading of g09 output files for high latency (network)
+filesystems. Each file is read once by a pool of I/O threads, with a bounded
+number of reads in flight, and handed to the parsers in the original order.
+The window of pending reads is the queue between I/O and parsing: when parsers
+fall behind, no new reads are started (backpressure), so memory stays bounded.
+Includes a benchmark that injects artificial latency into file reads.
+"""
+
+#%% modules
+
+import os
+import time
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+#%% read files
+
+def read_lines(filename, latency = 0.0):
+    """Read whole file with one open/read and return list of lines.
+    latency (s) is added before opening the file, to simulate network
+    filesystems in benchmarks."""
+
+    if latency:
+        time.sleep(latency)
+
+    with open(filename, 'rb') as f:
+        raw = f.read()
+
+    return raw.decode('utf-8', errors = 'replace').splitlines(keepends = True)
+
+
+def prefetch(path, g09_files, max_inflight = 16, latency = 0.0):
+    """Generator. Reads g09_files (in path) with up to max_inflight
+    concurrent reads and yields (filename, lines) in the order of g09_files.
+    A new read is only started when a file is handed to the consumer."""
+
+    with ThreadPoolExecutor(max_workers = max_inflight) as pool:
+        pending = deque()
+        files = iter(g09_files)
+
+        for filename in files:
+            pending.append((filename, pool.submit(read_lines, os.path.join(path, filename),
+                                                  latency)))
+            if len(pending) >= max_inflight:
+                break
+
+        while pending:
+            filename, future = pending.popleft()
+            lines = future.result()
+            for new_file in files:
+                pending.append((new_file, pool.submit(read_lines, os.path.join(path, new_file),
+                                                      latency)))
+                break
+            yield filename, lines
+
+
+def map_files(func, path, g09_files, max_inflight = 16, latency = 0.0, args = ()):
+    """Generator. Applies func(filename, lines, *args) to prefetched files and
+    yields (filename, result) in order (same interface as g09tar.map_members)."""
+
+    for filename, lines in prefetch(path, g09_files, max_inflight, latency):
+        yield filename, func(filename, lines, *args)
+
+
+#%% benchmark
+
+def serial_proc(path, filename, pathout, latency):
+    """Process file as proc_g09out.main does without prefetching: tail,
+    route and full file are read one after another, each with latency."""
+
+    import proc_g09out
+
+    file = os.path.join(path, filename)
+    time.sleep(latency)
+    if not proc_g09out.check_term(filename, path):
+        return 'not_normal_term', None
+    time.sleep(latency)
+    jobs, route = proc_g09out.get_jobs(file)
+    time.sleep(latency)
+    parsed_out = proc_g09out.parse_file(file, jobs)
+
+    return 'ok', proc_g09out.parsed_proc(filename, jobs, route, parsed_out, pathout, False)
+
+
+def benchmark(path, extension = '.log', latency = 0.005, max_inflight = 16):
+    """Compare processing time of g09 files in path without and with
+    prefetching, adding latency (s) to every file open.
+    Geometries are written in a temporary directory, files are not moved.
+    Out: (serial time, prefetch time) in s."""
+
+    from proc_g09out import member_proc
+
+    g09_files = sorted(x for x in os.listdir(path) if x.endswith(extension))
+
+    with tempfile.TemporaryDirectory() as pathout:
+        start = time.perf_counter()
+        for filename in g09_files:
+            serial_proc(path, filename, pathout, latency)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in map_files(member_proc, path, g09_files, max_inflight, latency,
+                           (pathout, False, False)):
+            pass
+        prefetched = time.perf_counter() - start
+
+    print(f'{len(g09_files)} files, latency {latency*1000:g} ms per open')
+    print(f'serial:   {serial:.3f} s')
+    print(f'prefetch: {prefetched:.3f} s ({max_inflight} reads in flight)')
+
+    return serial, prefetched
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09prefetch',
+                               description = 'Benchmark g09 output processing with simulated filesystem latency.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory with g09 output files')
+    parser.add_argument('-e', '--ext', type = str, default = '.log',
+                        help = 'extension of g09 output files')
+    parser.add_argument('-l', '--latency', type = float, default = 5.0,
+                        help = 'latency added to each file open, in ms')
+    parser.add_argument('-n', '--inflight', type = int, default = 16,
+                        help = 'maximum number of concurrent reads')
+
+    args = parser.parse_args()
+
+    benchmark(args.path, extension = args.ext, latency = args.latency / 1000,
+              max_inflight = args.inflight)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:37:10 2026
+
+@author: nat
+"""
+
+#g09restart.py
+
+"""Write restart g09 inputs from the last geometry of incomplete or failed
+optimizations, with the original route, charge, multiplicity and Link0 lines
+(%chk, %Mem in its original units, %nprocshared...).
+The log is memory mapped and searched backwards for the last complete
+orientation block, so only the start and the end of the file are read.
+"""
+
+#%% modules
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from g09extract import map_file
+from g09opt import raw_to_coord
+from molecule import Molecule
+from write_g09in import g09_job
+
+
+#%% read header
+
+def read_header(buf):
+    """Get route line, charge, multiplicity and Link0 lines (as written in
+    the input, e.g. %chk, %Mem, %nprocshared) from start of g09 output
+    (bytes or mmap). Defaults: charge 0, mult 1, no Link0 lines."""
+
+    specs = {'route': None, 'charge': 0, 'mult': 1, 'link0': []}
+
+    pos = 0
+    while specs['route'] is None:
+        end = buf.find(b'\n', pos)
+        if end == -1:
+            break
+        line = buf[pos:end].decode('utf-8', errors = 'replace').strip()
+        pos = end + 1
+
+        if line.startswith('%'):
+            specs['link0'].append(line)
+        elif line.startswith('#'):
+            # route can continue in following lines until dashes
+            route = line
+            while True:
+                end = buf.find(b'\n', pos)
+                line = buf[pos:end].decode('utf-8', errors = 'replace').strip()
+                pos = end + 1
+                if line.startswith('-') or end == -1:
+                    break
+                route += line
+            specs['route'] = route
+
+    charge = buf.find(b'Charge =')
+    if charge != -1:
+        line = buf[charge:buf.find(b'\n', charge)].split()
+        specs['charge'], specs['mult'] = int(line[2]), int(line[5])
+
+    return specs
+
+
+def link0_key(line):
+    """Keyword of Link0 line, lowercase (%nproc as %nprocshared)."""
+
+    key = line[1:].split('=')[0].strip().lower()
+
+    return 'nprocshared' if key == 'nproc' else key
+
+
+#%% read last geometry backwards
+
+def last_orientation(buf, nosymm = False):
+    """Raw coordinate lines of last complete orientation block of g09 output
+    (bytes or mmap), searching from the end of the file.
+    Standard orientation is used, Input orientation if nosymm = True or
+    there is no Standard orientation. Returns empty list if none is found."""
+
+    markers = [b'Input orientation'] if nosymm else [b'Standard orientation',
+                                                     b'Input orientation']
+    for marker in markers:
+        end = len(buf)
+        while True:
+            offset = buf.rfind(marker, 0, end)
+            if offset == -1:
+                break
+            pos = offset
+            for i in range(5): # orientation title and 4 header lines
+                pos = buf.find(b'\n', pos)
+                if pos == -1:
+                    break
+                pos += 1
+            block_end = buf.find(b'\n -', pos) if pos != -1 else -1
+            if block_end != -1:
+                raw = buf[pos:block_end].decode('ascii', errors = 'replace').splitlines()
+                if raw and all(len(line.split()) == 6 for line in raw):
+                    return raw
+            # block truncated at end of file, try previous one
+            end = offset
+
+    return []
+
+
+#%% restart input
+
+def restart_input(g09out, pathout):
+    """Write restart input <name>_restart.com in pathout from last geometry
+    of g09 output file. Returns name of written file."""
+
+    with map_file(g09out) as buf:
+        specs = read_header(buf)
+        if not specs['route']:
+            raise ValueError('Route line not found.')
+        raw = last_orientation(buf, 'nosymm' in specs['route'].lower())
+        if not raw:
+            raise ValueError('No complete orientation block found.')
+
+    coords, types = raw_to_coord(raw)
+    molecule = Molecule(coords, types)
+    molecule.charge = specs['charge']
+    molecule.mult = specs['mult']
+
+    name = os.path.basename(g09out).rsplit('.', 1)[0]
+    job = g09_job(molecule)
+    job.route = specs['route']
+    # Link0 lines of the job, g09_job defaults for %nprocshared and %Mem if missing
+    keys = {link0_key(line) for line in specs['link0']}
+    job.link0 = specs['link0'] + [line for line in job.get_link0() if link0_key(line) not in keys]
+    job.comment = f'restart from last geometry of {name}'
+
+    input_name = name + '_restart.com'
+    job.write_input(os.path.join(pathout, input_name))
+
+    return input_name
+
+
+def restart_task(g09out, pathout):
+    """restart_input for thread pool, errors are returned instead of raised."""
+
+    try:
+        return restart_input(g09out, pathout), None
+    except Exception as e:
+        return None, str(e)
+
+
+#%% main function
+
+def main(path, g09_files = None, extension = '.log', pathout = None, workers = None):
+    """Write restart inputs for g09 output files (by default, all files in
+    path/not_normal_term) in pathout (default path/restart), in parallel.
+    Returns list of written input files."""
+
+    if not g09_files:
+        error_path = os.path.join(path, 'not_normal_term')
+        g09_files = [os.path.join('not_normal_term', x) for x in os.listdir(error_path)
+                     if x.endswith(extension)]
+
+    if not pathout:
+        pathout = os.path.join(path, 'restart')
+    os.makedirs(pathout, exist_ok = True)
+
+    written = []
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        files = [os.path.join(path, x) for x in g09_files]
+        for file, (input_name, error) in zip(g09_files, pool.map(restart_task, files,
+                                                                  [pathout]*len(files))):
+            if error:
+                print(f'Could not write restart input for {file}. Error: {error}')
+            else:
+                written.append(input_name)
+
+    print(f'{len(written)} restart inputs written in {pathout}.')
+
+    return written
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09restart',
+                               description = 'Write restart inputs from last geometry of failed g09 jobs.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory to work in (files in not_normal_term subfolder are used)')
+    parser.add_argument('-i', '--input', nargs = '+', default = None,
+                        help = 'g09 output files (relative to path). defaults to path/not_normal_term files')
+    parser.add_argument('-e', '--ext', type = str, default = '.log',
+                        help = 'extension of g09 output files')
+    parser.add_argument('-po', '--pathout', type = str, default = None,
+                        help = 'path for restart inputs. defaults to path/restart')
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of threads')
+
+    args = parser.parse_args()
+
+    main(args.path, g09_files = args.input, extension = args.ext,
+         pathout = args.pathout, workers = args.workers)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:40:05 2026
+
+@author: nat
+"""
+
+#g09results.py
+
+"""Writers for the results table of proc_g09out.
+Rows are appended one at a time and written incrementally:
+csv (default), NumPy structured array (.npy) or Parquet (.parquet, needs pyarrow).
+npy and parquet files keep typed columns (float64 energies, int
+number of negative frequencies), so they can be loaded without parsing strings.
+"""
+
+#%% modules
+
+import os
+import csv
+import math
+
+import numpy as np
+
+
+#%% column types
+
+# numpy dtype for each results header. Text columns ('U') are stored as
+# unicode of fixed width in .npy files, the width of their longest value.
+DTYPES = {'filename': 'U',
+          'route': 'U',
+          'jobs': 'U',
+          'n_negFreq': 'i4'}
+
+# dtype for headers not in DTYPES (energies, frequencies)
+DEFAULT_DTYPE = 'f8'
+
+EXTENSIONS = {'csv': '.csv', 'npy': '.npy', 'parquet': '.parquet'}
+
+
+def get_dtype(headers, rows = ()):
+    """Returns numpy structured dtype for list of results headers. Text
+    columns are as wide as their longest value in rows (typed rows)."""
+
+    fields = []
+    for i, h in enumerate(headers):
+        dtype = DTYPES.get(h, DEFAULT_DTYPE)
+        if dtype == 'U':
+            dtype = f'U{max([len(row[i]) for row in rows] + [1])}'
+        fields.append((h, dtype))
+
+    return np.dtype(fields)
+
+
+def wider_dtype(dtype, other):
+    """dtype with fields of dtype, each as wide as in dtype or other."""
+
+    return np.dtype([(h, other[h] if h in other.names and other[h].itemsize > dtype[h].itemsize
+                      else dtype[h]) for h in dtype.names])
+
+
+def to_float(value):
+    """Convert value to float. 'NA', None or values that can't be
+    converted are returned as nan."""
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def typed_row(headers, row):
+    """Convert results row (list of strings and numbers, as returned by
+    proc_g09out.out_proc) into tuple of typed values ordered as headers.
+    Missing values are filled with nan (-1 for integer columns)."""
+
+    row = list(row) + [None]*(len(headers) - len(row))
+    typed = []
+
+    for header, value in zip(headers, row):
+        kind = np.dtype(DTYPES.get(header, DEFAULT_DTYPE)).kind
+        if kind == 'U':
+            typed.append(str(value).strip())
+        elif kind == 'i':
+            try:
+                typed.append(int(value))
+            except (TypeError, ValueError):
+                typed.append(-1)
+        else:
+            typed.append(to_float(value))
+
+    return tuple(typed)
+
+
+#%% npy header
+
+def npy_header(dtype, nrows, length = None):
+    """Returns header (bytes) of .npy file (format version 1.0) for a 1D
+    structured array with nrows.
+    If length is provided, header is padded to that length, so it can
+    be rewritten once the final number of rows is known."""
+
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                   'fortran_order': False,
+                   'shape': (nrows,)})
+
+    if length is None:
+        length = 10 + len(header) + 1
+        length += -length % 64
+
+    pad = length - 10 - len(header) - 1
+    header = (header + ' '*pad + '\n').encode('latin1')
+
+    return b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header
+
+
+#%% writers
+
+class CSVWriter():
+    """Writes results rows into csv file. Fields that contain commas or
+    quotes (e.g. route) are quoted."""
+
+    def __init__(self, filename, headers, row_group = None):
+        self.headers = headers
+        self.file = open(filename, 'w', newline = '')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def append(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NPYWriter(CSVWriter):
+    """Writes results rows into .npy file as 1D structured array,
+    in groups of row_group rows. Load with numpy.load.
+    If a group has text longer than the columns written so far, the rows
+    already in the file are rewritten with wider columns."""
+
+    def __init__(self, filename, headers, row_group = 4096):
+        self.filename = filename
+        self.headers = headers
+        self.dtype = None
+        self.row_group = row_group
+        self.rows = []
+        self.nrows = 0
+        self.file = open(filename, 'wb')
+        # reserve space for header, rewritten on close with final shape and widths
+        widest = np.dtype([(h, 'U99999999' if DTYPES.get(h) == 'U' else DTYPES.get(h, DEFAULT_DTYPE))
+                           for h in headers])
+        self.header_len = len(npy_header(widest, 10**15))
+        self.file.write(npy_header(widest, 0, self.header_len))
+
+    def append(self, row):
+        self.rows.append(typed_row(self.headers, row))
+        if len(self.rows) >= self.row_group:
+            self.flush()
+
+    def widen(self, dtype):
+        """Rewrite rows in file with dtype (wider text columns)."""
+
+        self.file.flush()
+        written = np.fromfile(self.filename, dtype = self.dtype, count = self.nrows,
+                              offset = self.header_len)
+        self.file.seek(self.header_len)
+        written.astype(dtype).tofile(self.file)
+        self.dtype = dtype
+
+    def flush(self):
+        """Write buffered rows to file."""
+
+        if self.rows:
+            dtype = get_dtype(self.headers, self.rows)
+            if self.dtype is None:
+                self.dtype = dtype
+            elif wider_dtype(self.dtype, dtype) != self.dtype:
+                self.widen(wider_dtype(self.dtype, dtype))
+            np.array(self.rows, dtype = self.dtype).tofile(self.file)
+            self.nrows += len(self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.dtype is None:
+            self.dtype = get_dtype(self.headers)
+        self.file.seek(0)
+        self.file.write(npy_header(self.dtype, self.nrows, self.header_len))
+        self.file.close()
+
+
+class ParquetWriter(NPYWriter):
+    """Writes results rows into .parquet file, one parquet row group
+    each row_group rows. Requires pyarrow."""
+
+    def __init__(self, filename, headers, row_group = 4096):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('pyarrow is needed to write parquet files.')
+
+        self.pa = pa
+        self.headers = headers
+        self.row_group = row_group
+        self.rows = []
+        self.nrows = 0
+
+        # text columns as variable length strings
+        types = {'U': pa.string(), 'i': pa.int32(), 'f': pa.float64()}
+        self.schema = pa.schema([(h, types[np.dtype(DTYPES.get(h, DEFAULT_DTYPE)).kind])
+                                 for h in headers])
+        self.file = pq.ParquetWriter(filename, self.schema)
+
+    def flush(self):
+        if self.rows:
+            columns = list(zip(*self.rows))
+            table = self.pa.table({h: columns[i] for i, h in enumerate(self.headers)},
+                                  schema = self.schema)
+            self.file.write_table(table)
+            self.nrows += len(self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+WRITERS = {'csv': CSVWriter, 'npy': NPYWriter, 'parquet': ParquetWriter}
+
+
+def open_writer(path, headers, out_format = 'csv', name = 'g09_results',
+                row_group = 4096):
+    """Returns writer for results table, file name+extension in path.
+    out_format: 'csv', 'npy' or 'parquet'."""
+
+    if out_format not in WRITERS:
+        raise ValueError(f'Unknown output format {out_format}. Use csv, npy or parquet.')
+
+    filename = os.path.join(path, name + EXTENSIONS[out_format])
+
+    return WRITERS[out_format](filename, headers, row_group)
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 27 15:08:36 2026
+
+@author: nat
+"""
+
+#g09shard.py
+
+"""Sharded processing of very large sets of g09 outputs across cluster nodes.
+The list of files (all files with extension in path, or a manifest with
+one file per line) is split into nshards contiguous shards, written in the
+shards subfolder. Each shard is processed by one task of an SGE array job
+(proc_g09out and/or write_coordSI), which writes partial results named
+with the shard number. A merge job, held until the array job finishes,
+concatenates partial results in shard order, so the merged results have the
+order of the original list whatever order the tasks ran in:
+    csv, npy, parquet results tables (g09_results).
+    SQLite databases (g09db), one per shard, merged into db.
+    SI .txt and .xyz files (write_coordSI).
+Shards can also be run locally as separate processes (run_local).
+"""
+
+#%% modules
+
+import os
+import csv
+import sys
+import shutil
+import sqlite3
+import subprocess
+
+import numpy as np
+
+import proc_g09out, write_coordSI
+from g09results import EXTENSIONS, wider_dtype
+from g09db import ResultsStore
+
+
+#%% shards
+
+def shard_dir(path):
+    """Directory of shard lists and partial results."""
+
+    return os.path.join(path, 'shards')
+
+
+def shard_name(name, k):
+    """Name of partial output of shard k."""
+
+    return f'{name}_{k:04d}'
+
+
+def split(path, nshards, g09_files = None, extension = '.log', manifest = None):
+    """Split files (g09_files, files listed in manifest, or all files with
+    extension in path, sorted) into nshards contiguous shards of about the
+    same size. Shard lists are written as shard_<k>.txt (k from 1) in shards
+    subfolder. Returns number of shards written."""
+
+    if manifest:
+        with open(manifest) as f:
+            g09_files = [line.strip() for line in f if line.strip()]
+    elif not g09_files:
+        g09_files = sorted(x for x in os.listdir(path) if x.endswith(extension))
+
+    if len(g09_files) == 0:
+        raise ValueError(f'No files of extension {extension} found.')
+
+    out_dir = shard_dir(path)
+    if os.path.isdir(out_dir):
+        print(f'Removing previous shards and partial outputs in {out_dir}.')
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    shards = [x for x in np.array_split(np.array(g09_files), nshards) if len(x)]
+    for k, shard in enumerate(shards, 1):
+        with open(os.path.join(out_dir, shard_name('shard', k) + '.txt'), 'w') as f:
+            f.write('\n'.join(shard) + '\n')
+
+    print(f'{len(g09_files)} files split into {len(shards)} shards.')
+
+    return len(shards)
+
+
+def read_shard(path, k):
+    """List of files of shard k."""
+
+    with open(os.path.join(shard_dir(path), shard_name('shard', k) + '.txt')) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def count_shards(path):
+    """Number of shard lists in shards subfolder."""
+
+    return len([x for x in os.listdir(shard_dir(path))
+                if x.startswith('shard_') and x.endswith('.txt')])
+
+
+#%% run shard
+
+def run_shard(path, k, task = 'proc', out_format = 'csv', db = None, get_sp = False,
+              out_type = 'both'):
+    """Process files of shard k, partial outputs written in shards subfolder.
+    task: 'proc' (proc_g09out), 'si' (write_coordSI) or 'both'.
+    If db is provided, results are upserted into a database of the shard."""
+
+    g09_files = read_shard(path, k)
+    partial = os.path.join('shards', shard_name('g09_results', k))
+
+    if task in ('proc', 'both'):
+        shard_db = os.path.join(shard_dir(path), shard_name('results', k) + '.db') if db else None
+        if shard_db and os.path.exists(shard_db):
+            os.remove(shard_db)
+        proc_g09out.main(path, list(g09_files), get_sp = get_sp, out_format = out_format,
+                         db = shard_db, results_name = partial)
+
+    if task in ('si', 'both'):
+        # files moved to not_normal_term by proc_g09out are skipped
+        g09_files = [x for x in g09_files if os.path.exists(os.path.join(path, x))]
+        if g09_files:
+            write_coordSI.main(path, g09_files, out_type = out_type,
+                               out_filename = os.path.join('shards', shard_name('SI_coords', k)))
+
+
+#%% merge
+
+def merge_tables(files, out_file, out_format = 'csv'):
+    """Concatenate partial results tables in order into out_file."""
+
+    if out_format == 'csv':
+        headers = []
+        for file in files:
+            with open(file, newline = '') as f:
+                headers.append(next(csv.reader(f), []))
+        if all(h == headers[0] for h in headers):
+            with open(out_file, 'wb') as out:
+                for i, file in enumerate(files):
+                    with open(file, 'rb') as f:
+                        first = f.readline()
+                        if i == 0:
+                            out.write(first)
+                        shutil.copyfileobj(f, out)
+        else:
+            # shards with different jobs (e.g. opt and opt+freq): merged by
+            # column name, columns of the widest header first, missing as NA
+            merged = max(headers, key = len)
+            merged += [h for header in headers for h in header if h not in merged]
+            with open(out_file, 'w', newline = '') as out:
+                writer = csv.DictWriter(out, merged, restval = 'NA')
+                writer.writeheader()
+                for file in files:
+                    with open(file, newline = '') as f:
+                        writer.writerows(csv.DictReader(f))
+
+    elif out_format == 'npy':
+        arrays = [np.load(file) for file in files]
+        np.save(out_file, np.concatenate(widest(arrays)))
+
+    elif out_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tables = [pq.read_table(file) for file in files]
+        pq.write_table(pa.concat_tables(tables, promote_options = 'default'), out_file)
+
+
+def widest(arrays):
+    """Structured arrays of shards with opt/sp jobs (fewer columns) cast
+    to the dtype with most fields, missing fields as nan (-1 for ints).
+    Text columns take the widest width of all shards."""
+
+    dtype = max((a.dtype for a in arrays), key = lambda d: len(d.names))
+    for a in arrays:
+        dtype = wider_dtype(dtype, a.dtype)
+    out = []
+    for a in arrays:
+        if a.dtype == dtype:
+            out.append(a)
+            continue
+        full = np.empty(len(a), dtype = dtype)
+        for name in dtype.names:
+            if name in a.dtype.names:
+                full[name] = a[name]
+            else:
+                full[name] = -1 if dtype[name].kind == 'i' else np.nan
+        out.append(full)
+
+    return out
+
+
+# tables with results of each job (g09db.SCHEMA) and their columns after job_id
+SHARD_TABLES = {'energies': ('scf', 'n_negfreq', 'neg_freq'),
+                'thermo': ('zpe', 'thermal', 'enthalpy', 'free'),
+                'geometries': ('natoms', 'atom_types', 'coords')}
+
+
+def merge_db(db_file, shard_dbs):
+    """Upsert contents of shard databases into db_file, in order. Job ids of
+    db_file are kept, rows of shards are matched by (path, filename)."""
+
+    ResultsStore(db_file).close()
+    conn = sqlite3.connect(db_file)
+    for shard_db in shard_dbs:
+        conn.execute('ATTACH DATABASE ? AS shard', (shard_db,))
+        with conn:
+            conn.execute(
+                """INSERT INTO jobs (path, filename, molecule, conformer, route, jobs, charge, mult)
+                SELECT path, filename, molecule, conformer, route, jobs, charge, mult
+                FROM shard.jobs WHERE true ORDER BY id
+                ON CONFLICT (path, filename) DO UPDATE SET
+                molecule = excluded.molecule, conformer = excluded.conformer,
+                route = excluded.route, jobs = excluded.jobs,
+                charge = excluded.charge, mult = excluded.mult""")
+            for table, columns in SHARD_TABLES.items():
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO {table}
+                    SELECT m.id, {', '.join('t.' + c for c in columns)} FROM shard.{table} t
+                    JOIN shard.jobs s ON s.id = t.job_id
+                    JOIN jobs m ON m.path = s.path AND m.filename = s.filename""")
+        conn.execute('DETACH DATABASE shard')
+    conn.close()
+
+
+def merge(path, out_format = 'csv', db = None):
+    """Merge partial outputs of all shards (those found) in shard order into
+    path: g09_results, database db, SI_coords .txt/.xyz."""
+
+    out_dir = shard_dir(path)
+    nshards = count_shards(path)
+    extension = EXTENSIONS[out_format]
+
+    def partials(name, ext):
+        files = [os.path.join(out_dir, shard_name(name, k) + ext) for k in range(1, nshards + 1)]
+        missing = [os.path.basename(x) for x in files if not os.path.exists(x)]
+        if missing and len(missing) < len(files):
+            print(f'Partial outputs not found (shard without results or not run): {", ".join(missing)}')
+        return [x for x in files if os.path.exists(x)]
+
+    tables = partials('g09_results', extension)
+    if tables:
+        merge_tables(tables, os.path.join(path, 'g09_results' + extension), out_format)
+
+    if db:
+        shard_dbs = partials('results', '.db')
+        if shard_dbs:
+            merge_db(db, shard_dbs)
+
+    for ext in ('.txt', '.xyz'):
+        si_files = partials('SI_coords', ext)
+        if si_files:
+            with open(os.path.join(path, 'SI_coords' + ext), 'wb') as out:
+                for file in si_files:
+                    with open(file, 'rb') as f:
+                        shutil.copyfileobj(f, out)
+
+    print(f'Merged outputs of {nshards} shards.')
+
+
+#%% array job
+
+def write_array_sh(path, nshards, time, command, jobname = 'shards'):
+    """Writes shards/array.sh: SGE array job with one task per shard, task
+    SGE_TASK_ID runs command for that shard (-k)."""
+
+    filename = os.path.join(shard_dir(path), 'array.sh')
+    lines = ['#!/bin/bash', '#$ -S /bin/bash', '#',
+             '### Job Name', f'#$ -N {jobname}', '#',
+             '# Setea HH:MM:SS tiempo de wall clock time, maximo 3 dias',
+             f'#$ -l h_rt={time}', '#',
+             '### One task per shard', f'#$ -t 1-{nshards}', '#',
+             '### write out files in current directory', '#$ -cwd', '#',
+             "### Merge '-j y' (do not merge '-j n') stderr into stdout stream:",
+             '#$ -j y', '', '',
+             f'{command} -k $SGE_TASK_ID']
+
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    return filename
+
+
+def write_merge_sh(path, time, command, hold, jobname = 'merge'):
+    """Writes shards/merge.sh: merge job held until job (name) hold finishes."""
+
+    filename = os.path.join(shard_dir(path), 'merge.sh')
+    lines = ['#!/bin/bash', '#$ -S /bin/bash', '#',
+             '### Job Name', f'#$ -N {jobname}', '#',
+             f'#$ -l h_rt={time}', '#',
+             '### Wait for all tasks of array job', f'#$ -hold_jid {hold}', '#',
+             '#$ -cwd', '#$ -j y', '', '',
+             command]
+
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    return filename
+
+
+def shard_command(path, command, task = 'proc', out_format = 'csv', db = None,
+                  get_sp = False, out_type = 'both', python = sys.executable):
+    """Command line of this module for command (run or merge) with options."""
+
+    line = (f'{python} {os.path.abspath(__file__)} {command} -p {os.path.abspath(path)} '
+            f'-T {task} -f {out_format} -o {out_type}')
+    if db:
+        line += f' -db {os.path.abspath(db)}'
+    if get_sp:
+        line += ' -sp'
+
+    return line
+
+
+#%% local run
+
+def run_local(path, task = 'proc', out_format = 'csv', db = None, get_sp = False,
+              out_type = 'both', njobs = None, python = sys.executable):
+    """Run shards of path as separate local processes (njobs at a time,
+    default all at once), then merge. Returns list of shards that failed."""
+
+    nshards = count_shards(path)
+    command = shard_command(path, 'run', task, out_format, db, get_sp, out_type, python).split()
+    njobs = njobs or nshards
+
+    failed = []
+    for start in range(1, nshards + 1, njobs):
+        procs = {}
+        for k in range(start, min(start + njobs, nshards + 1)):
+            out = open(os.path.join(shard_dir(path), shard_name('shard', k) + '.out'), 'w')
+            procs[k] = (subprocess.Popen(command + ['-k', str(k)], stdout = out,
+                                         stderr = subprocess.STDOUT), out)
+        for k, (proc, out) in procs.items():
+            if proc.wait():
+                failed.append(k)
+            out.close()
+
+    for k in failed:
+        print(f'Shard {k} failed, see {shard_name("shard", k)}.out.')
+
+    merge(path, out_format, db)
+
+    return failed
+
+
+#%% main function
+
+def main(path, command, shards = None, k = None, g09_files = None, extension = '.log',
+         manifest = None, task = 'proc', out_format = 'csv', db = None, get_sp = False,
+         out_type = 'both', time = '11:59:59', njobs = None):
+    """Command line interface:
+    split: split files into shards and write array job (shards/array.sh)
+    and merge job (shards/merge.sh, held until the array job finishes).
+    run: process shard k (run by the tasks of the array job).
+    merge: merge partial outputs.
+    local: split and run shards as local processes, then merge."""
+
+    if command in ('split', 'local'):
+        nshards = split(path, shards, g09_files, extension, manifest)
+    
+    if command == 'split':
+        jobname = 'shards_' + os.path.basename(os.path.abspath(path))
+        write_array_sh(path, nshards, time,
+                       shard_command(path, 'run', task, out_format, db, get_sp, out_type),
+                       jobname)
+        write_merge_sh(path, '01:00:00',
+                       shard_command(path, 'merge', task, out_format, db, get_sp, out_type),
+                       jobname, 'merge_' + os.path.basename(os.path.abspath(path)))
+        print(f'Submit with: cd {shard_dir(path)}; qsub array.sh; qsub merge.sh')
+
+    elif command == 'run':
+        run_shard(path, k, task, out_format, db, get_sp, out_type)
+
+    elif command == 'merge':
+        merge(path, out_format, db)
+
+    elif command == 'local':
+        return run_local(path, task, out_format, db, get_sp, out_type, njobs)
+
+    else:
+        raise ValueError(f'Unknown command {command}. Use split, run, merge or local.')
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09shard',
+                               description = 'Process large sets of g09 output files in shards (SGE array job or local processes).')
+
+    parser.add_argument('command', type = str, choices = ['split', 'run', 'merge', 'local'],
+                        help = 'split: write shards and SGE scripts. run: process shard. merge: merge partial outputs. local: split, run as local processes and merge')
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory with g09 output files')
+    parser.add_argument('-k', '--shard', type = int, default = None,
+                        help = 'shard number for run (from 1)')
+    parser.add_argument('-n', '--shards', type = int, default = 10,
+                        help = 'number of shards')
+    parser.add_argument('-e', '--ext', type = str, default = '.log',
+                        help = 'extension of g09 output files')
+    parser.add_argument('-m', '--manifest', type = str, default = None,
+                        help = 'file with list of g09 output files, one per line. defaults to all files in path')
+    parser.add_argument('-T', '--task', type = str, default = 'proc', choices = ['proc', 'si', 'both'],
+                        help = 'proc_g09out (proc), write_coordSI (si) or both')
+    parser.add_argument('-f', '--format', type = str, default = 'csv',
+                        choices = ['csv', 'npy', 'parquet'],
+                        help = 'format for results file (csv/npy/parquet)')
+    parser.add_argument('-db', '--database', type = str, default = None,
+                        help = 'SQLite database file to merge results into')
+    parser.add_argument('-sp', '--get_sp', action = 'store_true',
+                        help = 'get SCF energy from SP or other calculations')
+    parser.add_argument('-o', '--out_type', type = str, default = 'both',
+                        help = 'SI files written by write_coordSI (txt/xyz/both)')
+    parser.add_argument('-t', '--time', type = str, default = '11:59:59',
+                        help = 'wall clock time of each task, HH:MM:SS')
+    parser.add_argument('-j', '--njobs', type = int, default = None,
+                        help = 'shards run at a time by local. defaults to all')
+
+    args = parser.parse_args()
+
+    main(args.path, args.command, args.shards, args.shard, extension = args.ext,
+         manifest = args.manifest, task = args.task, out_format = args.format,
+         db = args.database, get_sp = args.get_sp, out_type = args.out_type,
+         time = args.time, njobs = args.njobs)
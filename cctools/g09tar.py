@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:12:31 2026
+
+@author: nat
+"""
+
+#g09tar.py
+
+"""Read g09 output files directly from tar archives (.tar, .tar.gz, .tgz,
+.tar.bz2, .tar.xz) without extracting them to disk.
+Compressed archives are streamed member by member. Uncompressed archives allow
+random access, so their members can be read by offset in parallel workers."""
+
+#%% modules
+
+import os
+import tarfile
+from concurrent.futures import ProcessPoolExecutor
+
+
+#%% archive checks
+
+def is_tar(path):
+    """Returns True if path is a tar archive (compressed or not)."""
+
+    return os.path.isfile(path) and tarfile.is_tarfile(path)
+
+
+def random_access(tar_path):
+    """Returns True if members of tar archive can be read by offset
+    (only uncompressed archives)."""
+
+    try:
+        with tarfile.open(tar_path, 'r:'):
+            return True
+    except tarfile.ReadError:
+        return False
+
+
+#%% read members
+
+def decode(raw):
+    """Decode raw bytes of a member into list of lines (strings), as
+    obtained when iterating over an open file."""
+
+    return raw.decode('utf-8', errors = 'replace').splitlines(keepends = True)
+
+
+def select(member, extension, members = None):
+    """Returns True if tar member is a file with the given extension
+    (and in list of members, if provided)."""
+
+    name = os.path.basename(member.name)
+
+    if not member.isfile() or not name.endswith(extension):
+        return False
+    if members and name not in members:
+        return False
+
+    return True
+
+
+def iter_members(tar_path, extension = '.log', members = None):
+    """Generator. Streams tar archive (compressed or not) and yields
+    (filename, lines) for each member with extension, one at a time.
+    Only one member is kept in memory."""
+
+    with tarfile.open(tar_path, 'r|*') as tar:
+        for member in tar:
+            if select(member, extension, members):
+                raw = tar.extractfile(member).read()
+                yield os.path.basename(member.name), decode(raw)
+
+
+def index_members(tar_path, extension = '.log', members = None):
+    """Index of uncompressed tar archive.
+    Out: list of (filename, offset, size) for each member with extension,
+    in archive order."""
+
+    with tarfile.open(tar_path, 'r:') as tar:
+        return [(os.path.basename(m.name), m.offset_data, m.size)
+                for m in tar.getmembers() if select(m, extension, members)]
+
+
+def read_member(tar_path, offset, size):
+    """Read member of uncompressed tar archive from its offset.
+    Out: list of lines (strings)."""
+
+    with open(tar_path, 'rb') as f:
+        f.seek(offset)
+        return decode(f.read(size))
+
+
+#%% apply function to members
+
+def apply_member(func, tar_path, name, offset, size, args):
+    """Read member by offset and apply func(name, lines, *args).
+    Used by parallel workers."""
+
+    return name, func(name, read_member(tar_path, offset, size), *args)
+
+
+def map_members(func, tar_path, extension = '.log', members = None,
+                workers = None, args = ()):
+    """Generator. Applies func(filename, lines, *args) to every member of
+    tar archive with extension and yields (filename, result) in archive order.
+    Uncompressed archives are processed by a pool of workers
+    (workers = None uses all cpus, workers = 1 processes serially).
+    Compressed archives are streamed serially.
+    func must be defined at module level and should not raise exceptions."""
+
+    if workers != 1 and random_access(tar_path):
+        index = index_members(tar_path, extension, members)
+        n = len(index)
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            yield from pool.map(apply_member, [func]*n, [tar_path]*n,
+                                *zip(*index), [args]*n,
+                                chunksize = max(1, n // 64))
+    else:
+        for name, lines in iter_members(tar_path, extension, members):
+            yield name, func(name, lines, *args)
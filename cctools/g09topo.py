@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 09:26:44 2026
+
+@author: nat
+"""
+
+#g09topo.py
+
+"""Detect g09 optimizations where the structure isomerized or fragmented, by
+comparing the bonds (Molecule.get_bonds) of the initial geometry with those
+of the optimized geometry (g09opt.get_finalMolecule).
+The initial geometry is the first geometry of the optimization, or the
+geometry of the g09 input (written from HCS conformers or molecules) if a
+directory of inputs is provided.
+"""
+
+#%% modules
+
+import os
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import g09opt
+from proc_g09out import get_jobs, parse_file
+from g09check import read_g09in
+
+
+#%% compare topologies
+
+def count_fragments(atoms, bonds):
+    """Number of fragments (connected components) of atoms with bonds."""
+
+    parent = {atom: atom for atom in atoms}
+
+    def find(atom):
+        while parent[atom] != atom:
+            parent[atom] = parent[parent[atom]]
+            atom = parent[atom]
+        return atom
+
+    for a, b in bonds:
+        parent[find(a)] = find(b)
+
+    return len({find(atom) for atom in atoms})
+
+
+def compare(initial, final, tolerance = 0.45):
+    """Compare bonds of initial and final Molecule objects (same atom
+    numbering). Out: dictionary with broken and formed bonds (sorted lists of
+    atom number pairs) and number of fragments of initial and final geometry."""
+
+    bonds_initial = initial.get_bonds(tolerance)
+    bonds_final = final.get_bonds(tolerance)
+
+    return {'broken': sorted(bonds_initial - bonds_final),
+            'formed': sorted(bonds_final - bonds_initial),
+            'fragments_initial': count_fragments(initial.atom_types, bonds_initial),
+            'fragments_final': count_fragments(final.atom_types, bonds_final)}
+
+
+#%% geometries of optimization
+
+def opt_geometries(g09out):
+    """Initial and final Molecule objects of optimization in g09 output."""
+
+    jobs, route = get_jobs(g09out)
+    if 'opt' not in jobs:
+        raise ValueError('No opt job found.')
+    parsed_out = parse_file(g09out, jobs)
+    opt_steps = g09opt.split_opt(parsed_out[0] if 'freq' in jobs else parsed_out)
+
+    if g09opt.symm_off(opt_steps):
+        initial = g09opt.get_mol_nosymm(opt_steps[0])
+    else:
+        initial = g09opt.get_molecule(opt_steps[0])
+
+    return initial, g09opt.get_finalMolecule(opt_steps)
+
+
+def topology_task(g09out, g09in = None, tolerance = 0.45):
+    """Compare topology of optimization in g09out (with initial geometry
+    from g09in, if provided). Errors are returned instead of raised.
+    Out: comparison dictionary (see compare) or None, error message."""
+
+    try:
+        initial, final = opt_geometries(g09out)
+        if g09in:
+            initial = read_g09in(g09in)
+        return compare(initial, final, tolerance), None
+    except Exception as e:
+        return None, str(e)
+
+
+def changed(comparison):
+    """True if bonds were broken or formed."""
+
+    return bool(comparison['broken'] or comparison['formed'])
+
+
+#%% main function
+
+def main(path, g09_files = None, extension = '.log', inputs = None,
+         input_extension = '.com', tolerance = 0.45, workers = None):
+    """Compare topology of initial and optimized geometry of g09 output files
+    in path (by default, all files with extension), in parallel processes.
+    If inputs (directory of g09 input files with the same names) is provided,
+    initial geometries are read from inputs.
+    Jobs whose topology changed are written in topology_changes.csv in path.
+    Returns list of (filename, comparison) of changed jobs."""
+
+    if not g09_files:
+        g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
+
+    g09outs = [os.path.join(path, x) for x in g09_files]
+    g09ins = [os.path.join(inputs, x.rsplit('.', 1)[0] + input_extension) if inputs else None
+              for x in g09_files]
+
+    changes = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        for file, (comparison, error) in zip(g09_files, pool.map(topology_task, g09outs, g09ins,
+                                                                  [tolerance]*len(g09outs))):
+            if error:
+                print(f'Could not compare topology of {file}. Error: {error}')
+            elif changed(comparison):
+                changes.append((file, comparison))
+
+    with open(os.path.join(path, 'topology_changes.csv'), 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['filename', 'broken', 'formed', 'fragments_initial',
+                         'fragments_final'])
+        for file, comparison in changes:
+            writer.writerow([file,
+                             ' '.join(f'{a}-{b}' for a, b in comparison['broken']),
+                             ' '.join(f'{a}-{b}' for a, b in comparison['formed']),
+                             comparison['fragments_initial'], comparison['fragments_final']])
+
+    print(f'{len(changes)} of {len(g09_files)} optimizations changed topology.')
+
+    return changes
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09topo',
+                               description = 'Detect g09 optimizations that isomerized or fragmented.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory with g09 output files')
+    parser.add_argument('-e', '--ext', type = str, default = '.log',
+                        help = 'extension of g09 output files')
+    parser.add_argument('-in', '--inputs', type = str, default = None,
+                        help = 'directory of g09 inputs with initial geometries. defaults to first geometry of each output')
+    parser.add_argument('-t', '--tolerance', type = float, default = 0.45,
+                        help = 'tolerance added to sum of covalent radii for bonds (angstrom)')
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of parallel processes')
+
+    args = parser.parse_args()
+
+    main(args.path, extension = args.ext, inputs = args.inputs,
+         tolerance = args.tolerance, workers = args.workers)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 12:17:55 2026
+
+@author: nat
+"""
+
+#g09unique.py
+
+"""Detect conformers that optimized to the same minimum, after proc_g09out.
+Conformers of each molecule are sorted by energy and split into buckets
+where consecutive energies differ by less than energy_tol. Only conformers
+in the same bucket are compared, by RMSD after optimal superposition
+(Kabsch, vectorized over all conformers of the bucket). Buckets are
+processed in parallel. The lowest energy conformer of each set of
+duplicates is marked as representative, so only those go on to further
+jobs.
+"""
+
+#%% modules
+
+import os
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ensemble import load_results, group_molecules, HARTREE_KCAL
+from g09check import read_g09in
+from molecule import atomic_number
+
+
+#%% aligned RMSD
+
+def kabsch_rmsd(ref, coords):
+    """RMSD between ref (natoms, 3) and each geometry of coords
+    (n, natoms, 3) after optimal rotation (Kabsch), from the singular values
+    of the covariance matrices. Out: np array (n)."""
+
+    ref = ref - ref.mean(axis = 0)
+    coords = coords - coords.mean(axis = 1)[:, None]
+
+    covariance = np.einsum('nai,aj->nij', coords, ref)
+    u, s, vt = np.linalg.svd(covariance)
+    # reflection correction
+    d = np.sign(np.linalg.det(u) * np.linalg.det(vt))
+    s[:, -1] *= d
+
+    e0 = np.sum(ref**2) + np.sum(coords**2, axis = (1, 2))
+    msd = (e0 - 2 * s.sum(axis = 1)) / ref.shape[0]
+
+    return np.sqrt(np.maximum(msd, 0))
+
+
+#%% buckets
+
+def energy_buckets(energies, groups, energy_tol):
+    """Split conformers into buckets: same molecule and energies (kcal/mol)
+    that differ by less than energy_tol from the previous conformer, in
+    energy order. Out: list of arrays of indices (sorted by energy)."""
+
+    order = np.lexsort((energies, groups))
+    # conformers without energy are left alone in their bucket
+    new = np.r_[True, (groups[order][1:] != groups[order][:-1]) |
+                ~(np.diff(energies[order]) < energy_tol)]
+
+    return np.split(order, np.flatnonzero(new)[1:])
+
+
+def load_geometry(path, filename, heavy = True):
+    """Coordinates (natoms, 3) of optimized geometry of g09 output, from the
+    input written in geometries subfolder by proc_g09out, or from the output
+    (g09opt.get_finalMolecule) if not found. If heavy = True, hydrogens
+    are left out."""
+
+    name = filename.rsplit('.', 1)[0]
+    for suffix in ('_opt.com', '_geom.com'):
+        g09in = os.path.join(path, 'geometries', name + suffix)
+        if os.path.exists(g09in):
+            molecule = read_g09in(g09in)
+            break
+    else:
+        from g09topo import opt_geometries
+        molecule = opt_geometries(os.path.join(path, filename))[1]
+
+    coords = np.array(molecule.arrXYZ(), dtype = float)
+    if heavy:
+        numbers = np.array([atomic_number(molecule.atom_types[n]) for n in molecule.atom_types])
+        if np.any(numbers > 1):
+            coords = coords[numbers > 1]
+
+    return coords
+
+
+def bucket_task(path, filenames, rmsd_tol = 0.125, heavy = True):
+    """Find duplicates in bucket of conformers (sorted by energy).
+    The lowest conformer not yet assigned is compared with all higher ones
+    at once, those within rmsd_tol (angstrom) are its duplicates.
+    Out: index in bucket of representative of each conformer, or error."""
+
+    try:
+        coords = np.array([load_geometry(path, f, heavy) for f in filenames])
+    except Exception as e:
+        return None, str(e)
+
+    representative = np.full(len(filenames), -1)
+    for i in range(len(filenames)):
+        if representative[i] != -1:
+            continue
+        representative[i] = i
+        rest = np.flatnonzero(representative[i+1:] == -1) + i + 1
+        if len(rest):
+            same = rest[kabsch_rmsd(coords[i], coords[rest]) < rmsd_tol]
+            representative[same] = i
+
+    return representative, None
+
+
+#%% main function
+
+def main(path, results_file = None, energy = 'SCFenergy', energy_tol = 0.1,
+         rmsd_tol = 0.125, heavy = True, workers = None, out_name = 'unique_conformers'):
+    """Mark duplicate minima of conformers in proc_g09out results (by default,
+    g09_results.csv in path; see ensemble.load_results for formats).
+    energy_tol in kcal/mol, rmsd_tol in angstrom (heavy atoms only if
+    heavy = True). Writes <out_name>.csv in path with filename, molecule,
+    energy, representative and unique (1 for representatives).
+    Returns list of representative filenames."""
+
+    if not results_file:
+        results_file = os.path.join(path, 'g09_results.csv')
+
+    table = load_results(results_file)
+    filenames = table['filename']
+    energies = table[energy] * HARTREE_KCAL
+    molecules, groups = group_molecules(filenames)
+
+    buckets = energy_buckets(energies, groups, energy_tol)
+    representative = np.arange(len(filenames))
+
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        multiple = [b for b in buckets if len(b) > 1]
+        futures = [pool.submit(bucket_task, path, list(filenames[b]), rmsd_tol, heavy)
+                   for b in multiple]
+        for bucket, future in zip(multiple, futures):
+            rep, error = future.result()
+            if error:
+                print(f'Could not compare {", ".join(filenames[bucket])}. Error: {error}')
+                continue
+            representative[bucket] = bucket[rep]
+
+    order = np.concatenate(buckets) if buckets else []
+    with open(os.path.join(path, out_name + '.csv'), 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['filename', 'molecule', 'energy', 'representative', 'unique'])
+        for i in order:
+            writer.writerow([filenames[i], molecules[groups[i]], table[energy][i],
+                             filenames[representative[i]], int(representative[i] == i)])
+
+    unique = [filenames[i] for i in order if representative[i] == i]
+    print(f'{len(unique)} unique minima of {len(filenames)} conformers.')
+
+    return unique
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09unique',
+                               description = 'Detect conformers that optimized to the same minimum.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory with g09 output files and results')
+    parser.add_argument('-r', '--results', type = str, default = None,
+                        help = 'results file of proc_g09out (.csv, .npy, .parquet, .db). defaults to path/g09_results.csv')
+    parser.add_argument('-E', '--energy', type = str, default = 'SCFenergy',
+                        help = 'energy column to compare')
+    parser.add_argument('-de', '--energy_tol', type = float, default = 0.1,
+                        help = 'energy tolerance, kcal/mol')
+    parser.add_argument('-dr', '--rmsd_tol', type = float, default = 0.125,
+                        help = 'RMSD tolerance, angstrom')
+    parser.add_argument('-H', '--hydrogens', action = 'store_true',
+                        help = 'include hydrogens in RMSD')
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of parallel processes')
+    parser.add_argument('-o', '--out', type = str, default = 'unique_conformers',
+                        help = 'name of output csv file')
+
+    args = parser.parse_args()
+
+    main(args.path, args.results, energy = args.energy, energy_tol = args.energy_tol,
+         rmsd_tol = args.rmsd_tol, heavy = not args.hydrogens, workers = args.workers,
+         out_name = args.out)
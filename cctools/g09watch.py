@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 28 10:21:47 2026
+
+@author: nat
+"""
+
+#g09watch.py
+
+"""Watch a directory and process g09 output files as soon as their jobs
+finish, instead of running proc_g09out over the whole directory again.
+Files are noticed when they are closed after writing (inotify, Linux), or,
+on network filesystems where inotify does not see writes from other nodes,
+when their size and modification time stop changing between polls.
+Each file noticed is classified from its tail (g09errors):
+    normal termination: processed (proc_g09out.out_proc) and its results
+    row appended to g09_results.csv and/or upserted into the database.
+    error termination: moved to not_normal_term (proc_g09out.error_term)
+    and appended to g09_errors.csv with its category.
+    no termination line: job still running (g09 closes the output after
+    each link), the file is checked again when it changes. With stale, files
+    that do not change for stale seconds are dispatched as walltime errors.
+    Outputs of several jobs (opt freq) print a normal termination line
+    after each job: they are still running until all of them have one.
+Files already in g09_results.csv or in the database are not processed again.
+Results of all jobs go to the same csv file: a new file gets the columns of
+opt+freq results (NA where a job has no value); rows are appended to an
+existing file by column name, and rejected if it lacks some of their columns.
+"""
+
+#%% modules
+
+import os
+import csv
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+
+from proc_g09out import out_proc, error_term, get_headers, get_jobs
+from g09errors import classify
+from g09extract import map_file, scan
+from g09db import ResultsStore
+
+
+#%% file events
+
+# inotify event masks (sys/inotify.h)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+
+
+class Inotify():
+    """Files of a directory closed after writing or moved into it, with
+    inotify (Linux, through libc). Raises OSError if not available."""
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify not available.')
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed.')
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f'Could not watch {path}.')
+
+    def read(self, timeout):
+        """Names of files with events, waiting up to timeout seconds."""
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        data = os.read(self.fd, 65536)
+        names = []
+        i = 0
+        while i < len(data):
+            wd, mask, cookie, length = struct.unpack_from('iIII', data, i)
+            names.append(data[i+16:i+16+length].rstrip(b'\0').decode())
+            i += 16 + length
+
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller():
+    """Files of a directory whose size and modification time did not change
+    for settle seconds (polling every interval seconds). Each state of a
+    file is reported once."""
+
+    def __init__(self, path, extension = '.log', interval = 2.0, settle = 2.0):
+        self.path = path
+        self.extension = extension
+        self.interval = interval
+        self.settle = settle
+        self.states = {} # name: (size, mtime), time first seen
+        self.reported = {}
+
+    def read(self, timeout = None):
+        time.sleep(self.interval)
+        now = time.time()
+        names = []
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(self.extension) or not entry.is_file():
+                continue
+            stat = entry.stat()
+            state = (stat.st_size, stat.st_mtime)
+            previous = self.states.get(entry.name)
+            if not previous or previous[0] != state:
+                self.states[entry.name] = (state, now)
+            elif now - previous[1] >= self.settle and self.reported.get(entry.name) != state:
+                self.reported[entry.name] = state
+                names.append(entry.name)
+
+        return names
+
+    def close(self):
+        pass
+
+
+#%% results and errors
+
+class CSVAppender():
+    """Appends rows to csv file, flushed after each row so results are
+    visible at once. New files get headers; rows are written by column name
+    under the header of the file (NA in columns the row has not), rows with
+    columns the file has not raise ValueError."""
+
+    def __init__(self, filename, headers):
+        self.filename = filename
+        self.headers = list(headers)
+        self.file = None
+
+    def append(self, headers, row):
+        if not self.file:
+            new = not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0
+            if not new:
+                with open(self.filename, newline = '') as f:
+                    self.headers = next(csv.reader(f))
+            self.file = open(self.filename, 'a', newline = '')
+            self.writer = csv.writer(self.file)
+            if new:
+                self.writer.writerow(self.headers)
+        missing = [h for h in headers if h not in self.headers]
+        if missing:
+            raise ValueError(f'Columns {", ".join(missing)} not in '
+                             f'{os.path.basename(self.filename)}.')
+        values = dict(zip(headers, row))
+        self.writer.writerow([values.get(h, 'NA') for h in self.headers])
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+def processed_files(path, results_csv = None, db = None):
+    """Filenames already in results csv file or in database (for path)."""
+
+    done = set()
+    if results_csv and os.path.exists(results_csv):
+        with open(results_csv, newline = '') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            done.update(row[0] for row in reader if row)
+
+    if db and os.path.exists(db):
+        import sqlite3
+        conn = sqlite3.connect(db)
+        try:
+            done.update(x for x, in conn.execute('SELECT filename FROM jobs WHERE path = ?',
+                                                 (os.path.abspath(path),)))
+        except sqlite3.OperationalError:
+            pass
+        conn.close()
+
+    return done
+
+
+#%% watcher
+
+# columns of the results csv of the watch, for all jobs
+RESULTS_HEADERS = get_headers('sp opt freq')
+ERROR_HEADERS = ['filename', 'category', 'detail']
+
+
+def expected_terms(jobs):
+    """Number of normal termination lines of a finished output with jobs
+    (one per job of the input, as split by proc_g09out.split_jobs)."""
+
+    n = len(jobs.split())
+
+    return n - 1 if n > 2 else 1
+
+
+def count_terms(g09out):
+    """Number of normal termination lines in g09 output file."""
+
+    with map_file(g09out) as buf:
+        return len(scan(buf, {'term': b'Normal termination'})['term'])
+
+
+class Watcher():
+    """Handles g09 output files of path as they are noticed (see module
+    docstring). Use handle for each file name, check_stale periodically."""
+
+    def __init__(self, path, extension = '.log', results_csv = 'g09_results.csv',
+                 db = None, get_sp = False, stale = None):
+        self.path = path
+        self.extension = extension
+        self.get_sp = get_sp
+        self.stale = stale
+        self.results = CSVAppender(os.path.join(path, results_csv), RESULTS_HEADERS) if results_csv else None
+        self.errors = CSVAppender(os.path.join(path, 'g09_errors.csv'), ERROR_HEADERS)
+        self.store = ResultsStore(db) if db else None
+        self.done = processed_files(path, os.path.join(path, results_csv) if results_csv else None, db)
+        self.pending = {} # name: time of last change
+        self.counts = {'processed': 0, 'failed': 0}
+
+    def handle(self, name):
+        """Classify g09 output from its tail; process it, dispatch it as error
+        or keep it as pending."""
+
+        g09out = os.path.join(self.path, name)
+        if not name.endswith(self.extension) or name in self.done or not os.path.isfile(g09out):
+            return
+
+        category, detail = classify(g09out)
+        if category == 'normal' and count_terms(g09out) < expected_terms(get_jobs(g09out)[0]):
+            # first jobs of the input finished, next ones still running
+            category = 'walltime'
+        if category == 'walltime':
+            self.pending[name] = time.time()
+            return
+
+        self.pending.pop(name, None)
+        if category == 'normal':
+            if self.process(name):
+                self.done.add(name)
+        else:
+            self.done.add(name)
+            self.fail(name, category, detail)
+
+    def process(self, name):
+        """Process output, append results. Returns True if processed."""
+
+        try:
+            if self.store:
+                results, molecule = out_proc(name, self.path, False, self.get_sp, with_mol = True)
+            else:
+                results = out_proc(name, self.path, False, self.get_sp)
+        except Exception as e:
+            print(f'Could not process {name}. Error: {e}')
+            return False
+
+        headers = get_headers(results[2])
+        if self.results:
+            try:
+                self.results.append(headers, results)
+            except ValueError as e:
+                print(f'Could not append results of {name}. Error: {e}')
+                return False
+        if self.store:
+            self.store.add_g09(self.path, headers, results, molecule)
+            self.store.flush()
+        self.counts['processed'] += 1
+        print(f'{name}: processed.')
+
+        return True
+
+    def fail(self, name, category, detail):
+        error_term(name, self.path)
+        self.errors.append(ERROR_HEADERS, [name, category, detail])
+        self.counts['failed'] += 1
+        print(f'{name} did not end in normal termination ({category}).')
+
+    def check_stale(self):
+        """Dispatch pending files not changed for stale seconds as walltime."""
+
+        if not self.stale:
+            return
+        now = time.time()
+        for name, changed in list(self.pending.items()):
+            g09out = os.path.join(self.path, name)
+            if not os.path.exists(g09out):
+                self.pending.pop(name)
+            elif now - max(changed, os.path.getmtime(g09out)) >= self.stale:
+                self.pending.pop(name)
+                self.done.add(name)
+                self.fail(name, 'walltime', '')
+
+    def close(self):
+        if self.results:
+            self.results.close()
+        self.errors.close()
+        if self.store:
+            self.store.close()
+
+
+#%% main function
+
+def main(path, extension = '.log', results_csv = 'g09_results.csv', db = None,
+         get_sp = False, poll = False, interval = 2.0, settle = 2.0, stale = None,
+         max_time = None):
+    """Watch path and process g09 output files (extension) when their jobs
+    finish (see module docstring). Files already in path are handled first.
+    poll = True uses polling (network filesystems) instead of inotify.
+    Runs until interrupted (Ctrl-C) or for max_time seconds.
+    Returns counts of processed and failed files."""
+
+    watcher = Watcher(path, extension, results_csv, db, get_sp, stale)
+
+    events = None
+    if not poll:
+        try:
+            events = Inotify(path)
+        except OSError as e:
+            print(f'Could not use inotify, polling instead. Error: {e}')
+    if not events:
+        events = Poller(path, extension, interval, settle)
+
+    for name in sorted(os.listdir(path)):
+        watcher.handle(name)
+
+    start = time.time()
+    try:
+        while not max_time or time.time() - start < max_time:
+            for name in events.read(interval):
+                watcher.handle(name)
+            watcher.check_stale()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        events.close()
+        watcher.close()
+
+    print(f'{watcher.counts["processed"]} files processed, {watcher.counts["failed"]} failed, '
+          f'{len(watcher.pending)} still running.')
+
+    return watcher.counts
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'g09watch',
+                               description = 'Process g09 output files as their jobs finish.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory to watch')
+    parser.add_argument('-e', '--ext', type = str, default = '.log',
+                        help = 'extension of g09 output files')
+    parser.add_argument('-r', '--results', type = str, default = 'g09_results.csv',
+                        help = 'csv file in path to append results to')
+    parser.add_argument('-db', '--database', type = str, default = None,
+                        help = 'SQLite database file to upsert results into (see g09db)')
+    parser.add_argument('-sp', '--get_sp', action = 'store_true',
+                        help = 'get SCF energy from SP or other calculations')
+    parser.add_argument('-P', '--poll', action = 'store_true',
+                        help = 'poll directory instead of inotify (network filesystems)')
+    parser.add_argument('-i', '--interval', type = float, default = 2.0,
+                        help = 'seconds between polls')
+    parser.add_argument('-s', '--settle', type = float, default = 2.0,
+                        help = 'seconds without changes before a polled file is checked')
+    parser.add_argument('-st', '--stale', type = float, default = None,
+                        help = 'seconds without changes before a file without termination is dispatched as walltime error')
+
+    args = parser.parse_args()
+
+    main(args.path, args.ext, args.results, args.database, args.get_sp, args.poll,
+         args.interval, args.settle, args.stale)
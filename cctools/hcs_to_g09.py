@@ -21,6 +21,8 @@ into csv file.
 import os
 
 import proc_hcs
+import g09db
+import g09check
 from write_g09in import g09_job
 
 
@@ -71,10 +73,13 @@ def write_g09ins(g09_jobs, molname, extension, suffix, path):
     molname: string, for main name of files.
     extension: string, extension of file ('.com', '.gjf').
     path: string, folder to work in. default.
+    None elements of g09_jobs are skipped (conformer numbers are kept).
     Out: writes g09 input files in subfolder within provided path.
     """
     
     for i, job in enumerate(g09_jobs):
+        if job is None:
+            continue
         filename = molname + '_c' + str(i+1) + '_' + suffix + extension
         job.write_input(os.path.join(path, filename))
 
@@ -97,9 +102,14 @@ def write_confSearch(mol_list, molname, path):
 def main(hcs_files = None, charge = 0, multiplicity = 1, nproc = 4, mem = 2, 
          func = 'B3LYP', basis = '6-31G*', job = '', chk = None,  
          extension = '.com', pathin = '.', pathout = None,
-         suffix = 'opt'):
+         suffix = 'opt', db = None, check = None):
     """Writes g09 inputs from hcs files and a csv file with
-    energy and found values for each conformer for each hcs file."""
+    energy and found values for each conformer for each hcs file.
+    If db (SQLite file) is provided, conformers are also upserted into 
+    that database, see g09db.
+    Geometries are checked before inputs are written (see g09check):
+    check = 'report' prints problems, check = 'filter' also skips the
+    inputs of bad conformers, check = None does not check."""
 
     if not hcs_files:
         hcs_files = [x for x in os.listdir(pathin) if x.lower().endswith('hcs')]
@@ -115,13 +125,30 @@ def main(hcs_files = None, charge = 0, multiplicity = 1, nproc = 4, mem = 2,
         pathout = os.path.join(pathin, 'g09_inputs')
     
     
-    for hcs_file in hcs_files:
-        mol_list = get_mols(os.path.join(pathin, hcs_file), charge, multiplicity)
-        job_list = create_g09ins(mol_list, nproc, mem, func, basis, job, chk)
-        molname = hcs_file.split('.')[0]
+    store = g09db.ResultsStore(db) if db else None
+    
+    try:
+        for hcs_file in hcs_files:
+            mol_list = get_mols(os.path.join(pathin, hcs_file), charge, multiplicity)
+            job_list = create_g09ins(mol_list, nproc, mem, func, basis, job, chk)
+            molname = hcs_file.split('.')[0]
+        
+            if check:
+                problems = g09check.check_molecules(mol_list)
+                g09check.report([f'{molname} conf {i+1}' for i in range(len(mol_list))], 
+                                problems)
+                if check == 'filter':
+                    # bad conformers keep their number, their input is not written
+                    job_list = [None if p else j for j, p in zip(job_list, problems)]
 
-        write_g09ins(job_list, molname, extension, suffix, pathout)
-        write_confSearch(mol_list, molname, pathin)
+            write_g09ins(job_list, molname, extension, suffix, pathout)
+            write_confSearch(mol_list, molname, pathin)
+        
+            if store:
+                store.add_hcs(pathin, molname, mol_list)
+    finally:
+        if store:
+            store.close()
     
 
 
@@ -161,13 +188,18 @@ if __name__ == '__main__':
                         Use single quotation marks around whole string when blankspaces are used.''')
     parser.add_argument('-C', '--chk', type = str, default = None,
                         help = 'name of chk file')
+    parser.add_argument('-db', '--database', type = str, default = None,
+                        help = 'SQLite database file to upsert conformers into (see g09db)')
+    parser.add_argument('-ck', '--check', type = str, default = 'none',
+                        help = 'geometry checks before writing inputs: report, filter (skip bad conformers) or none')
     
     args = parser.parse_args()
     
     main(hcs_files = args.input, charge = args.charge, multiplicity = args.mult,
          nproc = args.nproc, mem = args.mem, func = args.func, basis = args.basis,
          job = args.job, chk = args.chk, extension = args.out,
-         pathin = args.pathin, pathout = args.pathout, suffix = args.suffix)
+         pathin = args.pathin, pathout = args.pathout, suffix = args.suffix,
+         db = args.database, check = None if args.check == 'none' else args.check)
     
 
     
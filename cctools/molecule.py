@@ -11,6 +11,10 @@ Created on Tue Jul  6 13:48:56 2021
 """Definition of molecule classes
 for implementation in compchemtools scripts."""
 
+#%% modules
+
+import numpy as np
+
 #%% periodic table
 
 periodic_table = ["","H","He","Li","Be","B","C","N","O","F","Ne","Na","Mg",
@@ -24,6 +28,29 @@ periodic_table = ["","H","He","Li","Be","B","C","N","O","F","Ne","Na","Mg",
                   "Cf","Es","Fm","Md","No","Lr","Rf","Db","Sg","Bh","Hs","Mt",
                   "Ds","Rg","Uub","Uut","Uuq","Uup","Uuh","Uus","Uuo"]
 
+# covalent radii (angstrom) by atomic number, H to Xe 
+# (Cordero et al., Dalton Trans. 2008, 2832)
+covalent_radii = [0.0, 0.31, 0.28, 1.28, 0.96, 0.84, 0.76, 0.71, 0.66, 0.57, 0.58,
+                  1.66, 1.41, 1.21, 1.11, 1.07, 1.05, 1.02, 1.06, 2.03, 1.76,
+                  1.70, 1.60, 1.53, 1.39, 1.39, 1.32, 1.26, 1.24, 1.32, 1.22,
+                  1.22, 1.20, 1.19, 1.20, 1.20, 1.16, 2.20, 1.95, 1.90, 1.75,
+                  1.64, 1.54, 1.47, 1.46, 1.42, 1.39, 1.45, 1.44, 1.42, 1.39,
+                  1.39, 1.38, 1.39, 1.40]
+
+def atomic_number(atom_type):
+    """Atomic number from atom type (atomic number or element symbol)."""
+    
+    atom_type = str(atom_type).strip()
+    if atom_type.isdigit():
+        return int(atom_type)
+    
+    return periodic_table.index(atom_type.capitalize())
+
+# offsets of neighbour cells for cell lists: own cell and half of the 26
+# neighbours, so each pair of cells is visited once
+_half_shell = [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)
+               if (i, j, k) >= (0, 0, 0)]
+
 #%% class Molecule
 
 class Molecule():
@@ -90,8 +117,37 @@ class Molecule():
         separated by commas."""
         XYZ = self.arrXYZ()
         return [f'{periodic_table[self.atom_types[n]]}\t{XYZ[n-1][0]:.8f}\t{XYZ[n-1][1]:.8f}\t{XYZ[n-1][2]:.8f}'  \
-                for n in self.atom_types]        
-
-
+                for n in self.atom_types]
 
-        
\ No newline at end of file
+    def get_bonds(self, tolerance = 0.45):
+        """Returns set of bonds as (atom number, atom number) tuples, with 
+        lower atom number first. Atoms are bonded if their distance is less
+        than the sum of covalent radii + tolerance (angstrom).
+        Atoms are sorted into a grid of cells of the largest bond length, 
+        so only atoms in neighbouring cells are compared (linear scaling)."""
+        
+        numbers = list(self.atom_types)
+        coords = np.array(self.arrXYZ(), dtype = float)
+        radii = np.array([covalent_radii[z] if z < len(covalent_radii) else 1.5 
+                          for z in (atomic_number(self.atom_types[n]) for n in numbers)])
+        cutoff = 2 * radii.max() + tolerance
+        
+        cells = {}
+        for i, cell in enumerate(map(tuple, np.floor(coords / cutoff).astype(int))):
+            cells.setdefault(cell, []).append(i)
+        cells = {cell: np.array(atoms) for cell, atoms in cells.items()}
+        
+        bonds = set()
+        for cell, atoms in cells.items():
+            for offset in _half_shell:
+                neighbour = cells.get((cell[0] + offset[0], cell[1] + offset[1], 
+                                       cell[2] + offset[2]))
+                if neighbour is None:
+                    continue
+                dist = np.linalg.norm(coords[atoms][:, None] - coords[neighbour][None], axis = -1)
+                limit = radii[atoms][:, None] + radii[neighbour][None] + tolerance
+                for i, j in zip(*np.nonzero((dist < limit) & (dist > 0))):
+                    a, b = numbers[atoms[i]], numbers[neighbour[j]]
+                    bonds.add((min(a, b), max(a, b)))
+        
+        return bonds
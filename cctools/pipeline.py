@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 29 09:37:12 2026
+
+@author: nat
+"""
+
+#pipeline.py
+
+"""Non-interactive runner for the tasks of compchemtools, described in a
+pipeline file (TOML, YAML or JSON) as steps with dependencies, e.g.:
+    [steps.inputs]
+    task = "hcs"
+    pathin = "hcs"
+    pathout = "inputs"
+    func = "B3LYP"
+    basis = "6-31G*"
+    job = "opt freq"
+
+    [steps.rewrite]
+    task = "rewrite"
+    after = ["inputs"]
+    stream = true
+    path = "inputs"
+    nproc = 8
+
+    [steps.sh]
+    task = "sh"
+    after = ["rewrite"]
+    stream = true
+    path = "inputs"
+    time = "11:59:59"
+Tasks (number of compchemtools task or name) and the module whose main
+function is run, with the other keys of the step as keyword arguments:
+    1, proc: proc_g09out.    2, sh: write_sh.    3, hcs: hcs_to_g09.
+    4, rewrite: rw_g09in.    5, si: write_coordSI.
+Relative paths (path, pathin, pathout, db) are relative to the pipeline file.
+Steps whose dependencies are finished run concurrently (workers threads).
+A step with stream = true and one dependency runs on each file written by
+its dependency as soon as it is written, instead of waiting for the whole
+step: hcs and rewrite steps write files one by one, rewrite and sh
+(one input per .sh) steps take them. Streamed steps take their files from
+the dependency: g09_files, and check and chain of sh steps, need the whole
+step (without stream).
+A step is skipped if its parameters and its input files (name, size, mtime,
+after its last run) did not change; the state is kept in
+.<pipeline file name>.state next to the pipeline file.
+"""
+
+#%% modules
+
+import os
+import json
+import queue
+import hashlib
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+#%% tasks
+
+TASK_NAMES = {1: 'proc', 2: 'sh', 3: 'hcs', 4: 'rewrite', 5: 'si'}
+
+MODULES = {'proc': 'proc_g09out', 'sh': 'write_sh', 'hcs': 'hcs_to_g09',
+           'rewrite': 'rw_g09in', 'si': 'write_coordSI'}
+
+# parameter with directory of input files and default extension of input files
+INPUTS = {'proc': ('path', '.log'), 'sh': ('path', '.com'), 'hcs': ('pathin', 'hcs'),
+          'rewrite': ('path', '.com'), 'si': ('path', '.log')}
+
+PATH_KEYS = ('path', 'pathin', 'pathout', 'db')
+
+# steps that write files one at a time and steps that can take them, with
+# the parameters their streamed version uses
+STREAM_SOURCES = ('hcs', 'rewrite')
+STREAM_SINKS = {'rewrite': ('path', 'extension', 'route', 'chk', 'mem', 'nproc', 'workers'),
+                'sh': ('path', 'extension', 'time', 'sh_name', 'stage', 'n_files')}
+
+
+class Step():
+    """Step of pipeline: task name, keyword arguments of its main function,
+    names of steps it depends on and if it is streamed from its dependency."""
+
+    def __init__(self, name, spec, base):
+        spec = dict(spec)
+        task = spec.pop('task')
+        self.name = name
+        self.task = TASK_NAMES.get(task, task)
+        if self.task not in MODULES:
+            raise ValueError(f'Unknown task {task} in step {name}.')
+        self.after = spec.pop('after', [])
+        if isinstance(self.after, str):
+            self.after = [self.after]
+        self.stream = spec.pop('stream', False)
+        spec.setdefault(INPUTS[self.task][0], '.')
+        for key in PATH_KEYS:
+            if key in spec:
+                spec[key] = os.path.join(base, spec[key])
+        if self.task == 'hcs' and not spec.get('pathout'):
+            spec['pathout'] = os.path.join(spec.get('pathin', base), 'g09_inputs')
+        self.params = spec
+
+    def input_files(self):
+        """Input files of step: (name, size, mtime) of files with input
+        extension in input directory."""
+
+        key, extension = INPUTS[self.task]
+        path = self.params[key]
+        extension = self.params.get('extension', extension) if self.task != 'hcs' else extension
+        if not os.path.isdir(path):
+            return []
+
+        return sorted((x.name, x.stat().st_size, x.stat().st_mtime_ns) for x in os.scandir(path)
+                      if x.name.lower().endswith(extension) and x.is_file())
+
+    def fingerprint(self):
+        """Hash of task, parameters and input files."""
+
+        state = json.dumps([self.task, self.params, self.input_files()], sort_keys = True,
+                           default = str)
+
+        return hashlib.sha1(state.encode()).hexdigest()
+
+    def run(self):
+        """Run main function of task module with parameters."""
+
+        module = importlib.import_module(MODULES[self.task])
+        if self.task == 'hcs':
+            os.makedirs(self.params['pathout'], exist_ok = True)
+
+        return module.main(**self.params)
+
+
+#%% pipeline file
+
+def load(pipeline_file):
+    """Read pipeline file (.toml, .yaml/.yml or .json). Out: dictionary."""
+
+    extension = os.path.splitext(pipeline_file)[1].lower()
+
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError('tomllib (python >= 3.11) or tomli is needed to read toml files.')
+        with open(pipeline_file, 'rb') as f:
+            return tomllib.load(f)
+
+    if extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError('PyYAML is needed to read yaml files.')
+        with open(pipeline_file) as f:
+            return yaml.safe_load(f)
+
+    with open(pipeline_file) as f:
+        return json.load(f)
+
+
+def build(pipeline):
+    """Steps of pipeline dictionary, checked: dependencies exist, no cycles,
+    streamed steps have one dependency that can stream to them.
+    Out: dictionary name: Step, in order of execution (topological)."""
+
+    base = pipeline.get('base', '.')
+    steps = {name: Step(name, spec, base) for name, spec in pipeline['steps'].items()}
+
+    for step in steps.values():
+        for dep in step.after:
+            if dep not in steps:
+                raise ValueError(f'Step {step.name} depends on unknown step {dep}.')
+        if step.stream:
+            source = steps[step.after[0]] if len(step.after) == 1 else None
+            if (not source or source.task not in STREAM_SOURCES or step.task not in STREAM_SINKS
+                    or step.params.get('n_files', 1) != 1):
+                raise ValueError(f'Step {step.name} can not be streamed: it needs one dependency '
+                                 f'of task {"/".join(STREAM_SOURCES)} and task '
+                                 f'{"/".join(STREAM_SINKS)} (one input per .sh).')
+            unsupported = [key for key, value in step.params.items()
+                           if key not in STREAM_SINKS[step.task] and value]
+            if unsupported:
+                raise ValueError(f'Step {step.name} can not be streamed with '
+                                 f'{", ".join(unsupported)} (run it without stream).')
+
+    streamed = [step.after[0] for step in steps.values() if step.stream]
+    for name in set(streamed):
+        if streamed.count(name) > 1:
+            raise ValueError(f'Step {name} can stream to one step only.')
+
+    order = []
+    remaining = dict(steps)
+    while remaining:
+        ready = [name for name, step in remaining.items()
+                 if all(dep not in remaining for dep in step.after)]
+        if not ready:
+            raise ValueError(f'Cycle in dependencies of steps {", ".join(remaining)}.')
+        for name in ready:
+            order.append(remaining.pop(name))
+
+    return {step.name: step for step in order}
+
+
+def chains(steps):
+    """Group streamed steps with the step they are streamed from.
+    Out: list of chains (lists of steps, first one not streamed)."""
+
+    groups = {}
+    for step in steps.values():
+        if step.stream:
+            root = steps[step.after[0]]
+            while root.stream:
+                root = steps[root.after[0]]
+            groups[root.name].append(step)
+        else:
+            groups[step.name] = [step]
+
+    return list(groups.values())
+
+
+#%% streaming
+
+def hcs_items(step):
+    """Run hcs step one hcs file at a time, yield inputs written by each."""
+
+    import hcs_to_g09
+
+    params = dict(step.params)
+    pathin = params['pathin']
+    pathout = params['pathout']
+    extension = params.get('extension', '.com')
+    os.makedirs(pathout, exist_ok = True)
+    hcs_files = params.pop('hcs_files', None) or sorted(
+        x for x in os.listdir(pathin) if x.lower().endswith('hcs'))
+
+    for hcs_file in hcs_files:
+        before = {x.name: x.stat().st_mtime_ns for x in os.scandir(pathout)}
+        hcs_to_g09.main([hcs_file], **params)
+        for x in sorted(os.scandir(pathout), key = lambda x: x.name):
+            if x.name.endswith(extension) and before.get(x.name) != x.stat().st_mtime_ns:
+                yield x.name
+
+
+def rewrite_item(step, g09in_file, n):
+    """Rewrite one input of rewrite step. Out: input."""
+
+    import rw_g09in
+
+    params = {k: v for k, v in step.params.items() if k != 'g09_files'}
+    rw_g09in.main(g09_files = [g09in_file], **params)
+
+    return g09in_file
+
+
+def sh_item(step, g09in_file, n):
+    """Write .sh number n for one input of sh step (names as write_sh.main).
+    Out: input."""
+
+    import write_sh
+
+    path = step.params['path']
+    sh_name = step.params.get('sh_name', 'a')
+    nproc = write_sh.get_nproc(os.path.join(path, g09in_file))
+    jobname = sh_name + str(n) + '_' + g09in_file.split('.')[0]
+    write_sh.write_sh(os.path.join(path, sh_name + str(n) + '.sh'), nproc,
+                      step.params['time'], jobname, g09in_file,
+                      step.params.get('stage', False))
+
+    return g09in_file
+
+
+ITEM_FUNCTIONS = {'rewrite': rewrite_item, 'sh': sh_item}
+
+
+def run_streamed(chain):
+    """Run chain of streamed steps: first step yields files, each streamed
+    step runs in its own thread on files from the previous one as they come."""
+
+    root = chain[0]
+    if root.task == 'hcs':
+        source = hcs_items(root)
+    else:
+        # rewrite step as source, one input at a time
+        path = root.params['path']
+        extension = root.params.get('extension', '.com')
+        files = root.params.get('g09_files') or sorted(x for x in os.listdir(path)
+                                                       if x.endswith(extension))
+        source = (rewrite_item(root, x, n) for n, x in enumerate(files, 1))
+
+    queues = [queue.Queue() for _ in chain[1:]]
+    errors = []
+
+    def consume(step, q_in, q_out):
+        n = 0
+        while True:
+            item = q_in.get()
+            if item is None:
+                break
+            n += 1
+            try:
+                item = ITEM_FUNCTIONS[step.task](step, item, n)
+            except Exception as e:
+                errors.append(f'{step.name} ({item}): {e}')
+                continue
+            if q_out:
+                q_out.put(item)
+        if q_out:
+            q_out.put(None)
+
+    threads = [threading.Thread(target = consume,
+                                args = (step, queues[i], queues[i+1] if i+1 < len(queues) else None))
+               for i, step in enumerate(chain[1:])]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for item in source:
+            queues[0].put(item)
+    finally:
+        queues[0].put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise RuntimeError('; '.join(errors))
+
+
+#%% runner
+
+class Runner():
+    """Runs steps of pipeline, keeping fingerprints of finished steps in
+    state file."""
+
+    def __init__(self, steps, state_file, force = False):
+        self.steps = steps
+        self.state_file = state_file
+        self.force = force
+        self.lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(state_file) and not force:
+            with open(state_file) as f:
+                self.state = json.load(f)
+
+    def unchanged(self, step):
+        return not self.force and self.state.get(step.name) == step.fingerprint()
+
+    def save(self, step):
+        with self.lock:
+            self.state[step.name] = step.fingerprint()
+            with open(self.state_file, 'w') as f:
+                json.dump(self.state, f, indent = 1)
+
+    def run_chain(self, chain):
+        """Run chain of steps (one step or streamed steps).
+        Out: dictionary step name: 'skipped' or 'done'."""
+
+        if all(self.unchanged(step) for step in chain):
+            return {step.name: 'skipped' for step in chain}
+
+        print(f'Running {", ".join(step.name for step in chain)}.')
+        if len(chain) == 1:
+            chain[0].run()
+        else:
+            run_streamed(chain)
+
+        for step in chain:
+            self.save(step)
+
+        return {step.name: 'done' for step in chain}
+
+    def run(self, workers = None):
+        """Run chains whose dependencies are finished, concurrently.
+        Out: dictionary step name: status (done, skipped, failed, or blocked
+        if a dependency failed)."""
+
+        pending = chains(self.steps)
+        status = {}
+        running = {}
+
+        def outside_deps(chain):
+            names = {step.name for step in chain}
+            return {dep for step in chain for dep in step.after if dep not in names}
+
+        with ThreadPoolExecutor(max_workers = workers) as pool:
+            while pending or running:
+                for chain in list(pending):
+                    deps = outside_deps(chain)
+                    if any(status.get(dep) in ('failed', 'blocked') for dep in deps):
+                        pending.remove(chain)
+                        status.update({step.name: 'blocked' for step in chain})
+                    elif all(status.get(dep) in ('done', 'skipped') for dep in deps):
+                        pending.remove(chain)
+                        running[pool.submit(self.run_chain, chain)] = chain
+
+                if not running:
+                    break
+                finished, _ = wait(running, return_when = FIRST_COMPLETED)
+                for future in finished:
+                    chain = running.pop(future)
+                    try:
+                        status.update(future.result())
+                    except Exception as e:
+                        print(f'Could not run {", ".join(step.name for step in chain)}. Error: {e}')
+                        status.update({step.name: 'failed' for step in chain})
+
+        for name, step_status in status.items():
+            print(f'{name}: {step_status}')
+
+        return status
+
+
+#%% main function
+
+def main(pipeline_file, workers = None, force = False):
+    """Run pipeline described in pipeline_file (see module docstring).
+    force = True runs all steps even if unchanged.
+    Returns dictionary step name: status."""
+
+    pipeline = load(pipeline_file)
+    base = os.path.dirname(os.path.abspath(pipeline_file))
+    pipeline['base'] = os.path.join(base, pipeline.get('base', '.'))
+
+    steps = build(pipeline)
+    state_file = os.path.join(base, '.' + os.path.basename(pipeline_file) + '.state')
+
+    return Runner(steps, state_file, force).run(workers)
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'pipeline',
+                               description = 'Run compchemtools tasks described in a pipeline file.')
+
+    parser.add_argument('pipeline', type = str,
+                        help = 'pipeline file (.toml, .yaml, .json)')
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of steps run at a time')
+    parser.add_argument('-f', '--force', action = 'store_true',
+                        help = 'run all steps, even if unchanged')
+
+    args = parser.parse_args()
+
+    main(args.pipeline, args.workers, args.force)
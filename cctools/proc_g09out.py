@@ -11,8 +11,9 @@ Created on Mon Jul  5 14:26:03 2021
 
 import os
 
-import g09opt, g09freq
-# from molecule import Molecule
+import g09opt, g09freq, g09tar, g09results, g09db, g09prefetch, g09restart, g09irc, g09pes
+import g09extract
+from molecule import Molecule
 from write_g09in import g09_job
 
 
@@ -72,9 +73,16 @@ def check_term(g09out_name, path):
     """Returns True if normal termination line is found at the end of file,
     False otherwise.
     """
-    file = os.path.join(path, g09out_name)
-    final_lines = LastNlines(file, 3)
+    with g09extract.map_file(os.path.join(path, g09out_name)) as buf:
+        final_lines = g09extract.tail_lines(buf, 3)
+        
+    return check_term_lines(final_lines)
 
+def check_term_lines(final_lines):
+    """Returns True if normal termination line is found in list of final
+    lines of g09 output, False otherwise.
+    """
+    
     normal_term = False
         
     for line in reversed(final_lines):
@@ -104,16 +112,25 @@ def get_jobs(g09out):
     return string of jobs (separated by whitespaces) and route line.
     """
     
-    jobs = 'sp '
     with open(g09out) as out:
-        for line in out:
-            if line.strip().startswith('#'):
-                route = line.strip('\n').strip(' ')
+        return read_jobs(out)
+
+def read_jobs(g09out_lines):
+    """Find what jobs were done from the lines of a g09 output 
+    (open file or list of strings).
+    return string of jobs (separated by whitespaces) and route line.
+    """
+    
+    jobs = 'sp '
+    out = iter(g09out_lines)
+    for line in out:
+        if line.strip().startswith('#'):
+            route = line.strip('\n').strip(' ')
+            line = next(out)
+            while not line.strip().startswith('-'):
+                route += line.strip('\n').strip(' ')
                 line = next(out)
-                while not line.strip().startswith('-'):
-                    route += line.strip('\n').strip(' ')
-                    line = next(out)
-                break
+            break
             
     if 'opt' in route.lower():
         jobs += 'opt '
@@ -130,20 +147,26 @@ def parse_file(g09out, jobs):
     """Function to parse file into list of strings.
     According to amount of jobs, it splits it at normal termination line"""
     
+    with open(g09out, 'r') as out:
+        return split_jobs(out, jobs)
+
+def split_jobs(g09out_lines, jobs):
+    """Parse lines of g09 output (open file or list of strings) into list 
+    of strings. According to amount of jobs, it splits it at normal 
+    termination line"""
+    
     parsed_out = []
     
     if len(jobs.split()) > 2:
         job_chunk = []
-        with open(g09out, 'r') as out:
-            for line in out:
-                job_chunk.append(line)
-                if 'Normal termination' in line:
-                    parsed_out.append(job_chunk)
-                    job_chunk = []
+        for line in g09out_lines:
+            job_chunk.append(line)
+            if 'Normal termination' in line:
+                parsed_out.append(job_chunk)
+                job_chunk = []
     else:
-        with open(g09out, 'r') as out:
-            for line in out:
-                parsed_out.append(line)
+        for line in g09out_lines:
+            parsed_out.append(line)
                 
                 
     return parsed_out
@@ -170,18 +193,41 @@ def freq_proc(parsed_freq):
 
 #%% combination of processing functions
 
-def out_proc(g09out_name, pathin, steps, get_sp = False):
+def out_proc(g09out_name, pathin, steps, get_sp = False, with_mol = False):
     """Processes output according to jobs found in it. 
     If opt was done, g09 input files with optimized geoms are written in 'geometries' subfolder.
     Out: result_headers list and results list (with values corresponding to headers).
     """
     
     jobs, route = get_jobs(os.path.join(pathin, g09out_name))
+    
+    if 'irc' in jobs:
+        # IRC outputs are streamed from the open file, not loaded
+        with open(os.path.join(pathin, g09out_name)) as out:
+            return parsed_proc(g09out_name, jobs, route, out, pathin, steps, get_sp,
+                               with_mol)
+    
     parsed_out = parse_file(os.path.join(pathin, g09out_name), jobs)
     
+    return parsed_proc(g09out_name, jobs, route, parsed_out, pathin, steps, get_sp,
+                       with_mol)
+
+
+def parsed_proc(g09out_name, jobs, route, parsed_out, pathin, steps, get_sp = False,
+                with_mol = False):
+    """Processes parsed output (from parse_file or split_jobs) according to 
+    jobs found in it. 
+    If opt was done, g09 input files with optimized geoms are written in 
+    'geometries' subfolder of pathin. If irc was done, the reaction path is
+    written in 'irc' subfolder (see g09irc), parsed_out can be the open file.
+    Relaxed scans (opt=modredundant) are written in 'scan' subfolder.
+    Out: results list (with values corresponding to headers).
+    If with_mol = True, out: results list, final Molecule object.
+    """
     
 #    result_headers = ['filename', 'route', 'jobs']
-    results = [g09out_name, f'"{route}"' , jobs]
+    results = [g09out_name, route, jobs]
+    molecule = None
     
     if 'opt' in jobs:
         try:
@@ -197,6 +243,7 @@ def out_proc(g09out_name, pathin, steps, get_sp = False):
             # Process opt+freq calc
             
             opt_results = opt_proc(parsed_out[0], steps)
+            molecule = opt_results[1]
             
             #For now, only process finalSCF and final geometry.
             
@@ -222,6 +269,7 @@ def out_proc(g09out_name, pathin, steps, get_sp = False):
             # result_headers += ['SCFenergy']
 
             opt_results = opt_proc(parsed_out, steps)
+            molecule = opt_results[1]
             
             #For now, only process finalSCF and final geometry.
             
@@ -233,6 +281,10 @@ def out_proc(g09out_name, pathin, steps, get_sp = False):
             results.append(opt_results[0])
             
     
+        if 'modredundant' in route.lower():
+            write_scan(g09out_name, route, parsed_out[0] if 'freq' in jobs else parsed_out,
+                       pathin)
+    
     elif 'freq' in jobs:
         # process only freq calc
         # result_headers += ['n_negFreq', 'neg_freq', 'SCFenergy', 'electronic+ZPE',
@@ -246,6 +298,20 @@ def out_proc(g09out_name, pathin, steps, get_sp = False):
             results += [freqs, 'NA'] + energies
     
         
+    elif 'irc' in jobs:
+        # reaction path written as .npz and .xyz in 'irc' subfolder,
+        # SCF energy of TS in results
+        pathout = os.path.join(pathin, 'irc')
+        os.makedirs(pathout, exist_ok = True)
+        
+        irc = g09irc.irc_path(parsed_out, route)
+        g09irc.write_path(g09out_name, irc, pathout)
+        
+        results.append(irc['energy'][irc['path'] == 0][0])
+        if with_mol:
+            molecule = Molecule({i+1: xyz for i, xyz in enumerate(irc['coords'][irc['path'] == 0][0])},
+                                {i+1: int(z) for i, z in enumerate(irc['atom_types'])})
+    
     elif get_sp:
         # analyse single point, get SCF energy
         results.append(g09opt.get_SCF(parsed_out))
@@ -253,54 +319,315 @@ def out_proc(g09out_name, pathin, steps, get_sp = False):
     else:
         raise ValueError('The type of calculation cannot be processed yet.')
 
+    if with_mol:
+        if not molecule:
+            molecule = get_out_molecule(parsed_out, route)
+        return results, molecule
+    
+    return results
+
+
+def write_scan(g09out_name, route, parsed_opt, pathin):
+    """Write gridded relaxed scan of parsed opt=modredundant output in 'scan'
+    subfolder of pathin (see g09pes). Nothing is written if there are no
+    scanned coordinates (only frozen ones)."""
+    
+    try:
+        grid = g09pes.scan_grid(parsed_opt, route)
+    except ValueError:
+        return
+    
+    pathout = os.path.join(pathin, 'scan')
+    os.makedirs(pathout, exist_ok = True)
+    g09pes.write_npz(g09out_name, grid, pathout)
+
+
+def get_out_molecule(parsed_out, route):
+    """Get Molecule object (with charge and multiplicity) from parsed freq 
+    or sp output."""
+    
+    if 'nosymm' in route.lower():
+        molecule = g09opt.get_mol_nosymm(parsed_out)
+    else:
+        molecule = g09opt.get_molecule(parsed_out)
+    
+    try:
+        molecule.charge, molecule.mult, molecule.title = g09opt.get_specs([parsed_out])
+    except Exception:
+        pass
+    
+    return molecule
+
+
+#%% results table
+
+def get_headers(jobs, fields = None):
+    """Returns list of headers for results table according to jobs, or
+    to fields if provided (see g09extract)."""
+    
+    if fields:
+        result_headers = ['filename', 'route', 'jobs'] + g09extract.field_headers(fields)
+    elif 'freq' in jobs:
+        result_headers = ['filename', 'route', 'jobs', 'n_negFreq', 'neg_freq', 'SCFenergy', 
+                          'electronic+ZPE', 'electronic+enthalpy', 'electronic+entropy', 'electronic+free']
+    else: # opt or SP jobs, no freq
+        result_headers = ['filename', 'route', 'jobs', 'SCFenergy']
+    
+    return result_headers
+
+#%% on-demand extraction
+
+def fields_proc(g09out_name, pathin, fields, with_mol = False, lines = None):
+    """Processes only fields of g09 output (see g09extract), in one scan
+    from the end of the file (or of lines, if already read) that stops when
+    all of them are found. Only the outputs of fields requested are written:
+    with geometry, g09 input with final geom in 'geometries' subfolder
+    (_opt.com, or _geom.com for opt+freq), with charges, Mulliken charges in
+    'charges' subfolder.
+    Out: results list (headers from get_headers(jobs, fields)).
+    If with_mol = True, out: results list, final Molecule object (None 
+    without geometry)."""
+    
+    if lines is None:
+        jobs, route = get_jobs(os.path.join(pathin, g09out_name))
+        found = g09extract.extract_file(os.path.join(pathin, g09out_name), fields)
+    else:
+        jobs, route = read_jobs(lines)
+        found = g09extract.extract_lines(lines, fields)
+    
+    results = [g09out_name, route, jobs] + g09extract.values(found, fields)
+    molecule = g09extract.get_molecule(found)
+    name = g09out_name.rsplit(".", 1)[0]
+    
+    if molecule and 'opt' in jobs:
+        pathout = os.path.join(pathin, 'geometries')
+        os.makedirs(pathout, exist_ok = True)
+        suffix = '_geom.com' if 'freq' in jobs else '_opt.com'
+        g09_job(molecule).write_input(os.path.join(pathout, name + suffix))
+    
+    if 'charges' in found:
+        pathout = os.path.join(pathin, 'charges')
+        os.makedirs(pathout, exist_ok = True)
+        with open(os.path.join(pathout, name + '_charges.csv'), 'w') as f:
+            f.write('atom,charge\n')
+            for i, charge in enumerate(found['charges']['charges']):
+                f.write(f'{i+1},{charge}\n')
+    
+    if with_mol:
+        return results, molecule
+    
     return results
 
 
+#%% processing of lines read in memory (tar archives, prefetched files)
+
+def member_proc(g09out_name, lines, pathin, steps, get_sp, with_mol = False, 
+                fields = None):
+    """Processes g09 output already read into a list of lines (tar archive 
+    member or prefetched file).
+    Out: ('ok', results list), ('not_normal_term', None) or 
+    ('error', error message).
+    If with_mol = True, results list is replaced by (results list, Molecule).
+    If fields is provided, only those are processed (see fields_proc)."""
+    
+    if not check_term_lines(lines[-3:]):
+        return 'not_normal_term', None
+    
+    try:
+        if fields:
+            return 'ok', fields_proc(g09out_name, pathin, fields, with_mol, lines)
+        jobs, route = read_jobs(lines)
+        parsed_out = split_jobs(lines, jobs)
+        return 'ok', parsed_proc(g09out_name, jobs, route, parsed_out, 
+                                 pathin, steps, get_sp, with_mol)
+    except Exception as e:
+        return 'error', str(e)
+
+def stream_proc(path, member_results, out_format = 'csv', store = None, 
+                move_errors = False, failed = None, results_name = 'g09_results',
+                fields = None):
+    """Writes results in path (results_name + extension) from iterator of
+    (filename, member_proc output).
+    Results headers are taken from the first file processed.
+    If move_errors = True, files that did not end in normal termination
+    are moved to not_normal_term subfolder (see error_term).
+    If failed list is provided, files that could not be processed are 
+    appended to it (path relative to path).
+    fields must be those given to member_proc, if any."""
+    
+    writer = None
+    try:
+        for filename, (status, out) in member_results:
+            if status == 'not_normal_term':
+                print(f'{filename} did not end in normal termination.')
+                if move_errors:
+                    error_term(filename, path)
+                    filename = os.path.join('not_normal_term', filename)
+                if failed is not None:
+                    failed.append(filename)
+            elif status == 'error':
+                if failed is not None:
+                    failed.append(filename)
+                print(f'Could not process {filename}. Error: {out}')
+            else:
+                if store:
+                    out, molecule = out
+                if not writer:
+                    result_headers = get_headers(out[2], fields)
+                    writer = g09results.open_writer(path, result_headers, out_format,
+                                                    results_name)
+                writer.append(out)
+                if store:
+                    store.add_g09(path, get_headers(out[2], fields), out, molecule)
+    finally:
+        if store:
+            store.close()
+    
+    if not writer:
+        print(f'No jobs ended in Normal termination.')
+        return
+    
+    writer.close()
+
+def main_tar(tar_path, g09_files = None, steps = False, extension = '.log', 
+             get_sp = False, workers = None, out_format = 'csv', db = None,
+             results_name = 'g09_results', fields = None):
+    """Processes g09 output files inside a tar archive without extracting them.
+    Results (and geometries subfolder) are written in the directory of 
+    the archive. Files that did not end in normal termination are reported
+    but stay in the archive.
+    """
+    
+    path = os.path.dirname(os.path.abspath(tar_path))
+    store = g09db.ResultsStore(db) if db else None
+    
+    member_results = g09tar.map_members(member_proc, tar_path, extension, g09_files, 
+                                        workers, (path, steps, get_sp, bool(store), fields))
+    
+    stream_proc(path, member_results, out_format, store, results_name = results_name,
+                fields = fields)
+
+
+#%% topology check
+
+def check_topology(path, g09_files, failed, workers = None):
+    """Topology check (g09topo) of the optimizations in g09_files that
+    did not fail (sp and freq jobs have no geometries to compare)."""
+    
+    import g09topo
+    
+    # failed files moved to not_normal_term are listed with that folder
+    failed_names = {os.path.basename(x) for x in failed}
+    opt_files = [x for x in g09_files if x not in failed_names 
+                 and 'opt' in get_jobs(os.path.join(path, x))[0]]
+    
+    if opt_files:
+        g09topo.main(path, opt_files, workers = workers)
+
+
 #%% main function
 
-def main(path, g09_files = None, steps = False, extension = '.log', get_sp = False):
+def main(path, g09_files = None, steps = False, extension = '.log', get_sp = False,
+         workers = None, out_format = 'csv', db = None, inflight = None,
+         restart = False, topology = False, results_name = 'g09_results',
+         fields = None):
     """Processes g09 output files. 
     If no list of files is provided, g09 out files ar looked for in path and
     all found are used.
+    path can also be a tar archive (compressed or not), see main_tar.
     All files must have done the same calculation.
+    Results are written as results_name (default g09_results) with 
+    out_format: 'csv', 'npy' (numpy structured array) or 'parquet' (needs
+    pyarrow), see g09results.
+    If db (SQLite file) is provided, results and final geometries are also 
+    upserted into that database, see g09db.
+    If inflight is provided, files are read once each by a pool of I/O 
+    threads with up to inflight reads at a time, overlapping with parsing
+    (for network filesystems), see g09prefetch.
+    If restart = True, restart inputs are written in restart subfolder from
+    the last geometry of files that did not end in normal termination or
+    could not be processed (e.g. incomplete optimizations), see g09restart.
+    Not available for tar archives.
+    If topology = True, optimizations whose bonds changed (isomerized or 
+    fragmented) are written in topology_changes.csv, see g09topo.
+    If fields is provided (e.g. ['scf']), only those are extracted, scanning
+    each file from its end and stopping when all are found, and only their
+    outputs are written (see fields_proc and g09extract).
     """
+    
+    if fields:
+        g09extract.resolve(fields) # unknown fields raise ValueError
+    if g09tar.is_tar(path):
+        return main_tar(path, g09_files, steps, extension, get_sp, workers, 
+                        out_format, db, results_name, fields)
+    
     if not g09_files:
         g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
     
     if len(g09_files) == 0:
         raise ValueError(f'No files of extension {extension} found.')
     
+    failed = []
+    
+    if inflight:
+        store = g09db.ResultsStore(db) if db else None
+        member_results = g09prefetch.map_files(member_proc, path, g09_files, inflight, 
+                                               args = (path, steps, get_sp, bool(store), fields))
+        stream_proc(path, member_results, out_format, store, move_errors = True,
+                    failed = failed, results_name = results_name, fields = fields)
+        if restart and failed:
+            g09restart.main(path, failed, workers = workers)
+        if topology:
+            check_topology(path, g09_files, failed, workers)
+        return
+    
     for i, file in reverse_enum(g09_files):
         if not check_term(file, path):
             error_term(file, path)
             error_file = g09_files.pop(i)
+            failed.append(os.path.join('not_normal_term', error_file))
             print(f'{error_file} did not end in normal termination.')
     
     if len(g09_files) == 0:
         print(f'No jobs ended in Normal termination.')
+        if restart and failed:
+            g09restart.main(path, failed, workers = workers)
         return
         
     jobs = get_jobs(os.path.join(path, g09_files[0]))[0]
 
-    if 'freq' in jobs:
-        result_headers = ['filename', 'route', 'jobs', 'n_negFreq', 'neg_freq', 'SCFenergy', 
-                          'electronic+ZPE', 'electronic+enthalpy', 'electronic+entropy', 'electronic+free']
-    else: # opt or SP jobs, no freq
-        result_headers = ['filename', 'route', 'jobs', 'SCFenergy']
+    result_headers = get_headers(jobs, fields)
     
-    results = []
-    for filename in g09_files:
-        try:
-            results.append(out_proc(filename, path, steps, get_sp))
-        except Exception as e:
-            print(f'Could not process {filename}. Error: {e}')
-    
-    with open(os.path.join(path, 'g09_results.csv'), 'w') as out:
-        out.write(','.join(result_headers))
-        out.write('\n')
-        for line in results:
-            out.write(','.join([str(x) for x in line]))
-            out.write('\n')
+    store = g09db.ResultsStore(db) if db else None
+    
+    try:
+        with g09results.open_writer(path, result_headers, out_format, results_name) as writer:
+            for filename in g09_files:
+                try:
+                    if fields:
+                        results, molecule = fields_proc(filename, path, fields, with_mol = True)
+                        if store:
+                            store.add_g09(path, result_headers, results, molecule)
+                    elif store:
+                        results, molecule = out_proc(filename, path, steps, get_sp, 
+                                                     with_mol = True)
+                        store.add_g09(path, get_headers(results[2]), results, molecule)
+                    else:
+                        results = out_proc(filename, path, steps, get_sp)
+                    writer.append(results)
+                except Exception as e:
+                    failed.append(filename)
+                    print(f'Could not process {filename}. Error: {e}')
+
+    finally:
+        if store:
+            store.close()
+    
+    if restart and failed:
+        g09restart.main(path, failed, workers = workers)
+    
+    if topology:
+        check_topology(path, g09_files, failed, workers)
         
 #%% input parser
 
@@ -309,10 +636,10 @@ if __name__ == '__main__':
     
     import argparse as ap
     parser = ap.ArgumentParser(prog = 'proc_g09out', 
-                               description = 'Process g09 output files with opt, freq or SP jobs.')
+                               description = 'Process g09 output files with opt, freq, IRC or SP jobs.')
     
     parser.add_argument('-p', '--path', type = str, default = '.',
-                        help = 'path for directory to work in')
+                        help = 'path for directory to work in, or tar archive (.tar, .tar.gz) with g09 output files')
     parser.add_argument('-i', '--input', type = list, default = None,
                         help = 'list of g09 output files. defaults to all files in working directory')
     parser.add_argument('-e', '--ext', type = str, default = '.log',
@@ -321,8 +648,25 @@ if __name__ == '__main__':
                         help = 'get SCF energy from SP or other calculations')
     parser.add_argument('-s', '--steps', type = bool, default = False,
                         help = 'if opt job was done, get array of SCF energy por each opt step. Not implemented yet.')
- 
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of parallel workers for uncompressed tar archives. defaults to all cpus')
+    parser.add_argument('-f', '--format', type = str, default = 'csv',
+                        choices = ['csv', 'npy', 'parquet'],
+                        help = 'format for results file (csv/npy/parquet). npy and parquet have typed columns')
+    parser.add_argument('-db', '--database', type = str, default = None,
+                        help = 'SQLite database file to upsert results and geometries into (see g09db)')
+    parser.add_argument('-n', '--inflight', type = int, default = None,
+                        help = 'read files with this many concurrent reads (for network filesystems)')
+    parser.add_argument('-r', '--restart', action = 'store_true',
+                        help = 'write restart inputs from last geometry of failed jobs (see g09restart)')
+    parser.add_argument('-t', '--topology', action = 'store_true',
+                        help = 'write optimizations that isomerized or fragmented in topology_changes.csv (see g09topo)')
+    parser.add_argument('-F', '--fields', type = str, nargs = '+', default = None,
+                        help = f'only extract these fields: {", ".join(g09extract.public_fields())}')
+
     args = parser.parse_args()
      
     main(args.path, g09_files = args.input, steps = args.steps,
-         extension = args.ext, get_sp = args.get_sp)
\ No newline at end of file
+         extension = args.ext, get_sp = args.get_sp, workers = args.workers,
+         out_format = args.format, db = args.database, inflight = args.inflight,
+         restart = args.restart, topology = args.topology, fields = args.fields)
\ No newline at end of file
@@ -15,38 +15,205 @@ with desired Link specs and route line.
 #%% modules
 
 import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 #%% 
 
+# Link0 memory units, in bytes (no unit: words)
+MEM_UNITS = {'kb': 1024, 'mb': 1024**2, 'gb': 1024**3, 'tb': 1024**4,
+             'b': 1, 'w': 8, 'kw': 8*1024, 'mw': 8*1024**2, 'gw': 8*1024**3, 'tw': 8*1024**4,
+             '': 8}
+
+
+def read_header(in_file):
+    """Link0 specs and route of list of lines of g09 input file.
+    Out: dictionary Link0 keyword (lowercase, without %): (line index, value),
+    route (lines of route section joined, None if not found) and 
+    (start, end) indices of the lines of the route section."""
+    
+    link0 = {}
+    start = None
+    end = len(in_file)
+    for i, line in enumerate(in_file):
+        stripped = line.strip()
+        if start is None:
+            if stripped.startswith('%'):
+                key, _, value = stripped[1:].partition('=')
+                link0[key.strip().lower()] = (i, value.strip())
+            elif stripped.startswith('#'):
+                start = i
+        elif not stripped:
+            end = i
+            break
+    
+    if start is None:
+        return link0, None, (end, end)
+    
+    return link0, ' '.join(line.strip() for line in in_file[start:end]), (start, end)
+
+
+def split_route(route):
+    """Print level (#, #p, #n or #t) and keywords of route."""
+    
+    route = route.strip()
+    first = route.split()[0] if route.split() else ''
+    if first.lower() in ('#', '#p', '#n', '#t'):
+        return first, route[len(first):].strip()
+    
+    return '#', route.lstrip('#').strip()
+
+
+def same_route(route, other):
+    """True if routes have the same print level and keywords (case and 
+    spacing are not significant)."""
+    
+    level, keywords = split_route(route)
+    other_level, other_keywords = split_route(other)
+    
+    return (level.lower() == other_level.lower() 
+            and keywords.lower().split() == other_keywords.lower().split())
+
+
+def strip_route(route):
+    """Route keywords without # and print level, as route of new_g09in
+    (rewritten inputs keep their print level)."""
+
+    return split_route(route)[1]
+
+
+def add_options(route, options):
+    """Add options to keywords of route (without #), e.g.
+    add_options('B3LYP/6-31G* opt', {'opt': ['maxcycles=200']}) returns
+    'B3LYP/6-31G* opt=(maxcycles=200)'. Keywords not in route are added."""
+
+    tokens = route.split()
+    for keyword, new in options.items():
+        for i, token in enumerate(tokens):
+            name = token.split('=')[0].split('(')[0]
+            if name.lower() == keyword:
+                current = token[len(name):].lstrip('=').strip('()')
+                # new options replace current ones with the same name
+                names = [o.split('=')[0].lower() for o in new]
+                opts = [o for o in current.split(',') if o and o.split('=')[0].lower() not in names]
+                opts += new
+                tokens[i] = f'{name}=({",".join(opts)})'
+                break
+        else:
+            tokens.append(f'{keyword}=({",".join(new)})')
+
+    return ' '.join(tokens)
+
+
+def remove_options(route, options):
+    """Remove options from keywords of route (without #), e.g.
+    remove_options('B3LYP/6-31G* opt guess=(read,mix)', {'guess': ['read']})
+    returns 'B3LYP/6-31G* opt guess=(mix)'. Keywords left without options,
+    or with None as options, are removed."""
+
+    tokens = route.split()
+    for keyword, old in options.items():
+        for i, token in enumerate(tokens):
+            name = token.split('=')[0].split('(')[0]
+            if name.lower() == keyword:
+                current = token[len(name):].lstrip('=').strip('()')
+                names = [o.split('=')[0].lower() for o in old or []]
+                opts = [o for o in current.split(',') if o and o.split('=')[0].lower() not in names]
+                tokens[i] = f'{name}=({",".join(opts)})' if old and opts else None
+        tokens = [t for t in tokens if t]
+
+    return ' '.join(tokens)
+
+
+def mem_bytes(value):
+    """Bytes of %Mem value (e.g. 2GB, 2000MB), None if not understood."""
+    
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([kmgt]?[bw])?', value.strip().lower())
+    if not match or (match.group(2) or '') not in MEM_UNITS:
+        return None
+    
+    return float(match.group(1)) * MEM_UNITS[match.group(2) or '']
+
+
+def new_g09in(in_file, route = None, chk = None, mem = None, nproc = None):
+    """From list of lines of g09 input file, return list of lines of the
+    rewritten input. Only the header is changed, and only where it differs
+    from the requested specs: %chk, %Mem (GB, or value with units as
+    '3000MB') and %nprocshared lines are 
+    replaced (or added to Link0 if missing) and the route section (all its
+    lines) replaced by one route line. route is given without # (the print
+    level of the input is kept) or with it. Other lines are kept as they are,
+    so an input that already has the requested specs is returned unchanged."""
+    
+    new_file = list(in_file)
+    link0, current_route, (start, end) = read_header(new_file)
+    
+    if route and current_route is not None:
+        if not route.lstrip().startswith('#'):
+            route = f'{split_route(current_route)[0]} {route.strip()}'
+        if not same_route(route, current_route):
+            new_file[start:end] = [route.strip()]
+    
+    specs = [] # (Link0 keywords, line, value in file is the requested one)
+    if chk:
+        specs.append((['chk'], f'%chk={chk}', lambda v: v == chk))
+    if mem:
+        mem = mem if isinstance(mem, str) else f'{mem}GB'
+        specs.append((['mem'], f'%Mem={mem}', lambda v: mem_bytes(v) == mem_bytes(mem)))
+    if nproc:
+        specs.append((['nprocshared', 'nproc'], f'%nprocshared={nproc}',
+                      lambda v: v.isdigit() and int(v) == int(nproc)))
+    
+    missing = []
+    for keys, line, same in specs:
+        key = next((k for k in keys if k in link0), None)
+        if key is None:
+            missing.append(line)
+        elif not same(link0[key][1]):
+            new_file[link0[key][0]] = line
+    
+    # missing %chk first, as g09_job writes it, others after Link0 lines
+    after = max((i for i, value in link0.values()), default = -1) + 1
+    for line in reversed(missing):
+        new_file.insert(0 if line.startswith('%chk') else after, line)
+    
+    return new_file
+
 
 def rewrite_g09in(g09in_file, route = None, chk = None, mem = None, nproc = None):
+    """Rewrite g09 input file with provided link0 specs and route line.
+    File is only written if its header differs from the requested specs
+    (see new_g09in), into a temporary file that replaces the original one
+    (an interrupted rewrite does not leave a truncated input).
+    Returns True if file was changed, False if it was left untouched."""
+    
     with open(g09in_file, 'r') as file:
-        in_file = file.read().splitlines()
+        old = file.read().splitlines()
     
+    new = new_g09in(old, route, chk, mem, nproc)
     
-    with open(g09in_file, 'w') as newfile:
-        i = 0
-        if chk:
-            newfile.write(f'%chk={chk} \n')
-            
-            if 'chk' in in_file[0]:
-                i += 1
-        
-        while i < len(in_file):
-            line = in_file[i]
-            i += 1
-            if nproc and 'nproc' in line:
-                newfile.write(f'%nprocshared={nproc} \n')
-            elif mem and 'Mem' in line:
-                newfile.write(f'%Mem={mem}GB \n')
-            elif route and line.startswith('#'):
-                newfile.write(f'# {route} \n')
-            else:
-                newfile.write(f'{line} \n')
+    if new == old:
+        return False
+    
+    path = os.path.dirname(os.path.abspath(g09in_file))
+    with tempfile.NamedTemporaryFile('w', dir = path, delete = False,
+                                     prefix = '.rw_', suffix = '.tmp') as tmp:
+        tmp.write('\n'.join(new) + '\n')
+    shutil.copymode(g09in_file, tmp.name)
+    os.replace(tmp.name, g09in_file)
+    
+    return True
                 
 #%% 
                 
-def main(path, g09_files = None, extension = '.com', route = None, chk = False, mem = None, nproc = None):
+def main(path, g09_files = None, extension = '.com', route = None, chk = False, mem = None, nproc = None,
+         workers = None):
+    """Rewrite g09 input files in path with a pool of threads (workers, None 
+    uses default pool size). Files already with the requested specs are 
+    not written (their mtime does not change).
+    Returns number of changed and skipped files."""
 
     if not g09_files:
         g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
@@ -57,12 +224,18 @@ def main(path, g09_files = None, extension = '.com', route = None, chk = False,
     if chk == 'F':
         chk = False
 
-    for file in g09_files:
-        if chk: 
-            chk = file[:-4]+'.chk'
-            rewrite_g09in(os.path.join(path, file), route = route, chk = chk, mem = mem, nproc = nproc)
-        if not chk:
-            rewrite_g09in(os.path.join(path, file), route = route, mem = mem, nproc = nproc)
+    def rewrite(file):
+        chk_name = file[:-4]+'.chk' if chk else None
+        return rewrite_g09in(os.path.join(path, file), route = route, chk = chk_name, 
+                             mem = mem, nproc = nproc)
+    
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        changed = sum(pool.map(rewrite, g09_files))
+    
+    skipped = len(g09_files) - changed
+    print(f'{changed} files rewritten, {skipped} unchanged.')
+    
+    return changed, skipped
             
 
 #%% 
@@ -87,9 +260,11 @@ if __name__ == '__main__':
                         help = 'add chk line to input files (T/F)')
     parser.add_argument('-e', '--ext', type = str, default = '.com',
                         help = 'extension of g09 input files. if incorrect files wont be found')
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of threads for rewriting files')
 
     args = parser.parse_args()
      
     main(args.path, g09_files = args.input, extension = args.ext, route = args.route,
-         chk = args.chk, mem = args.mem, nproc = args.nproc)
+         chk = args.chk, mem = args.mem, nproc = args.nproc, workers = args.workers)
 
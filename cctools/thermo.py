@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:02:44 2026
+
+@author: nat
+"""
+
+#thermo.py
+
+"""Thermochemistry from already parsed frequencies and geometries, without
+running new freq jobs. ZPE, thermal energy, enthalpy, entropy and free energy
+are computed with the ideal gas / rigid rotor / harmonic oscillator model
+(as in g09) for a batch of conformers over a grid of temperatures and pressures.
+Low frequency modes can be treated with quasi-RRHO corrections:
+    'grimme': entropy of low modes interpolated to free rotor entropy
+    (Grimme, Chem. Eur. J. 2012, 18, 9955).
+    'truhlar': frequencies below cutoff raised to cutoff for the entropy
+    (Ribeiro, Marenich, Cramer, Truhlar, J. Phys. Chem. B 2011, 115, 14556).
+All arrays of a batch are padded: frequencies with nan, masses with 0.
+"""
+
+#%% modules
+
+import os
+
+import numpy as np
+
+from molecule import periodic_table
+
+
+#%% constants (SI)
+
+H_PLANCK = 6.62607015e-34 # J s
+KB = 1.380649e-23 # J/K
+C_CM = 2.99792458e10 # speed of light, cm/s
+AMU = 1.66053906660e-27 # kg
+HARTREE_J = 4.3597447222071e-18 # J
+ATM = 101325.0 # Pa
+B_AV = 1e-44 # kg m2, average moment of inertia for free rotor (Grimme)
+
+# mass of most abundant isotope (amu), index is atomic number (as in g09)
+atomic_masses = [0.0, 1.00782504, 4.00260325, 7.01600450, 9.01218220, 11.00930530,
+                 12.00000000, 14.00307401, 15.99491464, 18.99840325, 19.99243910,
+                 22.98976970, 23.98504500, 26.98154130, 27.97692840, 30.97376340,
+                 31.97207180, 34.96885273, 39.96238310, 38.96370790, 39.96259070,
+                 44.95591360, 47.94794670, 50.94396250, 51.94050970, 54.93804630,
+                 55.93493930, 58.93319780, 57.93534710, 62.92959920, 63.92914540,
+                 68.92558090, 73.92117880, 74.92159550, 79.91652050, 78.91833610,
+                 83.91150640, 84.91170000, 87.90560000, 88.90540000, 89.90430000,
+                 92.90600000, 97.90550000, 98.90630000, 101.90370000, 102.90480000,
+                 105.90320000, 106.90509000, 113.90360000, 114.90410000, 119.90220000,
+                 120.90380000, 129.90670000, 126.90040000, 131.90420000]
+
+
+#%% batch input
+
+def pad(arrays, fill = np.nan):
+    """Stack list of 1D arrays (or 2D arrays, along first axis) of different
+    lengths into one array padded with fill."""
+
+    n = max(len(a) for a in arrays)
+    shape = (len(arrays), n) + np.shape(arrays[0])[1:]
+    out = np.full(shape, fill, dtype = float)
+    for i, a in enumerate(arrays):
+        out[i, :len(a)] = a
+
+    return out
+
+
+def get_masses(molecule):
+    """Atomic masses (amu) of Molecule object, ordered by atom number.
+    Atom types can be atomic numbers or element symbols."""
+
+    masses = []
+    for n in molecule.atom_types:
+        atom = molecule.atom_types[n]
+        if isinstance(atom, str):
+            atom = periodic_table.index(atom)
+        if atom >= len(atomic_masses):
+            raise ValueError(f'No mass for element {periodic_table[atom]}.')
+        masses.append(atomic_masses[atom])
+
+    return np.array(masses)
+
+
+#%% contributions
+
+def principal_moments(coords, masses):
+    """Principal moments of inertia (amu A2) for batch.
+    coords: (nconf, natoms, 3), masses: (nconf, natoms).
+    Out: (nconf, 3), ascending."""
+
+    com = (masses[..., None] * coords).sum(1) / masses.sum(1)[:, None]
+    r = coords - com[:, None, :]
+    r2 = (r**2).sum(-1)
+    inertia = (np.einsum('ca,ca->c', masses, r2)[:, None, None] * np.eye(3)
+               - np.einsum('ca,cai,caj->cij', masses, r, r))
+
+    return np.linalg.eigvalsh(inertia)
+
+
+def vib_terms(freqs, T):
+    """Harmonic oscillator contributions per mode.
+    freqs: (nconf, nmodes) in cm-1 (nan and negative are left out),
+    T: (nT,).
+    Out: zpe (nconf,), thermal energy and entropy (nconf, nT, nmodes),
+    in J (per molecule) and J/K."""
+
+    nu = np.where(freqs > 0, freqs, np.nan) * C_CM
+    e_mode = H_PLANCK * nu
+    zpe = np.nansum(e_mode / 2, axis = 1)
+
+    x = e_mode[:, None, :] / (KB * T[None, :, None])
+    with np.errstate(over = 'ignore'):
+        ex = np.expm1(x)
+        energy = e_mode[:, None, :] * (0.5 + 1 / ex)
+        entropy = KB * (x / ex - np.log1p(-np.exp(-x)))
+
+    return zpe, np.nan_to_num(energy), np.nan_to_num(entropy)
+
+
+def free_rotor_entropy(freqs, T):
+    """Entropy (J/K per molecule) of free rotor with the same moment of
+    inertia as each vibrational mode (Grimme). Out: (nconf, nT, nmodes)."""
+
+    nu = np.where(freqs > 0, freqs, np.nan) * C_CM
+    mu = H_PLANCK / (8 * np.pi**2 * nu)
+    mu = mu * B_AV / (mu + B_AV)
+    arg = 8 * np.pi**3 * mu[:, None, :] * KB * T[None, :, None] / H_PLANCK**2
+
+    return np.nan_to_num(KB * (0.5 + np.log(np.sqrt(arg))))
+
+
+#%% thermochemistry of batch
+
+def thermo_batch(freqs, masses, coords, temperatures = (298.15,),
+                 pressures = (1.0,), mult = 1, sigma = 1, qrrho = None,
+                 cutoff = 100.0):
+    """Thermochemistry for batch of conformers.
+    freqs: (nconf, nmodes) cm-1, padded with nan.
+    masses: (nconf, natoms) amu, padded with 0.
+    coords: (nconf, natoms, 3) Angstrom.
+    temperatures (K), pressures (atm): 1D grids.
+    mult, sigma: multiplicity and rotational symmetry number (int or (nconf,)).
+    qrrho: None, 'grimme' or 'truhlar'. cutoff: frequency (cm-1) for qrrho.
+    Out: dictionary with arrays in hartree (entropy in hartree/K):
+        zpe (nconf,), thermal and enthalpy (nconf, nT) corrections, entropy
+        and gibbs (nconf, nT, nP) corrections (add to electronic energy).
+    """
+
+    freqs = np.atleast_2d(np.asarray(freqs, dtype = float))
+    masses = np.atleast_2d(np.asarray(masses, dtype = float))
+    coords = np.asarray(coords, dtype = float).reshape(len(masses), -1, 3)
+    T = np.atleast_1d(np.asarray(temperatures, dtype = float))
+    P = np.atleast_1d(np.asarray(pressures, dtype = float)) * ATM
+    mult = np.broadcast_to(np.asarray(mult, dtype = float), (len(masses),))
+    sigma = np.broadcast_to(np.asarray(sigma, dtype = float), (len(masses),))
+
+    # translation: (nconf, nT, nP)
+    m = masses.sum(1) * AMU
+    q_trans = ((2 * np.pi * m[:, None] * KB * T[None, :] / H_PLANCK**2)**1.5)[..., None] \
+              * (KB * T[None, :, None] / P[None, None, :])
+    s_trans = KB * (np.log(q_trans) + 2.5)
+    e_trans = 1.5 * KB * T[None, :]
+
+    # rotation: (nconf, nT)
+    moments = principal_moments(coords, masses) * AMU * 1e-20
+    linear = moments[:, 0] < 1e-3 * moments[:, 2]
+    theta = H_PLANCK**2 / (8 * np.pi**2 * KB * np.where(moments > 0, moments, np.nan))
+    with np.errstate(invalid = 'ignore'):
+        q_nonlin = (np.sqrt(np.pi) / sigma[:, None] * T[None, :]**1.5
+                    / np.sqrt(np.prod(theta, axis = 1))[:, None])
+        q_lin = T[None, :] / (sigma[:, None] * theta[:, 2][:, None])
+    s_rot = np.where(linear[:, None], KB * (np.log(q_lin) + 1),
+                     KB * (np.log(q_nonlin) + 1.5))
+    e_rot = np.where(linear[:, None], 1.0, 1.5) * KB * T[None, :]
+
+    # vibration
+    zpe, e_vib, s_vib = vib_terms(freqs, T)
+    if qrrho == 'truhlar':
+        raised = np.where(freqs > 0, np.maximum(freqs, cutoff), freqs)
+        s_vib = vib_terms(raised, T)[2]
+    elif qrrho == 'grimme':
+        w = 1 / (1 + (cutoff / np.where(freqs > 0, freqs, np.inf))**4)
+        s_vib = w[:, None, :] * s_vib + (1 - w[:, None, :]) * free_rotor_entropy(freqs, T)
+    elif qrrho is not None:
+        raise ValueError("qrrho must be None, 'grimme' or 'truhlar'.")
+    e_vib = e_vib.sum(-1)
+    s_vib = s_vib.sum(-1)
+
+    # electronic
+    s_el = KB * np.log(mult)
+
+    thermal = e_trans + e_rot + e_vib
+    enthalpy = thermal + KB * T[None, :]
+    entropy = s_trans + (s_rot + s_vib + s_el[:, None])[..., None]
+    gibbs = enthalpy[..., None] - T[None, :, None] * entropy
+
+    return {'zpe': zpe / HARTREE_J,
+            'thermal': thermal / HARTREE_J,
+            'enthalpy': enthalpy / HARTREE_J,
+            'entropy': entropy / HARTREE_J,
+            'gibbs': gibbs / HARTREE_J}
+
+
+#%% from g09 outputs
+
+def get_symmetry_number(freq_job):
+    """Rotational symmetry number from parsed g09 freq job (1 if not found)."""
+
+    for line in freq_job:
+        if 'Rotational symmetry number' in line:
+            return int(float(line.split()[-1].rstrip('.')))
+
+    return 1
+
+
+def read_freq_out(g09out):
+    """Get SCF energy, frequencies, masses, coordinates, multiplicity and
+    symmetry number from g09 output file with freq job."""
+
+    import g09opt, g09freq
+    from proc_g09out import get_jobs, parse_file
+
+    jobs, route = get_jobs(g09out)
+    if 'freq' not in jobs:
+        raise ValueError('No freq job found.')
+    parsed_out = parse_file(g09out, jobs)
+    freq_job = parsed_out[1] if 'opt' in jobs else parsed_out
+
+    if 'nosymm' in route.lower():
+        molecule = g09opt.get_mol_nosymm(freq_job)
+    else:
+        molecule = g09opt.get_molecule(freq_job)
+    mult = 1
+    for line in freq_job:
+        if 'Multiplicity' in line:
+            mult = int(line.split()[5])
+            break
+
+    return {'scf': float(g09opt.get_SCF(freq_job)),
+            'freqs': g09freq.get_modes(freq_job)['freqs'],
+            'masses': get_masses(molecule),
+            'coords': np.array(molecule.arrXYZ()),
+            'mult': mult,
+            'sigma': get_symmetry_number(freq_job)}
+
+
+def main(path, g09_files = None, extension = '.log', temperatures = (298.15,),
+         pressures = (1.0,), qrrho = None, cutoff = 100.0,
+         out_filename = 'thermo_results.csv'):
+    """Recompute thermochemistry of g09 freq outputs in path for every
+    temperature and pressure of the grid. Writes csv with one row per
+    file, temperature and pressure (energies in hartree)."""
+
+    if not g09_files:
+        g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
+
+    data, names = [], []
+    for filename in g09_files:
+        try:
+            data.append(read_freq_out(os.path.join(path, filename)))
+            names.append(filename)
+        except Exception as e:
+            print(f'Could not process {filename}. Error: {e}')
+
+    if not data:
+        raise ValueError(f'No freq outputs of extension {extension} processed.')
+
+    result = thermo_batch(pad([d['freqs'] for d in data]),
+                          pad([d['masses'] for d in data], 0.0),
+                          pad([d['coords'] for d in data], 0.0),
+                          temperatures, pressures,
+                          mult = [d['mult'] for d in data],
+                          sigma = [d['sigma'] for d in data],
+                          qrrho = qrrho, cutoff = cutoff)
+
+    with open(os.path.join(path, out_filename), 'w') as out:
+        out.write('filename,T,P,SCFenergy,ZPE,thermal,enthalpy,entropy,gibbs,electronic+free\n')
+        for i, filename in enumerate(names):
+            scf = data[i]['scf']
+            for j, T in enumerate(np.atleast_1d(temperatures)):
+                for k, P in enumerate(np.atleast_1d(pressures)):
+                    g = result['gibbs'][i, j, k]
+                    out.write(f"{filename},{T},{P},{scf},{result['zpe'][i]:.6f},"
+                              f"{result['thermal'][i, j]:.6f},{result['enthalpy'][i, j]:.6f},"
+                              f"{result['entropy'][i, j, k]:.9f},{g:.6f},{scf + g:.6f}\n")
+
+
+#%% input parser
+
+if __name__ == '__main__':
+
+    import argparse as ap
+    parser = ap.ArgumentParser(prog = 'thermo',
+                               description = 'Recompute thermochemistry of g09 freq outputs over temperature and pressure grids.')
+
+    parser.add_argument('-p', '--path', type = str, default = '.',
+                        help = 'path for directory to work in')
+    parser.add_argument('-e', '--ext', type = str, default = '.log',
+                        help = 'extension of g09 output files')
+    parser.add_argument('-T', '--temperatures', type = float, nargs = '+', default = [298.15],
+                        help = 'temperatures (K), separated by blankspaces')
+    parser.add_argument('-P', '--pressures', type = float, nargs = '+', default = [1.0],
+                        help = 'pressures (atm), separated by blankspaces')
+    parser.add_argument('-q', '--qrrho', type = str, default = None,
+                        help = 'low frequency treatment: grimme or truhlar. default: harmonic')
+    parser.add_argument('-c', '--cutoff', type = float, default = 100.0,
+                        help = 'frequency cutoff (cm-1) for qrrho')
+    parser.add_argument('-o', '--out_name', type = str, default = 'thermo_results.csv',
+                        help = 'name of output csv file')
+
+    args = parser.parse_args()
+
+    main(args.path, extension = args.ext, temperatures = args.temperatures,
+         pressures = args.pressures, qrrho = args.qrrho, cutoff = args.cutoff,
+         out_filename = args.out_name)
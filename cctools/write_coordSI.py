@@ -15,7 +15,9 @@ in format for Supporting Information."""
 
 import os
 
-from proc_g09out import get_jobs, parse_file, check_term, error_term
+import g09tar, g09extract
+from proc_g09out import (get_jobs, parse_file, check_term, error_term, 
+                         check_term_lines, read_jobs, split_jobs)
 from g09freq import get_freq, get_Nneg
 from g09opt import get_SCF, get_molecule, split_opt, check_opt, get_mol_nosymm
 
@@ -150,6 +152,10 @@ def g09out_to_txt_list(pathin, g09out_name):
     jobs, route = get_jobs(os.path.join(pathin, g09out_name))
     parsed_out = parse_file(os.path.join(pathin, g09out_name), jobs)
     
+    return parsed_to_txt_list(jobs, route, parsed_out)
+
+def parsed_to_txt_list(jobs, route, parsed_out):
+    """Get output string list for writing SI txt from parsed g09 output."""
     
     if 'opt' in jobs:
         if 'freq' in jobs:
@@ -176,6 +182,11 @@ def g09out_to_xyz(pathin, g09out_name):
 
     jobs, route = get_jobs(os.path.join(pathin, g09out_name))
     parsed_out = parse_file(os.path.join(pathin, g09out_name), jobs)
+    
+    return parsed_to_xyz(g09out_name, jobs, route, parsed_out)
+
+def parsed_to_xyz(g09out_name, jobs, route, parsed_out):
+    """Get output string list for writing SI xyz from parsed g09 output."""
 
     if 'opt' in jobs:
         if 'freq' in jobs:
@@ -196,6 +207,48 @@ def g09out_to_xyz(pathin, g09out_name):
     return xyz_out
     
     
+#%% on-demand extraction
+
+def found_to_lists(g09out_name, found, fields):
+    """Get output string lists for SI txt and xyz from fields found by 
+    g09extract (xyz list is None without geometry)."""
+    
+    values = dict(zip(g09extract.field_headers(fields), g09extract.values(found, fields)))
+    molecule = g09extract.get_molecule(found)
+    
+    txt_list = []
+    if 'scf' in fields:
+        txt_list.append(f'Energy = {values["SCFenergy"]}')
+    if 'thermo' in fields:
+        txt_list.append(f'Free Energy = {values["electronic+free"]}')
+    if 'freqs' in fields:
+        txt_list.append(f'Number of Imaginary Frequencies = {values["n_negFreq"]}')
+    if 'timing' in fields:
+        txt_list += [f'CPU Time = {values["cpu_time"]} s', 
+                     f'Elapsed Time = {values["elapsed_time"]} s']
+    if 'dipole' in fields:
+        txt_list.append(f'Dipole Moment = {values["dipole"]} Debye')
+    if 'charges' in found:
+        txt_list += ['Mulliken Charges'] + [f'{i+1}\t{x}' for i, x in 
+                                            enumerate(found['charges']['charges'])]
+    if molecule:
+        txt_list += ['Geometry'] + molecule.tabXYZ()
+    
+    xyz_list = None
+    if molecule:
+        xyz_list = [f'{molecule.natoms}', f'{g09out_name}'] + molecule.strXYZ()
+    
+    return txt_list, xyz_list
+
+def g09out_to_lists(pathin, g09out_name, fields):
+    """Get output string lists for SI txt and xyz with only fields of g09 
+    output file, scanned once from its end (see g09extract)."""
+    
+    found = g09extract.extract_file(os.path.join(pathin, g09out_name), fields)
+    
+    return found_to_lists(g09out_name, found, fields)
+
+
 #%% write txt
 
 def write_txt(path, out_filename, results):
@@ -216,10 +269,80 @@ def write_xyz(path, out_filename, results):
     
 
 
+#%% processing of tar archives
+
+def member_to_lists(g09out_name, lines, out_type, fields = None):
+    """Get output string lists for SI from g09 output read from a tar archive 
+    member (list of lines). Output is parsed only once for txt and xyz.
+    Out: ('ok', (txt list, xyz list)), ('not_normal_term', None) or 
+    ('error', error message). Lists not requested by out_type are None.
+    If fields is provided, only those are extracted (see found_to_lists)."""
+    
+    if not check_term_lines(lines[-3:]):
+        return 'not_normal_term', None
+    
+    try:
+        if fields:
+            found = g09extract.extract_lines(lines, fields)
+            txt_list, xyz_list = found_to_lists(g09out_name, found, fields)
+            return 'ok', (txt_list if out_type in ('txt', 'both') else None,
+                          xyz_list if out_type in ('xyz', 'both') else None)
+        
+        jobs, route = read_jobs(lines)
+        parsed_out = split_jobs(lines, jobs)
+        
+        txt_list, xyz_list = None, None
+        if out_type in ('txt', 'both'):
+            txt_list = parsed_to_txt_list(jobs, route, parsed_out)
+        if out_type in ('xyz', 'both'):
+            xyz_list = parsed_to_xyz(g09out_name, jobs, route, parsed_out)
+        
+        return 'ok', (txt_list, xyz_list)
+    
+    except Exception as e:
+        return 'error', str(e)
+
+def main_tar(tar_path, g09_files = None, out_filename = "SI_coords", 
+             extension = '.log', out_type = 'both', workers = None, fields = None):
+    """Writes SI files from g09 output files inside a tar archive without 
+    extracting them. SI files are written in the directory of the archive."""
+    
+    path = os.path.dirname(os.path.abspath(tar_path))
+    
+    results = {}
+    results_xyz = {}
+    for filename, (status, out) in g09tar.map_members(member_to_lists, tar_path, 
+                                                      extension, g09_files, workers,
+                                                      (out_type, fields)):
+        if status == 'not_normal_term':
+            print(f'{filename} did not end in normal termination.')
+        elif status == 'error':
+            print(f'Could not process {filename}. Error: {out}')
+        else:
+            results[filename], results_xyz[filename] = out
+    
+    if out_type in ('txt', 'both'):
+        write_txt(path, out_filename, results)
+    if out_type in ('xyz', 'both') and (not fields or 'geometry' in fields):
+        write_xyz(path, out_filename, results_xyz)
+    
+
 #%% main function
 
 def main(path, g09_files = None, out_filename = "SI_coords", 
-         extension = '.log', out_type = 'both'):
+         extension = '.log', out_type = 'both', workers = None, fields = None):
+    """Writes SI files from g09 output files in path.
+    path can also be a tar archive (compressed or not), see main_tar.
+    If fields is provided (e.g. ['scf', 'geometry']), only those are 
+    extracted and written, scanning each file from its end (see g09extract);
+    the xyz file is only written with geometry."""
+    
+    if fields:
+        g09extract.resolve(fields) # unknown fields raise ValueError
+    
+    if g09tar.is_tar(path):
+        return main_tar(path, g09_files, out_filename, extension, out_type, workers,
+                        fields)
     
     if not g09_files:
         g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
@@ -234,7 +357,22 @@ def main(path, g09_files = None, out_filename = "SI_coords",
             print(f'{error_file} did not end in normal termination.')
     
     
-    if out_type == 'txt':
+    if fields:
+        results = {}
+        results_xyz = {}
+        for filename in g09_files:
+            try:
+                results[filename], results_xyz[filename] = g09out_to_lists(path, filename, 
+                                                                           fields)
+            except Exception as e:
+                print(f'Could not process {filename}. Error: {e}')
+        
+        if out_type in ('txt', 'both'):
+            write_txt(path, out_filename, results)
+        if out_type in ('xyz', 'both') and 'geometry' in fields:
+            write_xyz(path, out_filename, results_xyz)
+    
+    elif out_type == 'txt':
         results = {}
         for filename in g09_files:
             try:
@@ -285,7 +423,7 @@ if __name__ == '__main__':
                                in format for Supporting Information.""")
     
     parser.add_argument('-p', '--path', type = str, default = '.',
-                        help = 'path for directory to work in')
+                        help = 'path for directory to work in, or tar archive (.tar, .tar.gz) with g09 output files')
     parser.add_argument('-i', '--input', type = list, default = None,
                         help = 'list of g09 output files. defaults to all files in working directory')
     parser.add_argument('-e', '--ext', type = str, default = '.log',
@@ -294,8 +432,13 @@ if __name__ == '__main__':
                         help = 'Name for output file (without extension), defaults to SI_coords')
     parser.add_argument('-ot', '--out_type', type = str, default = "both",
                         help = 'type of output for SI coordinates (txt/xyz/both)')
+    parser.add_argument('-w', '--workers', type = int, default = None,
+                        help = 'number of parallel workers for uncompressed tar archives. defaults to all cpus')
+    parser.add_argument('-F', '--fields', type = str, nargs = '+', default = None,
+                        help = f'only extract and write these fields: {", ".join(g09extract.public_fields())}')
  
     args = parser.parse_args()
      
     main(args.path, g09_files = args.input, out_filename = args.out_name,
-         extension = args.ext, out_type = args.out_type)
+         extension = args.ext, out_type = args.out_type, workers = args.workers,
+         fields = args.fields)
@@ -35,10 +35,15 @@ class g09_job(Molecule):
         self.job = job # job keywords and options as string
         self.comment = None
         self.additional = False # for now the True option is not written
+        self.route = None # full route line (with #), if set replaces func, basis and job
+        self.link0 = None # list of Link0 lines, if set replaces nproc, mem and chk
     
     def get_link0(self):
         """Returns lines for link0 command section of g09 input as a list"""
         
+        if self.link0:
+            return list(self.link0)
+        
         link0 = [f'%nprocshared={self.nproc}',
                  f'%Mem={self.mem}GB']
         
@@ -48,7 +53,15 @@ class g09_job(Molecule):
         return link0
     
     def get_route(self):  
-        """Return route section line for g09 input as string"""
+        """Return route section line for g09 input as string.
+        Methods without basis set (semiempirical, e.g. PM6) are written
+        without '/'."""
+        
+        if self.route:
+            return self.route
+        
+        if not self.basis:
+            return f'# {self.func} {self.job}'.rstrip()
         
         return f'# {self.func}/{self.basis} {self.job}'
     
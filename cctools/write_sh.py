@@ -15,6 +15,13 @@ with SGE. """
 
 import os
 
+import numpy as np
+
+import g09check
+import rw_g09in
+from g09db import split_name
+from rw_g09in import add_options, read_header, remove_options, strip_route
+
 #%% get_nproc function
 
 def get_nproc(g09in_file):
@@ -28,14 +35,97 @@ def get_nproc(g09in_file):
     return nproc
 
 
+def get_chk(g09in_file):
+    """Read g09 input file and extract name of chk file (None if not used)."""
+    
+    with open(g09in_file, 'r') as f:
+        for line in f:
+            if line.lower().startswith('%chk'):
+                return line.split('=')[1].strip()
+            if line.startswith('#'):
+                return None
+
+
+#%% node-local scratch staging
+
+def soft_time(time, margin = 300):
+    """Wall clock time HH:MM:SS minus margin (s), for the soft limit that
+    sends a signal to the job before it is killed at the hard limit."""
+    
+    h, m, sec = [int(x) for x in time.split(':')]
+    total = max(60, h*3600 + m*60 + sec - margin)
+    
+    return f'{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}'
+
+
+def stage_sge_chunk(time):
+    """SGE options for staged jobs: signal before hard time limit and qdel."""
+    
+    return ['#', '### Signal (USR1) before hard time limit, to copy files back',
+            f'#$ -l s_rt={soft_time(time)}', '#$ -notify']
+
+
+def stage_scratch_chunk():
+    """Gaussian root with per-job node-local scratch directory."""
+    
+    return ['# ------- Defining root directory for gaussian \n',
+            'g09root=/share/apps/Gaussian09/EM64T.SSE4.2-enabled',
+            'SCRATCH=/local/$USER/$JOB_ID',
+            'mkdir -p $SCRATCH',
+            'GAUSS_SCRDIR=$SCRATCH',
+            'export g09root GAUSS_SCRDIR',
+            '. $g09root/g09/bsd/g09.profile']
+
+
+def stage_chunk(g09in_files, chk_files):
+    """Copy inputs and existing chk files to node-local scratch and run 
+    there. On exit (normal, error or termination signal) logs and chk files
+    are copied back (to a temporary name, then renamed) and scratch is
+    removed. USR2, sent by SGE before suspending the job, is ignored."""
+    
+    chunk = ['# -------- SECTION staging to node-local scratch ------------------------------ \n',
+             'WORKDIR=`pwd`',
+             'G09_PID=""',
+             'copy_back() {',
+             '    cd $WORKDIR',
+             '    for f in $SCRATCH/*.log $SCRATCH/*.chk; do',
+             '        [ -f $f ] || continue',
+             '        name=`basename $f`',
+             '        cp $f $WORKDIR/.$name.$JOB_ID && mv -f $WORKDIR/.$name.$JOB_ID $WORKDIR/$name',
+             '    done',
+             '    rm -rf $SCRATCH',
+             '}',
+             'trap copy_back EXIT',
+             "trap '[ -n \"$G09_PID\" ] && kill $G09_PID; exit 1' TERM INT HUP USR1 XCPU",
+             '# USR2 (-notify) comes before a suspension: ignored, g09 goes on after it',
+             "trap '' USR2",
+             '']
+    chunk += [f'cp {file} $SCRATCH' for file in g09in_files]
+    chunk += [f'[ -f {chk} ] && cp {chk} $SCRATCH' for chk in chk_files]
+    chunk += ['cd $SCRATCH']
+    
+    return chunk
+
+
+def run_g09(g09in_file, stage = False):
+    """Line to run g09 input. Staged jobs run g09 in background and wait,
+    so signals are handled while it runs."""
+    
+    if stage:
+        return f'g09 {g09in_file} & G09_PID=$! ; wait $G09_PID \n'
+    
+    return 'g09 ' + g09in_file + ' \n'
+
+
 #%% write_sh function
 
-def write_sh(filename, nproc, time, jobname, g09in_file):
+def write_sh(filename, nproc, time, jobname, g09in_file, stage = False):
     """ Writes .sh file.
     filename includes path.
     nproc: number of processors requested.
     time: wall clock time, max 3 days. format HH:MM:SS, string.
-    g09in_file: name of g09 input file to run job on cluster."""
+    g09in_file: name of g09 input file to run job on cluster.
+    stage: if True, job runs in node-local scratch (see stage_chunk)."""
     
     sge_chunk = ['#!/bin/bash', '#$ -S /bin/bash', '#',  
                  '### Job Name', f'#$ -N {jobname}', '#',
@@ -67,7 +157,7 @@ def write_sh(filename, nproc, time, jobname, g09in_file):
                   'echo " "',
                   'echo "Running:"',
                   'echo " " \n',
-                  f'g09 {g09in_file}']
+                  run_g09(g09in_file, stage)]
     
     cleanup_chunk = ['# -------- SECTION final cleanup and timing statistics ------------------------ \n',
                      '''echo "END_TIME (success)   = `date +'%y-%m-%d %H:%M:%S %s'`"''',
@@ -75,6 +165,12 @@ def write_sh(filename, nproc, time, jobname, g09in_file):
                      '''echo "RUN_TIME (hours)     = "`echo "$START_TIME $END_TIME" | awk '{printf("%.4f",($2-$1)/60.0/60.0)}'` \n''',
                      'exit 0']
     
+    if stage:
+        sge_chunk += stage_sge_chunk(time)
+        gaussroot_chunk = stage_scratch_chunk()
+        chk = get_chk(os.path.join(os.path.dirname(filename), g09in_file))
+        stdout_chunk += ['\n\n'] + stage_chunk([g09in_file], [chk] if chk else [])
+    
     with open(filename, 'w') as f:
         f.write('\n'.join(sge_chunk))
         f.write('\n\n\n')
@@ -89,16 +185,24 @@ def write_sh(filename, nproc, time, jobname, g09in_file):
 
 #%% write_nsh function
 
-def write_nsh(filename, nproc, time, jobname, g09in_files):
+def write_nsh(filename, nproc, time, jobname, g09in_files, chain = False,
+              stage = False):
     """ Writes .sh file for serial g09 jobs, multiple g09 files.
     filename includes path.
     nproc: number of processors requested.
     time: wall clock time, max 3 days. format HH:MM:SS, string.
-    g09in_files: list of names of g09 input files to run job on cluster."""
+    g09in_files: list of names of g09 input files to run job on cluster.
+    chain: if True, chk of each job is copied to the chk of the next one
+    before it runs (inputs prepared with chain_g09ins).
+    stage: if True, jobs run in node-local scratch (see stage_chunk)."""
     
     g09_chunk = ''
-    for file in g09in_files:
-        g09_chunk += 'g09 ' + file + ' \n'
+    for i, file in enumerate(g09in_files):
+        if chain and i > 0:
+            previous = g09in_files[i-1].rsplit('.', 1)[0] + '.chk'
+            current = file.rsplit('.', 1)[0] + '.chk'
+            g09_chunk += f'[ -f {previous} ] && cp {previous} {current} \n'
+        g09_chunk += run_g09(file, stage)
     
     sge_chunk = ['#!/bin/bash', '#$ -S /bin/bash', '#',  
                  '### Job Name', f'#$ -N {jobname}', '#',
@@ -138,6 +242,12 @@ def write_nsh(filename, nproc, time, jobname, g09in_files):
                      '''echo "RUN_TIME (hours)     = "`echo "$START_TIME $END_TIME" | awk '{printf("%.4f",($2-$1)/60.0/60.0)}'` \n''',
                      'exit 0']
     
+    if stage:
+        sge_chunk += stage_sge_chunk(time)
+        gaussroot_chunk = stage_scratch_chunk()
+        chks = [get_chk(os.path.join(os.path.dirname(filename), x)) for x in g09in_files]
+        stdout_chunk += ['\n\n'] + stage_chunk(g09in_files, [x for x in chks if x])
+    
     with open(filename, 'w') as f:
         f.write('\n'.join(sge_chunk))
         f.write('\n\n\n')
@@ -150,31 +260,104 @@ def write_nsh(filename, nproc, time, jobname, g09in_files):
         f.write('\n'.join(cleanup_chunk))
         f.write('\n\n\n')
     
+#%% chained jobs
+
+def similarity_order(path, g09_files):
+    """Group g09 input files by molecule (<mol>_c<i>_<suffix>) and order 
+    each group so that each geometry is followed by the most similar one
+    left (aligned RMSD, nearest neighbour path from the first file).
+    Out: list of ordered lists of files, one per molecule."""
+    
+    from g09unique import kabsch_rmsd
+    
+    groups = {}
+    for file in sorted(g09_files, key = lambda x: (split_name(x)[0], split_name(x)[1] or 0)):
+        groups.setdefault(split_name(file)[0], []).append(file)
+    
+    ordered = []
+    for files in groups.values():
+        coords = np.array([g09check.read_g09in(os.path.join(path, x)).arrXYZ() 
+                           for x in files], dtype = float)
+        left = list(range(1, len(files)))
+        order = [0]
+        while left:
+            rmsd = kabsch_rmsd(coords[order[-1]], coords[left])
+            order.append(left.pop(int(np.argmin(rmsd))))
+        ordered.append([files[i] for i in order])
+    
+    return ordered
+
+
+def chain_g09ins(path, g09in_files):
+    """Prepare inputs of a chained set (see write_nsh): each input gets 
+    its own chk and the inputs after the first one read the initial guess
+    from it (guess=read), with rw_g09in. The first one has no chk to read,
+    guess=read left from a previous chain is removed."""
+    
+    for i, file in enumerate(g09in_files):
+        with open(os.path.join(path, file)) as f:
+            route = strip_route(read_header(f.read().splitlines())[1])
+        if i > 0:
+            route = add_options(route, {'guess': ['read']})
+        else:
+            route = remove_options(route, {'guess': ['read']})
+        rw_g09in.rewrite_g09in(os.path.join(path, file), route = route,
+                               chk = file.rsplit('.', 1)[0] + '.chk')
+
+
 #%% main function
 
 def main(path, time, g09_files = None, sh_name = 'a', extension = '.com', 
-         n_files = 1):
+         n_files = 1, check = False, chain = False, stage = False):
     """Writes .sh for list of g09 files.
     If no list is provided, g09 files are looked for in path and all found
     are used.
     n_files int, >= 1. If == 1 (default), only one g09 input per sh.
     If n_files > 1, n_files input files per sh.
+    If chain = True (and n_files > 1), each sh has inputs of one molecule,
+    ordered by geometric similarity, and each job starts from the 
+    wavefunction of the previous one (chk copied forward, guess=read).
+    If check = True, geometries are checked first and bad inputs are moved
+    to bad_geometries subfolder without .sh (see g09check).
+    If stage = True, jobs copy inputs and chk files to a per-job node-local
+    scratch directory, run there and copy logs and chk files back on exit.
+    Returns list of .sh files written.
     """
     
     if not g09_files:
         g09_files = [x for x in os.listdir(path) if x.endswith(extension)]
     
+    if check and g09_files:
+        g09_files = g09check.main(path, g09_files, extension, move = True)
+    
     if len(g09_files) == 0:
         print('No g09 input files found.')
     
+    if chain and n_files < 2:
+        raise ValueError('chain needs more than one input per sh (n_files > 1).')
+    
+    written = []
     if n_files == 1:
         for i, file in enumerate(g09_files):
             nproc = get_nproc(os.path.join(path, file))
             jobname = sh_name + str(i+1) + '_' + file.split('.')[0]
+            written.append(sh_name + str(i+1) + '.sh')
             write_sh(os.path.join(path, sh_name + str(i+1) + '.sh'), 
-                     nproc, time, jobname, file)
+                     nproc, time, jobname, file, stage)
             
-    if n_files > 1:
+    if n_files > 1 and chain:
+        sets = [files[i:i + n_files] for files in similarity_order(path, g09_files)
+                for i in range(0, len(files), n_files)]
+        for i, g09_set in enumerate(sets):
+            chain_g09ins(path, g09_set)
+            nproc = get_nproc(os.path.join(path, g09_set[0]))
+            jobname = sh_name + str(i+1)
+            written.append(sh_name + str(i+1) + '.sh')
+            write_nsh(os.path.join(path, sh_name + str(i+1) + '.sh'),
+                      nproc, time, jobname, g09in_files = g09_set, chain = True,
+                      stage = stage)
+    
+    elif n_files > 1:
         i = len(g09_files)
         all_g09_sets = []
         g09in_files = []
@@ -196,13 +379,13 @@ def main(path, time, g09_files = None, sh_name = 'a', extension = '.com',
         for i, g09_set in enumerate(all_g09_sets):
             nproc = get_nproc(os.path.join(path, g09_set[0]))
             jobname = sh_name + str(i+1) 
+            written.append(sh_name + str(i+1) + '.sh')
             write_nsh(os.path.join(path, sh_name + str(i+1) + '.sh'),
-                      nproc, time, jobname, g09in_files = g09_set)
-        
+                      nproc, time, jobname, g09in_files = g09_set, stage = stage)
+    
+    return written
+
 
-            
-            
-        
 #%% 
 
 if __name__ == '__main__':
@@ -223,11 +406,18 @@ if __name__ == '__main__':
                         help = 'extension of g09 input files. if incorrect files wont be found')
     parser.add_argument('-nf', '--nfiles', type = int, default = 1,
                         help = 'number of g09 inputs in each sh, only use if nproc is the same for all files')
+    parser.add_argument('-ch', '--chain', action = 'store_true',
+                        help = 'with -nf > 1, order inputs of each molecule by similarity and reuse the previous wavefunction (guess=read)')
+    parser.add_argument('-st', '--stage', action = 'store_true',
+                        help = 'run jobs in node-local scratch, copying files back and cleaning up on exit')
+    parser.add_argument('-ck', '--check', action = 'store_true',
+                        help = 'check geometries first, inputs with problems are moved to bad_geometries')
 
     args = parser.parse_args()
      
     main(args.path, args.time, g09_files = args.input, sh_name = args.sh_name,
-         extension = args.ext, n_files = args.nfiles)
+         extension = args.ext, n_files = args.nfiles, check = args.check,
+         chain = args.chain, stage = args.stage)
 
        
         